@@ -1,35 +1,142 @@
-from typing import List, Dict, Optional
+from typing import List, Dict
+import hashlib
+import json
+import os
+
+# Scheme fields that are shown to citizens and therefore translated
+TRANSLATABLE_FIELDS = ["name", "description", "beneficiary_category", "eligibility_criteria",
+                       "documents_required", "benefits", "application_process", "department"]
+
+LANGUAGE_NAMES = {"ta": "Tamil", "ml": "Malayalam"}
+
+def source_hash(scheme: dict) -> str:
+    """Hash of the translatable fields: a stored translation is current only while it matches."""
+    source = {f: scheme.get(f) for f in TRANSLATABLE_FIELDS}
+    return hashlib.sha256(json.dumps(source, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+class TranslationError(Exception):
+    pass
+
+class StubTranslator:
+    """Local translator for tests and offline development: tags each string with the language code."""
+    async def translate_batch(self, texts: List[str], target_language: str) -> List[str]:
+        return [f"[{target_language}] {t}" for t in texts]
+
+class LLMTranslator:
+    """Translates a batch of strings in one OpenRouter call, using the shared chat client."""
+    async def translate_batch(self, texts: List[str], target_language: str) -> List[str]:
+        from chat_client import chat_client, ChatUpstreamError
+
+        api_key = os.getenv("DEEPSEEK_API_KEY")
+        if not api_key:
+            raise TranslationError("API Key configuration error")
+
+        language = LANGUAGE_NAMES.get(target_language, target_language)
+        payload = {
+            "model": os.getenv("CHAT_MODEL", "deepseek/deepseek-chat"),
+            "messages": [
+                {
+                    "role": "system",
+                    "content": f"You translate Indian government welfare scheme information into simple {language}. "
+                               "You receive a JSON array of strings and reply with ONLY a JSON array of the same length, "
+                               "each element the translation of the element at the same position."
+                },
+                {"role": "user", "content": json.dumps(texts, ensure_ascii=False)}
+            ]
+        }
+        try:
+            data = await chat_client.complete(api_key, payload)
+            reply = data["choices"][0]["message"]["content"].strip()
+        except (ChatUpstreamError, KeyError, IndexError) as e:
+            raise TranslationError(str(e))
+
+        # Models sometimes wrap JSON in a code fence
+        reply = reply.strip("`").removeprefix("json").strip()
+        try:
+            translated = json.loads(reply)
+        except ValueError:
+            raise TranslationError("Translator reply was not JSON")
+        if not isinstance(translated, list) or len(translated) != len(texts):
+            raise TranslationError("Translator reply does not match the batch")
+        return [str(t) for t in translated]
+
+def get_translator():
+    """
+    "llm" (the default when DEEPSEEK_API_KEY is set) or "stub" (opt-in, for tests
+    and benchmarks). None when neither is configured: nothing is translated and
+    every language falls back to English.
+    """
+    backend = os.getenv("TRANSLATOR_BACKEND", "llm" if os.getenv("DEEPSEEK_API_KEY") else "none")
+    if backend == "llm":
+        return LLMTranslator()
+    if backend == "stub":
+        return StubTranslator()
+    return None
 
 class AwarenessEngine:
-    def __init__(self):
+    def __init__(self, translator=None):
         # Initialize translation/simplification models if needed
-        # self.translator = ...
-        pass
+        self.translator = translator or get_translator()
 
     async def simplify_text(self, text: str) -> str:
         """
         Simplifies complex government text into easy-to-understand language.
         """
         # Placeholder for simplification logic
-        return text 
+        return text
 
     async def translate_content(self, content: Dict, target_language: str) -> Dict:
         """
         Translates scheme content (title, description, etc.) into target language (ta, ml).
+        All translatable fields, including list items, go to the translator in a single batch.
         """
         if target_language == "en":
             return content
-            
+
+        # Flatten every string into one batch, remembering where each came from
+        texts, slots = [], []
+        for field in TRANSLATABLE_FIELDS:
+            value = content.get(field)
+            if isinstance(value, str) and value:
+                texts.append(value)
+                slots.append((field, None))
+            elif isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, str) and item:
+                        texts.append(item)
+                        slots.append((field, i))
+
         translated = content.copy()
-        # Placeholder for translation logic
-        # translated["description"] = translate(content["description"])
+        if not texts:
+            return translated
+
+        if self.translator is None:
+            raise TranslationError("No translator configured")
+        results = await self.translator.translate_batch(texts, target_language)
+        for (field, index), text in zip(slots, results):
+            if index is None:
+                translated[field] = text
+            else:
+                if translated[field] is content[field]:
+                    translated[field] = list(content[field])
+                translated[field][index] = text
         return translated
 
-    def generate_voice_explanation(self, text: str, language: str) -> bytes:
+    def generate_voice_explanation(self, text: str, language: str, voice: str = "default") -> bytes:
         """
-        Generates TTS audio for the given text.
+        Generates TTS audio (WAV) for the given text.
+        Blocking; called from the tts worker pool, never on the event loop.
         """
-        # Placeholder for TTS
-        return b""
+        # Placeholder for TTS: silence roughly as long as reading the text aloud would take
+        import io
+        import wave
+        seconds = max(1, len(text.split()) // 2)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as audio:
+            audio.setnchannels(1)
+            audio.setsampwidth(1)
+            audio.setframerate(8000)
+            audio.writeframes(b"\x80" * 8000 * seconds)
+        return buffer.getvalue()
 
 ai_engine = AwarenessEngine()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from catalog import scheme_catalog
+
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", 6 * 3600))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", 1000))
+CHAT_CACHE_MAX_BYTES = int(os.getenv("CHAT_CACHE_MAX_BYTES", 5 * 1024 * 1024))
+
+def normalize_message(message: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace so trivially different questions share a key."""
+    text = unicodedata.normalize("NFC", message).casefold()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return " ".join(text.split())
+
+class AnswerCache:
+    """
+    TTL + LRU cache of chat answers keyed on the normalized question.
+
+    Bounded by entry count and by approximate memory; flushed whenever the
+    scheme catalog version changes. Concurrent misses for the same question
+    share one upstream call.
+    """
+    def __init__(self, ttl: float = CHAT_CACHE_TTL, max_entries: int = CHAT_CACHE_MAX_ENTRIES, max_bytes: int = CHAT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # key -> (expires_at, reply, size)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._bytes = 0
+        self._catalog_version = scheme_catalog.version
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _check_catalog(self):
+        # Answers may quote scheme details, so a catalog change invalidates all of them
+        if self._catalog_version != scheme_catalog.version:
+            self._catalog_version = scheme_catalog.version
+            self.clear()
+
+    def _drop(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, message: str) -> Optional[str]:
+        self._check_catalog()
+        key = normalize_message(message)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, message: str, reply: str):
+        self._check_catalog()
+        key = normalize_message(message)
+        size = len(key.encode()) + len(reply.encode())
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, reply, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def get_or_compute(self, message: str, compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        """
+        Return the cached answer, or run `compute` once for all concurrent callers
+        asking the same question. A `None` result is returned but not cached.
+
+        `compute` runs in its own task: a caller that is cancelled (client gone)
+        stops waiting, but the others still get the answer, and it is cached.
+        """
+        reply = self.get(message)
+        if reply is not None:
+            self.hits += 1
+            return reply
+
+        key = normalize_message(message)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._inflight[key] = asyncio.create_task(self._compute(key, message, compute))
+            # Retrieve the error when every caller was cancelled, so it is not reported as never retrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, message: str, compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        try:
+            reply = await compute()
+            if reply is not None:
+                self.put(message, reply)
+            return reply
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "catalog_version": self._catalog_version
+        }
+
+answer_cache = AnswerCache()
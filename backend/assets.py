@@ -0,0 +1,181 @@
+"""
+Static frontend delivery: fingerprinted, precompressed assets.
+
+Once per process, right after startup (or ahead of time with
+`python assets.py [out_dir]`), every file under FRONTEND_DIR is loaded and:
+  - non-HTML assets (css, js, images) get a content-hashed name,
+    e.g. js/app.3f2a9c1b.js, served with an immutable one-year Cache-Control;
+  - HTML pages keep their URLs, but their local src/href references are
+    rewritten to the hashed names (dropping ?v= cache busters). Pages are
+    served with no-cache plus an ETag, so a deploy is picked up on the next
+    view while the assets themselves are never re-downloaded;
+  - text files get gzip (and brotli, when installed) variants, kept only when
+    they are actually smaller, and chosen per request from Accept-Encoding.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import sys
+from typing import Dict, Optional
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import get_route_path
+from compression import available_encodings, compress, negotiate
+from conditional import is_not_modified
+
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", "../frontend")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PAGE_CACHE_CONTROL = "no-cache"
+FINGERPRINT_LENGTH = 10
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+# Binary formats are already compressed
+COMPRESSIBLE_SUFFIXES = (".html", ".css", ".js", ".json", ".svg", ".txt", ".map", ".xml")
+FILE_EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+# Local references in HTML: src="js/app.js?v=4", href="css/styles.css"
+REFERENCE = re.compile(r'''(?P<attr>\b(?:src|href)=)(?P<quote>["'])(?P<url>(?![a-z][a-z0-9+.-]*:|//|#)[^"'?#]+)(?P<query>\?[^"'#]*)?(?P=quote)''', re.I)
+
+class Asset:
+    __slots__ = ("variants", "etag", "media_type", "cache_control")
+
+    def __init__(self, body: bytes, media_type: str, cache_control: str, compressible: bool):
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = digest
+        self.variants: Dict[Optional[str], bytes] = {None: body}
+        if compressible:
+            for coding in available_encodings():
+                level = STATIC_BROTLI_QUALITY if coding == "br" else STATIC_GZIP_LEVEL
+                encoded = compress(body, coding, level)
+                if len(encoded) < len(body) * 0.95:
+                    self.variants[coding] = encoded
+
+    def variant_etag(self, coding: Optional[str]) -> str:
+        return f'"{self.etag}-{coding}"' if coding else f'"{self.etag}"'
+
+def _media_type(path: str) -> str:
+    # starlette appends the utf-8 charset to text/* types itself
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+def fingerprinted(path: str, body: bytes) -> str:
+    stem, ext = posixpath.splitext(path)
+    return f"{stem}.{hashlib.blake2b(body, digest_size=16).hexdigest()[:FINGERPRINT_LENGTH]}{ext}"
+
+class AssetBundle:
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: Dict[str, Asset] = {}
+        self.manifest: Dict[str, str] = {} # source path -> fingerprinted path
+
+    def build(self) -> "AssetBundle":
+        sources: Dict[str, bytes] = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                full = os.path.join(directory, name)
+                rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                with open(full, "rb") as f:
+                    sources[rel] = f.read()
+
+        # Hash assets first, so pages can point at the hashed names
+        for path, body in sources.items():
+            if not path.endswith(".html"):
+                self.manifest[path] = fingerprinted(path, body)
+
+        for path, body in sources.items():
+            compressible = path.endswith(COMPRESSIBLE_SUFFIXES)
+            media_type = _media_type(path)
+            if path.endswith(".html"):
+                body = self._rewrite(path, body)
+                self.assets[path] = Asset(body, media_type, PAGE_CACHE_CONTROL, compressible)
+            else:
+                asset = Asset(body, media_type, IMMUTABLE_CACHE_CONTROL, compressible)
+                self.assets[self.manifest[path]] = asset
+                # Unhashed URL still works (old pages, bookmarks) but must be revalidated
+                self.assets[path] = Asset(body, media_type, PAGE_CACHE_CONTROL, compressible)
+        return self
+
+    def _rewrite(self, page: str, body: bytes) -> bytes:
+        base = posixpath.dirname(page)
+
+        def replace(match):
+            url = match.group("url")
+            target = posixpath.normpath(posixpath.join(base, url))
+            hashed = self.manifest.get(target)
+            if hashed is None:
+                return match.group(0)
+            new_url = posixpath.relpath(hashed, base or ".")
+            return f'{match.group("attr")}{match.group("quote")}{new_url}{match.group("quote")}'
+
+        return REFERENCE.sub(replace, body.decode("utf-8")).encode("utf-8")
+
+    def write(self, out_dir: str):
+        """Write every asset and its precompressed variants (.gz/.br) to out_dir, e.g. for a CDN or reverse proxy."""
+        for path, asset in self.assets.items():
+            target = os.path.join(out_dir, *path.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            for coding, body in asset.variants.items():
+                with open(target + FILE_EXTENSIONS.get(coding, ""), "wb") as f:
+                    f.write(body)
+
+class StaticAssets:
+    """
+    ASGI app serving an AssetBundle (GET/HEAD), in place of StaticFiles(html=True):
+    "/" and "dir/" resolve to index.html.
+    """
+    def __init__(self, directory: str = FRONTEND_DIR):
+        self.directory = directory
+        self._bundle: Optional[AssetBundle] = None
+
+    @property
+    def bundle(self) -> AssetBundle:
+        """Built on first use, not at import: main.warm_up builds it in the background, serve.py before forking."""
+        if self._bundle is None:
+            bundle = AssetBundle(self.directory).build()
+            variants = sum(len(a.variants) - 1 for a in bundle.assets.values())
+            print(f"Static assets: {len(bundle.manifest)} fingerprinted, {variants} precompressed variants ({', '.join(available_encodings())})")
+            self._bundle = bundle
+        return self._bundle
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        path = get_route_path(scope).lstrip("/")
+        if path == "" or path.endswith("/"):
+            path += "index.html"
+        asset = self.bundle.assets.get(path)
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        coding = negotiate(Headers(scope=scope).get("accept-encoding"), [c for c in available_encodings() if c in asset.variants])
+        etag = asset.variant_etag(coding)
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+        if is_not_modified(Request(scope), etag):
+            response = Response(status_code=304, headers=headers)
+        else:
+            if coding:
+                headers["Content-Encoding"] = coding
+            body = asset.variants[coding]
+            response = Response(body if scope["method"] == "GET" else b"", media_type=asset.media_type, headers=headers)
+            if scope["method"] == "HEAD":
+                response.headers["Content-Length"] = str(len(body))
+        await response(scope, receive, send)
+
+if __name__ == "__main__":
+    bundle = AssetBundle(FRONTEND_DIR).build()
+    print(f"{'asset':<40} {'bytes':>8} {'gzip':>8} {'br':>8}")
+    for path in sorted(bundle.assets):
+        variants = bundle.assets[path].variants
+        print(f"{path:<40} {len(variants[None]):>8} {len(variants.get('gzip', b'')) or '-':>8} {len(variants.get('br', b'')) or '-':>8}")
+    if len(sys.argv) > 1:
+        bundle.write(sys.argv[1])
+        print(f"\nWritten to {sys.argv[1]}")
@@ -0,0 +1,81 @@
+"""
+Eligibility matching benchmark on a synthetic catalog.
+
+Compares the compiled EligibilityIndex against re-parsing every scheme's rules
+per request (what /schemes/recommended would cost without the index).
+
+Usage: python bench_eligibility.py [schemes] [users]
+"""
+import random
+import sys
+import time
+from bson import ObjectId
+from eligibility import EligibilityIndex, compile_rules, _occupation_terms
+
+SCHEMES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+USERS = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+CRITERIA = [
+    "Age {a} years or above. Must belong to BPL household.",
+    "Annual income below Rs {l} Lakhs.",
+    "Applicants aged between {a} and {b} years. Income less than Rs {i}.",
+    "Must be a landholding farmer family. No income tax payers.",
+    "Open to all residents of the Panchayat.",
+]
+CATEGORIES = [["Farmers"], ["Senior Citizens (60+)", "BPL"], ["Women"], ["Fishermen"], ["Students"], ["Homeless families"]]
+OCCUPATIONS = [None, "Farmer", "Fisherman", "Student", "Teacher", "Daily wage worker"]
+
+def make_catalog(n: int, rng: random.Random) -> list:
+    schemes = []
+    for i in range(n):
+        a = rng.randint(18, 65)
+        schemes.append({
+            "_id": ObjectId(),
+            "name": f"Scheme {i}",
+            "eligibility_criteria": rng.choice(CRITERIA).format(a=a, b=a + rng.randint(5, 30), l=rng.randint(1, 5), i=rng.randint(50, 500) * 1000),
+            "beneficiary_category": rng.choice(CATEGORIES),
+        })
+    return schemes
+
+def naive_match(schemes, age, income, occupation):
+    # Parse and evaluate every scheme on every request
+    terms = _occupation_terms([occupation]) if occupation else None
+    result = []
+    for s in schemes:
+        min_age, max_age, max_income, occupations = compile_rules(s)
+        if age is not None and not (min_age <= age <= max_age):
+            continue
+        if income is not None and income > max_income:
+            continue
+        if terms is not None and occupations and not (occupations & terms):
+            continue
+        result.append(str(s["_id"]))
+    return result
+
+def main():
+    rng = random.Random(42)
+    schemes = make_catalog(SCHEMES, rng)
+    users = [(rng.randint(18, 90), rng.randint(20, 600) * 1000, rng.choice(OCCUPATIONS)) for _ in range(USERS)]
+
+    start = time.perf_counter()
+    index = EligibilityIndex(schemes)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    indexed = [index.match(*u) for u in users]
+    indexed_us = (time.perf_counter() - start) / USERS * 1e6
+
+    start = time.perf_counter()
+    naive = [naive_match(schemes, *u) for u in users[:100]]
+    naive_us = (time.perf_counter() - start) / 100 * 1e6
+
+    assert indexed[:100] == naive, "index and naive matcher disagree"
+    avg_matches = sum(len(r) for r in indexed) / USERS
+
+    print(f"catalog: {SCHEMES} schemes, {USERS} citizens, avg {avg_matches:.0f} matches each")
+    print(f"index build:          {build_ms:8.1f} ms (once per catalog version)")
+    print(f"indexed match:        {indexed_us:8.1f} us per citizen")
+    print(f"re-parse per request: {naive_us:8.1f} us per citizen ({naive_us / indexed_us:.0f}x slower)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Submission throughput benchmark: inline insert_one per request vs the write-behind ingest queue.
+
+SUBMITTERS concurrent clients submit applications for DURATION seconds per
+mode against MONGODB_URL, in a scratch database that is dropped afterwards
+(or in memory with STORAGE_BACKEND=memory, to measure the queue itself).
+"inline" does what /applications/apply does with INGEST_MODE=inline (insert_one
+plus a counters $inc per submission); "batched" queues the document and
+acknowledges, and is timed until the queue has been fully drained to MongoDB.
+
+Usage: python bench_ingest.py [submitters] [seconds]
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+import counters
+from database import MONGODB_URL
+from ingest import WriteBehindQueue, IngestBusy
+from storage import MotorStorage, MemoryStorage, STORAGE_BACKEND
+
+SUBMITTERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+DURATION = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+BENCH_DB = "kanthalloor_bench_ingest"
+
+def make_application(n: int) -> dict:
+    return {
+        "user_id": f"user-{n % 5000}",
+        "scheme_id": f"scheme-{n % 40}",
+        "scheme_name": "Bench Scheme",
+        "status": "Pending",
+        "submission_date": datetime.utcnow(),
+        "details": {"applicant_details": {"full_name": "Bench Citizen", "age": 60}},
+    }
+
+async def run(mode: str, storage):
+    await storage.reset()
+    queue = WriteBehindQueue()
+    queue.on_written("applications", counters.record_applications)
+    latencies = []
+    rejected = 0
+    seq = 0
+    stop_at = time.perf_counter() + DURATION
+
+    async def submitter():
+        nonlocal seq, rejected
+        while time.perf_counter() < stop_at:
+            seq += 1
+            doc = make_application(seq)
+            start = time.perf_counter()
+            if mode == "inline":
+                await storage.applications.insert(doc)
+                await counters.record_application(storage, doc["scheme_id"], doc["status"])
+            else:
+                try:
+                    queue.submit(storage, "applications", doc)
+                except IngestBusy:
+                    # A real client would see 503 + Retry-After
+                    rejected += 1
+                    await asyncio.sleep(0.05)
+                    continue
+                # Yield like a request handler returning its response would
+                await asyncio.sleep(0)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[submitter() for _ in range(SUBMITTERS)])
+    acked = time.perf_counter() - start
+    await queue.close()
+    durable = time.perf_counter() - start
+
+    stored = await storage.applications.count()
+    assert stored == len(latencies), f"{mode}: {len(latencies)} acknowledged but {stored} stored"
+    latencies.sort()
+    return {
+        "mode": mode,
+        "stored": stored,
+        "per_sec": stored / durable,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "drain_ms": (durable - acked) * 1000,
+        "rejected": rejected,
+        "batches": queue.batches,
+    }
+
+async def main():
+    if STORAGE_BACKEND == "memory":
+        client, storage, target = None, MemoryStorage(), "in-memory storage"
+    else:
+        client = AsyncIOMotorClient(MONGODB_URL)
+        storage, target = MotorStorage(client[BENCH_DB]), f"MongoDB at {MONGODB_URL}"
+    print(f"{SUBMITTERS} concurrent submitters, {DURATION:.0f}s per mode, {target}\n")
+    print(f"{'mode':<8} {'stored':>8} {'subs/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'drain ms':>9} {'batches':>8} {'503s':>6}")
+    try:
+        for mode in ["inline", "batched"]:
+            r = await run(mode, storage)
+            print(f"{r['mode']:<8} {r['stored']:>8} {r['per_sec']:>9.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['drain_ms']:>9.1f} {r['batches']:>8} {r['rejected']:>6}")
+    finally:
+        if client is not None:
+            await client.drop_database(BENCH_DB)
+            client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Login throughput benchmark: bcrypt inline on the event loop vs offloaded to the hashing pool.
+
+Runs CONCURRENT_LOGINS password verifications per mode (the CPU-heavy part of
+/auth/token) while a ticker measures event loop lag, i.e. how long every other
+request in the worker would have been stalled.
+
+Usage: python bench_login.py [logins] [rounds]
+"""
+import asyncio
+import sys
+import time
+import security
+
+CONCURRENT_LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else security.BCRYPT_ROUNDS
+
+async def run(mode: str, stored_hash: str):
+    security.PASSWORD_HASH_MODE = mode
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    async def login():
+        while True:
+            try:
+                valid, _ = await security.verify_password_async("password123", stored_hash)
+                return valid
+            except security.PasswordHasherBusy:
+                # A real client would see 503 + Retry-After; retry so every login completes
+                await asyncio.sleep(0.01)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    results = await asyncio.gather(*[login() for _ in range(CONCURRENT_LOGINS)])
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+
+    assert all(results)
+    lags.sort()
+    return {
+        "mode": mode,
+        "logins_per_sec": CONCURRENT_LOGINS / elapsed,
+        "max_loop_lag_ms": lags[-1] * 1000 if lags else elapsed * 1000,
+        "p99_loop_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else elapsed * 1000,
+    }
+
+async def main():
+    security.BCRYPT_ROUNDS = ROUNDS
+    stored_hash = security.get_pwd_context().hash("password123")
+    print(f"{CONCURRENT_LOGINS} concurrent logins, bcrypt rounds={ROUNDS}, pool workers={security.password_hasher.workers}, max queue={security.password_hasher.max_queue}\n")
+    print(f"{'mode':<8} {'logins/s':>10} {'p99 lag ms':>12} {'max lag ms':>12}")
+    for mode in ["inline", "thread"]:
+        r = await run(mode, stored_hash)
+        print(f"{r['mode']:<8} {r['logins_per_sec']:>10.1f} {r['p99_loop_lag_ms']:>12.1f} {r['max_loop_lag_ms']:>12.1f}")
+    print(f"\nrejected (503) while queue was full: {security.password_hasher.rejected}")
+    security.password_hasher.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
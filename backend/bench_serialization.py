@@ -0,0 +1,110 @@
+"""
+Response serialization benchmark: per-request CPU for the scheme list and the
+admin lists, old path vs the responses.py fast path.
+
+  legacy  - what the routers used to do: build models (Scheme(**s) / User(**u)),
+            then FastAPI re-validates against response_model, runs
+            jsonable_encoder and encodes with the stdlib json module
+  fast    - responses.model_response: one validation pass, pydantic-core JSON
+  plain   - responses.json_response: documents straight to orjson (no model)
+  catalog - /schemes/ as served: pre-serialized bytes from the catalog snapshot
+
+Usage: python bench_serialization.py [schemes] [iterations]
+"""
+import asyncio
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from models import Scheme, User
+from responses import model_response, json_response
+
+SCHEMES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+ITERATIONS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+USERS_PAGE = 100
+
+def make_schemes(n: int, rng: random.Random) -> list:
+    return [{
+        "_id": ObjectId(),
+        "name": f"Scheme {i}",
+        "description": "Financial assistance for eligible households in the Panchayat. " * 3,
+        "beneficiary_category": rng.sample(["Farmers", "Women", "BPL", "Senior Citizens (60+)", "Students"], 2),
+        "eligibility_criteria": f"Age {rng.randint(18, 65)} years or above. Annual income below Rs {rng.randint(1, 5)} Lakhs.",
+        "documents_required": ["Aadhaar Card", "Bank Passbook", "Income Certificate"],
+        "benefits": f"Rs {rng.randint(1, 50) * 1000} per year.",
+        "application_process": "Submit the form at the Panchayat office with the documents listed.",
+        "department": "Rural Development",
+        "created_at": datetime(2024, 1, 1) + timedelta(minutes=i),
+    } for i in range(n)]
+
+def make_users(n: int) -> list:
+    return [{"_id": ObjectId(), "email": f"citizen{i}@example.com", "full_name": f"Citizen {i}", "role": "citizen",
+             "language_pref": "ml", "ward": str(i % 14), "occupation": "Farmer", "phone_number": "9876543210"}
+            for i in range(n)]
+
+def make_applications(n: int) -> list:
+    return [{"_id": ObjectId(), "scheme_id": str(ObjectId()), "scheme_name": "Old Age Pension", "applicant_name": f"Citizen {i}",
+             "user_id": str(ObjectId()), "status": "Pending", "submission_date": datetime(2024, 1, 1) + timedelta(minutes=i),
+             "details": {"applicant_details": {"full_name": f"Citizen {i}", "age": 61, "annual_income": 90000.0}}}
+            for i in range(n)]
+
+async def legacy_models(model, docs) -> bytes:
+    content = [model(**d) for d in docs]
+    field = create_response_field(name="response", type_=List[model])
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+async def legacy_dicts(docs) -> bytes:
+    # Routers stringified _id by hand, then FastAPI ran jsonable_encoder over the rest
+    for d in docs:
+        d["_id"] = str(d["_id"])
+    return JSONResponse(await serialize_response(response_content=docs)).body
+
+def cpu_per_call(fn, iterations: int) -> float:
+    fn()  # warm up (TypeAdapter/ModelField construction)
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1000
+
+def main():
+    rng = random.Random(1)
+    schemes = make_schemes(SCHEMES, rng)
+    users = make_users(USERS_PAGE)
+    applications = make_applications(USERS_PAGE)
+    catalog_bytes = json_response([Scheme(**s).model_dump(by_alias=True) for s in schemes]).body
+    loop = asyncio.new_event_loop()
+
+    cases = [
+        (f"{SCHEMES} schemes", [
+            ("legacy", lambda: loop.run_until_complete(legacy_models(Scheme, schemes))),
+            ("fast", lambda: model_response(List[Scheme], schemes).body),
+            ("catalog", lambda: bytes(catalog_bytes)),
+        ]),
+        (f"{USERS_PAGE} users", [
+            ("legacy", lambda: loop.run_until_complete(legacy_models(User, users))),
+            ("fast", lambda: model_response(List[User], users).body),
+        ]),
+        (f"{USERS_PAGE} applications", [
+            ("legacy", lambda: loop.run_until_complete(legacy_dicts([dict(a) for a in applications]))),
+            ("plain", lambda: json_response([dict(a) for a in applications]).body),
+        ]),
+    ]
+
+    print(f"CPU ms per response, mean of {ITERATIONS}\n")
+    print(f"{'payload':<18} {'path':<8} {'cpu ms':>8} {'vs legacy':>10}")
+    for payload, paths in cases:
+        baseline = None
+        for name, fn in paths:
+            ms = cpu_per_call(fn, ITERATIONS)
+            baseline = baseline or ms
+            print(f"{payload:<18} {name:<8} {ms:>8.3f} {baseline / ms if ms else float('inf'):>9.1f}x")
+    loop.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Throughput scaling of serve.py from 1 to N workers.
+
+For each worker count, starts serve.py on the in-memory backend with CATALOG
+schemes seeded before the fork, and drives catalog reads (one scheme by id,
+a 20-scheme page, the full list) from CLIENT_PROCESSES load generator
+processes (so the client is not the bottleneck) for DURATION seconds.
+Reports req/s, p50/p99, the speedup over one worker, and memory: the summed
+RSS of the workers against their summed PSS, which counts shared pages
+(the preloaded app, the mapped catalog snapshot) once.
+
+Speedup is bounded by the cores left after the load generators: on a
+machine with C cores, expect scaling up to roughly C - CLIENT_PROCESSES workers.
+
+Usage: python bench_workers.py [max_workers] [seconds]   (Linux)
+"""
+import asyncio
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import time
+import aiohttp
+
+CORES = os.cpu_count() or 1
+MAX_WORKERS = int(sys.argv[1]) if len(sys.argv) > 1 else CORES
+DURATION = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+CLIENT_PROCESSES = int(os.getenv("BENCH_CLIENT_PROCESSES", max(1, CORES // 4)))
+CONNECTIONS_PER_CLIENT = 32
+CATALOG = 300
+APP_PORT = 18971
+
+# Must be set before the app modules are imported (here and in the spawned processes)
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["SERVE_MEMORY_WORKERS"] = "1" # read-only load: every worker's copy of the seeded data is enough
+os.environ["TRANSLATOR_BACKEND"] = "none" # no backfill rebuilding the catalog while requests are measured
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+
+def scheme(i: int) -> dict:
+    return {
+        "name": f"Scheme {i}", "description": "Support for residents of the Panchayat. " * 4,
+        "beneficiary_category": ["Farmers", "BPL"], "eligibility_criteria": f"Age {18 + i % 50} years or above.",
+        "documents_required": ["Aadhaar", "Ration card"], "benefits": "Rs 1000 per month",
+        "application_process": "Apply at the Panchayat office with the documents listed.",
+    }
+
+async def seed(storage):
+    for i in range(CATALOG):
+        await storage.schemes.create(scheme(i))
+
+def serve_process(workers: int):
+    import serve
+    serve.run(workers, "127.0.0.1", APP_PORT, before_fork=seed)
+
+async def load(ids: list, deadline: float) -> tuple:
+    latencies = []
+    errors = 0
+    base = f"http://127.0.0.1:{APP_PORT}"
+    rng = random.Random(os.getpid())
+    connector = aiohttp.TCPConnector(limit=CONNECTIONS_PER_CLIENT)
+    async with aiohttp.ClientSession(connector=connector, headers={"Accept-Encoding": "identity"}) as session:
+        async def client():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                roll = rng.random()
+                if roll < 0.7:
+                    url = f"{base}/schemes/{rng.choice(ids)}"
+                elif roll < 0.95:
+                    url = f"{base}/schemes/?limit=20"
+                else:
+                    url = f"{base}/schemes/"
+                start = time.perf_counter()
+                try:
+                    async with session.get(url) as resp:
+                        await resp.read()
+                        if resp.status != 200:
+                            errors += 1
+                except aiohttp.ClientError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*[client() for _ in range(CONNECTIONS_PER_CLIENT)])
+    return latencies, errors
+
+def load_process(ids: list, deadline_wall: float, results):
+    # perf_counter is per process: the deadline travels as wall-clock time
+    deadline = time.perf_counter() + (deadline_wall - time.time())
+    results.put(asyncio.run(load(ids, deadline)))
+
+def children(pid: int) -> set:
+    found = set()
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        found.add(int(entry))
+            except (OSError, IndexError):
+                pass
+    return found
+
+def memory_kb(pid: int) -> tuple:
+    """(RSS, PSS) in kB, from smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(rest.split()[0])
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+async def wait_ready(server, workers: int) -> list:
+    async with aiohttp.ClientSession() as session:
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            if len(children(server.pid)) >= workers:
+                try:
+                    async with session.get(f"http://127.0.0.1:{APP_PORT}/schemes/") as resp:
+                        return [s["_id"] for s in await resp.json()]
+                except aiohttp.ClientError:
+                    pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def run(workers: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    server = context.Process(target=serve_process, args=(workers,))
+    server.start()
+    try:
+        ids = asyncio.run(wait_ready(server, workers))
+        results = context.Queue()
+        deadline = time.time() + DURATION
+        clients = [context.Process(target=load_process, args=(ids, deadline, results)) for _ in range(CLIENT_PROCESSES)]
+        for c in clients:
+            c.start()
+        latencies, errors = [], 0
+        for _ in clients:
+            l, e = results.get()
+            latencies.extend(l)
+            errors += e
+        for c in clients:
+            c.join()
+        memory = [memory_kb(pid) for pid in children(server.pid)]
+    finally:
+        os.kill(server.pid, signal.SIGTERM)
+        server.join(60)
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "rps": len(latencies) / DURATION,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": errors,
+        "rss_mb": sum(m[0] for m in memory) / 1024,
+        "pss_mb": sum(m[1] for m in memory) / 1024,
+    }
+
+def main():
+    counts = sorted({1, MAX_WORKERS} | {n for n in (2, 4, 8, 16, 32) if n < MAX_WORKERS})
+    print(f"{CORES} cores, {CLIENT_PROCESSES} load generator processes x {CONNECTIONS_PER_CLIENT} connections, "
+          f"{DURATION:.0f}s per run, {CATALOG} schemes\n")
+    print(f"{'workers':>7} {'requests':>9} {'req/s':>8} {'speedup':>8} {'p50 ms':>7} {'p99 ms':>7} {'errors':>6} {'RSS MB':>7} {'PSS MB':>7}")
+    single = None
+    for workers in counts:
+        r = run(workers)
+        single = single or r["rps"]
+        print(f"{r['workers']:>7} {r['requests']:>9} {r['rps']:>8.0f} {r['rps'] / single:>7.2f}x {r['p50_ms']:>7.2f} "
+              f"{r['p99_ms']:>7.2f} {r['errors']:>6} {r['rss_mb']:>7.1f} {r['pss_mb']:>7.1f}")
+
+if __name__ == "__main__":
+    main()
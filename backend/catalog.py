@@ -0,0 +1,244 @@
+import asyncio
+import bisect
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import orjson
+from ai_engine import source_hash
+from models import Scheme
+from conditional import make_etag
+from eligibility import EligibilityIndex
+
+DEFAULT_LANGUAGE = "en"
+# Snapshot file layout: header length (8 bytes LE), JSON header, then every language's list body back to back
+SNAPSHOT_HEADER = struct.Struct("<Q")
+
+class SchemeCatalog:
+    """
+    Process-local cache of the scheme catalog.
+
+    Holds the pre-serialized JSON for the full list and for every scheme id,
+    in English and in every language with stored translations (schemes not
+    translated yet fall back to English), with a content ETag for each. Any
+    write path (create/update/delete, stored translations) must call `bump()`;
+    the next read rebuilds the snapshot from storage, every other read is
+    served from memory.
+
+    Under serve.py the catalog is shared between workers (see `share()`): the
+    version counter lives in shared memory, so a bump in any worker reaches all
+    of them, and the snapshot is published to a file every worker maps, so the
+    bodies exist once in memory instead of once per process.
+    """
+    def __init__(self):
+        self._version = 0
+        self._shared_version = None # multiprocessing.Value when shared
+        self._snapshot_path: Optional[str] = None
+        self._loaded_version = -1
+        self._list_json: Dict[str, bytes] = {DEFAULT_LANGUAGE: b"[]"}
+        self._list_etags: Dict[str, str] = {DEFAULT_LANGUAGE: make_etag(b"[]")}
+        self._by_id: Dict[str, Dict[str, bytes]] = {DEFAULT_LANGUAGE: {}}
+        self._etags: Dict[str, Dict[str, str]] = {DEFAULT_LANGUAGE: {}}
+        self.loaded_at = datetime.utcnow()
+        self._sorted_ids: List[str] = []
+        self.eligibility = EligibilityIndex([])
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._shared_version.value if self._shared_version is not None else self._version
+
+    def bump(self):
+        """Invalidate the snapshot. Called by every catalog write path."""
+        if self._shared_version is not None:
+            with self._shared_version.get_lock():
+                self._shared_version.value += 1
+        else:
+            self._version += 1
+
+    def share(self, snapshot_path: str, version):
+        """
+        Share the catalog between forked workers: `version` is a
+        multiprocessing.Value created before the fork, `snapshot_path` a file
+        on a memory-backed filesystem. Workers adopt the published snapshot when
+        its version is current and only rebuild from storage when it is not.
+        """
+        self._snapshot_path = snapshot_path
+        self._shared_version = version
+
+    async def refresh(self, storage):
+        """Rebuild the snapshot from the schemes and scheme_translations collections."""
+        version = self.version
+        schemes = await storage.schemes.list_all()
+        translations = await storage.translations.list_all()
+
+        by_id = {DEFAULT_LANGUAGE: {}}
+        for s in schemes:
+            by_id[DEFAULT_LANGUAGE][str(s["_id"])] = Scheme(**s).model_dump_json(by_alias=True).encode()
+
+        schemes_by_id = {str(s["_id"]): s for s in schemes}
+        source_hashes = {}
+        for t in translations:
+            scheme = schemes_by_id.get(t["scheme_id"])
+            # Stale after an edit until re-translated: that scheme falls back to English meanwhile
+            if scheme is None or t.get("source_hash") != source_hashes.setdefault(t["scheme_id"], source_hash(scheme)):
+                continue
+            translated = {**scheme, **t.get("fields", {})}
+            by_id.setdefault(t["language"], {})[t["scheme_id"]] = Scheme(**translated).model_dump_json(by_alias=True).encode()
+
+        # Keep every language in catalog order, falling back to English per scheme
+        english = by_id[DEFAULT_LANGUAGE]
+        for language in by_id:
+            if language != DEFAULT_LANGUAGE:
+                by_id[language] = {i: by_id[language].get(i, english[i]) for i in english}
+
+        self._by_id = by_id
+        self._sorted_ids = sorted(english)
+        self.eligibility = EligibilityIndex(schemes)
+        self._list_json = {language: b"[" + b",".join(docs.values()) + b"]" for language, docs in by_id.items()}
+        # Hashed once per rebuild, so conditional requests never touch the bodies
+        self._etags = {language: {i: make_etag(doc) for i, doc in docs.items()} for language, docs in by_id.items()}
+        self._list_etags = {language: make_etag(body) for language, body in self._list_json.items()}
+        self.loaded_at = datetime.utcnow()
+        # Record the version we started from, so a bump during the fetch triggers another rebuild
+        self._loaded_version = version
+        print(f"Scheme catalog loaded: {len(english)} schemes, languages {sorted(by_id)} (version {version})")
+        if self._snapshot_path:
+            self._publish()
+            # Serve from the shared mapping too, dropping this process's private copy
+            self._load_snapshot(version)
+
+    async def ensure_fresh(self, storage):
+        if self._loaded_version == self.version:
+            return
+        async with self._lock:
+            version = self.version
+            if self._loaded_version == version:
+                return
+            # Another worker may have rebuilt this version already
+            if self._snapshot_path and self._load_snapshot(version):
+                return
+            await self.refresh(storage)
+
+    def _publish(self):
+        languages = {}
+        bodies = []
+        offset = 0
+        for language, docs in self._by_id.items():
+            body = self._list_json[language]
+            entries = {}
+            position = offset + 1 # after "["
+            for scheme_id, doc in docs.items():
+                entries[scheme_id] = (position, len(doc))
+                position += len(doc) + 1 # and the "," after it
+            languages[language] = {
+                "list": (offset, len(body)),
+                "docs": entries,
+                "list_etag": self._list_etags[language],
+                "etags": self._etags[language],
+            }
+            bodies.append(body)
+            offset += len(body)
+        header = orjson.dumps({
+            "version": self._loaded_version,
+            "loaded_at": self.loaded_at.isoformat(),
+            "sorted_ids": self._sorted_ids,
+            "languages": languages,
+        })
+        # Written aside and renamed into place: readers never see a partial file
+        tmp = f"{self._snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(len(header)))
+            f.write(header)
+            for body in bodies:
+                f.write(body)
+        os.replace(tmp, self._snapshot_path)
+
+    def _load_snapshot(self, version: int) -> bool:
+        """Adopt the published snapshot if it is `version`; False when it is missing or stale."""
+        try:
+            with open(self._snapshot_path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return False
+        view = memoryview(mapped)
+        (length,) = SNAPSHOT_HEADER.unpack_from(view)
+        header = orjson.loads(view[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + length])
+        if header["version"] != version:
+            view.release()
+            mapped.close()
+            return False
+
+        # Bodies stay slices of the mapping: the pages are shared by every worker
+        blob = view[SNAPSHOT_HEADER.size + length:]
+        list_json, by_id = {}, {}
+        for language, entry in header["languages"].items():
+            offset, size = entry["list"]
+            list_json[language] = blob[offset:offset + size]
+            by_id[language] = {i: blob[o:o + n] for i, (o, n) in entry["docs"].items()}
+
+        self._by_id = by_id
+        self._list_json = list_json
+        self._sorted_ids = header["sorted_ids"]
+        self._etags = {language: entry["etags"] for language, entry in header["languages"].items()}
+        self._list_etags = {language: entry["list_etag"] for language, entry in header["languages"].items()}
+        self.eligibility = EligibilityIndex([orjson.loads(doc) for doc in by_id[DEFAULT_LANGUAGE].values()])
+        self.loaded_at = datetime.fromisoformat(header["loaded_at"])
+        self._loaded_version = version
+        return True
+
+    @property
+    def languages(self) -> List[str]:
+        return list(self._by_id)
+
+    def _language(self, language: Optional[str]) -> str:
+        return language if language in self._by_id else DEFAULT_LANGUAGE
+
+    def _docs(self, language: Optional[str]) -> Dict[str, bytes]:
+        return self._by_id[self._language(language)]
+
+    async def list_json(self, storage, language: Optional[str] = DEFAULT_LANGUAGE) -> bytes:
+        await self.ensure_fresh(storage)
+        return bytes(self._list_json[self._language(language)])
+
+    # ETag accessors are synchronous: call them right after the awaited read they
+    # describe, so the snapshot cannot be swapped in between
+
+    def list_etag(self, language: Optional[str] = DEFAULT_LANGUAGE) -> str:
+        return self._list_etags[self._language(language)]
+
+    def page_etag(self, limit: int, after_id: Optional[str] = None, language: Optional[str] = DEFAULT_LANGUAGE) -> str:
+        return make_etag(self.list_etag(language), limit, after_id or "")
+
+    def get_etag(self, scheme_id: str, language: Optional[str] = DEFAULT_LANGUAGE) -> Optional[str]:
+        return self._etags[self._language(language)].get(scheme_id)
+
+    async def page_json(self, storage, limit: int, after_id: Optional[str] = None, language: Optional[str] = DEFAULT_LANGUAGE) -> Tuple[bytes, Optional[str]]:
+        """
+        One page of the catalog ordered by id, starting after `after_id`.
+        Returns the JSON array and the id of its last scheme when more remain.
+        """
+        await self.ensure_fresh(storage)
+        docs = self._docs(language)
+        ids = self._sorted_ids
+        start = bisect.bisect_right(ids, after_id) if after_id is not None else 0
+        page = ids[start:start + limit]
+        body = b"[" + b",".join(docs[i] for i in page) + b"]"
+        last_id = page[-1] if page and start + limit < len(ids) else None
+        return body, last_id
+
+    async def recommend_json(self, storage, age=None, annual_income=None, occupation=None, language: Optional[str] = DEFAULT_LANGUAGE) -> bytes:
+        """JSON array of the schemes whose eligibility rules the citizen satisfies."""
+        await self.ensure_fresh(storage)
+        docs = self._docs(language)
+        ids = self.eligibility.match(age, annual_income, occupation)
+        return b"[" + b",".join(docs[i] for i in ids) + b"]"
+
+    async def get_json(self, storage, scheme_id: str, language: Optional[str] = DEFAULT_LANGUAGE) -> Optional[bytes]:
+        await self.ensure_fresh(storage)
+        doc = self._docs(language).get(scheme_id)
+        # bytes() is free for a private snapshot, one copy for a slice of the shared one
+        return bytes(doc) if doc is not None else None
+
+scheme_catalog = SchemeCatalog()
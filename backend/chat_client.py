@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+from dotenv import load_dotenv
+from metrics import chat_latency, timed
+
+if TYPE_CHECKING:
+    import aiohttp # imported by ChatClient.start: ~150 ms that a cold start should not pay before the first chat
+
+load_dotenv()
+
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+CHAT_POOL_SIZE = int(os.getenv("CHAT_POOL_SIZE", 20))
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", 10))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", 5))
+CHAT_CONNECT_TIMEOUT = float(os.getenv("CHAT_CONNECT_TIMEOUT", 5))
+CHAT_READ_TIMEOUT = float(os.getenv("CHAT_READ_TIMEOUT", 60))
+
+class ChatUpstreamError(Exception):
+    """The upstream chat API failed, timed out or is saturated."""
+    pass
+
+class ChatClient:
+    """
+    Async client for the OpenRouter chat API, shared for the app's lifetime.
+
+    Keeps a keep-alive connection pool and caps the number of in-flight
+    upstream calls so a burst of chat traffic cannot exhaust sockets.
+    """
+    def __init__(self):
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self._slots = asyncio.Semaphore(CHAT_MAX_CONCURRENCY)
+
+    async def start(self):
+        if self.session is not None and not self.session.closed:
+            return
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=CHAT_POOL_SIZE, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=CHAT_CONNECT_TIMEOUT, sock_read=CHAT_READ_TIMEOUT)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _headers(self, api_key: str) -> dict:
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:3000", # Required by OpenRouter
+            "X-Title": "e-Kanthalloor Portal" # Optional
+        }
+
+    async def _acquire_slot(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=CHAT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ChatUpstreamError("Too many concurrent chat requests")
+
+    async def complete(self, api_key: str, payload: dict) -> dict:
+        """POST a chat completion and return the decoded JSON body."""
+        await self.start()
+        import aiohttp
+        await self._acquire_slot()
+        try:
+            with timed(chat_latency, "complete"):
+                async with self.session.post(OPENROUTER_URL, json=payload, headers=self._headers(api_key)) as response:
+                    if response.status >= 400:
+                        body = await response.text()
+                        raise ChatUpstreamError(f"Upstream returned {response.status}: {body[:500]}")
+                    return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ChatUpstreamError(str(e) or type(e).__name__)
+        finally:
+            self._slots.release()
+
+    async def stream(self, api_key: str, payload: dict) -> AsyncIterator[str]:
+        """POST a streaming chat completion and yield content tokens as they arrive."""
+        await self.start()
+        import aiohttp
+        await self._acquire_slot()
+        start = time.perf_counter()
+        first_token = True
+        outcome = "error"
+        try:
+            async with self.session.post(OPENROUTER_URL, json={**payload, "stream": True}, headers=self._headers(api_key)) as response:
+                if response.status >= 400:
+                    body = await response.text()
+                    raise ChatUpstreamError(f"Upstream returned {response.status}: {body[:500]}")
+
+                # OpenAI-compatible SSE: "data: {...}" lines, terminated by "data: [DONE]"
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    choices = chunk.get("choices") or []
+                    if choices:
+                        token = (choices[0].get("delta") or {}).get("content")
+                        if token:
+                            if first_token:
+                                # Time to first token is what the citizen waits for
+                                chat_latency.observe(time.perf_counter() - start, "stream_first_token", "ok")
+                                first_token = False
+                            yield token
+            outcome = "ok"
+        except GeneratorExit:
+            # The client went away mid-stream
+            outcome = "cancelled"
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ChatUpstreamError(str(e) or type(e).__name__)
+        finally:
+            chat_latency.observe(time.perf_counter() - start, "stream", outcome)
+            self._slots.release()
+
+chat_client = ChatClient()
@@ -0,0 +1,174 @@
+import gzip
+import os
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli # optional: gzip only without it
+except ImportError:
+    brotli = None
+
+# Negotiated compression for API responses. Only JSON-like bodies at least
+# COMPRESSION_MIN_SIZE bytes long are compressed (smaller ones fit in a packet
+# or two anyway); anything already encoded (precompressed static assets),
+# partial (audio ranges) or not text is passed through untouched.
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1400))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+# Bodies with a strong (content-derived) ETag, e.g. the scheme catalog, are compressed once and reused
+COMPRESSED_CACHE_ENTRIES = int(os.getenv("COMPRESSED_CACHE_ENTRIES", 64))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+
+def available_encodings() -> tuple:
+    """Supported content codings, in server preference order."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate(accept_encoding: Optional[str], offered: Iterable[str]) -> Optional[str]:
+    """
+    Pick the coding to use from an Accept-Encoding header (q-values honoured,
+    ties go to the server's order), or None for identity.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for coding in offered:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def compress(data: bytes, coding: str, level: Optional[int] = None) -> bytes:
+    if coding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 keeps the output deterministic for identical input
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+class _StreamCompressor:
+    def __init__(self, coding: str):
+        if coding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self._finish = self._c.process, self._c.finish
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # wbits 31: gzip container
+            self.compress, self._finish = self._c.compress, self._c.flush
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+class CompressionMiddleware:
+    """Pure ASGI, so streaming responses (exports) are compressed as they stream."""
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self._cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.compressed = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding"), available_encodings())
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "").split(";")[0].strip()
+                passthrough = (
+                    message["status"] in (204, 206, 304)
+                    or "content-encoding" in headers
+                    or content_type not in COMPRESSIBLE_TYPES
+                )
+                if not passthrough:
+                    # Whatever the size or the request's codings: caches must key every
+                    # compressible response on Accept-Encoding, not just the compressed ones
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                    passthrough = coding is None
+                if passthrough:
+                    await send(message)
+                else:
+                    start = message # held until we know the body size
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(raw=start["headers"]) if start is not None else None
+
+            if compressor is None and start is not None:
+                if not more_body:
+                    # Whole body in one message
+                    if len(body) < self.minimum_size:
+                        await send(start)
+                        await send(message)
+                        start = None
+                        return
+                    body = self._compress_whole(body, coding, headers.get("etag"))
+                    self._encoded_headers(headers, coding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    start = None
+                    return
+                # Streaming: compress chunk by chunk
+                compressor = _StreamCompressor(coding)
+                self._encoded_headers(headers, coding)
+                del headers["Content-Length"]
+                await send(start)
+                start = None
+
+            if compressor is not None:
+                data = compressor.compress(body)
+                if not more_body:
+                    data += compressor.finish()
+                if data or not more_body:
+                    await send({"type": "http.response.body", "body": data, "more_body": more_body})
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+    def _encoded_headers(self, headers: MutableHeaders, coding: str):
+        headers["Content-Encoding"] = coding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # Same content, different bytes: downgrade to a weak validator (still
+            # matches If-None-Match, which uses weak comparison)
+            headers["ETag"] = "W/" + etag
+        self.compressed += 1
+
+    def _compress_whole(self, body: bytes, coding: str, etag: Optional[str]) -> bytes:
+        if not etag or etag.startswith("W/") or COMPRESSED_CACHE_ENTRIES <= 0:
+            return compress(body, coding)
+        key = (etag, coding, len(body))
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = compress(body, coding)
+            self._cache[key] = cached
+            while len(self._cache) > COMPRESSED_CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return cached
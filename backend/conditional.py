@@ -0,0 +1,64 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+import orjson
+from fastapi import Request, Response
+
+# Conditional GET. ETags are strong and derived from content (never from
+# per-process state such as the catalog version), so every worker hands out the
+# same tag for the same representation and a revalidation can land anywhere.
+
+# Schemes are public and change rarely: shared caches may keep them briefly
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=60")
+# Profiles are per user and must reflect edits at once: cache privately, always revalidate
+PROFILE_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+def document_etag(doc: Optional[dict]) -> str:
+    """ETag for a stored document, without building its response body."""
+    return make_etag(orjson.dumps(doc or {}, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS))
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc) # stored datetimes are naive UTC
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def cache_headers(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    RFC 9110 evaluation for GET/HEAD: If-None-Match wins when present (weak
+    comparison, so a W/ tag from a proxy still matches); If-Modified-Since is
+    only consulted without it.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+        return modified.replace(microsecond=0) <= since
+    return False
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,72 @@
+from typing import Optional
+
+# All dashboard counters live in one document, updated with atomic $inc:
+#   users.<role>, schemes.total, applications.status.<status>, applications.scheme.<scheme_id>
+STATS_ID = "stats"
+
+def _key(value) -> str:
+    # Field names may not contain "." or start with "$"
+    return str(value).replace(".", "_").lstrip("$") or "unknown"
+
+async def increment(storage, changes: dict):
+    changes = {k: v for k, v in changes.items() if v}
+    if changes:
+        await storage.counters.increment(STATS_ID, changes)
+
+async def record_user(storage, role: str, delta: int = 1):
+    await increment(storage, {f"users.{_key(role)}": delta})
+
+async def record_scheme(storage, delta: int = 1):
+    await increment(storage, {"schemes.total": delta})
+
+async def record_application(storage, scheme_id: str, status: str, delta: int = 1):
+    await increment(storage, {
+        f"applications.status.{_key(status)}": delta,
+        f"applications.scheme.{_key(scheme_id)}": delta
+    })
+
+async def record_applications(storage, apps: list):
+    """One $inc for a batch of new applications (write-behind ingest)."""
+    changes = {}
+    for app in apps:
+        for key in (f"applications.status.{_key(app.get('status'))}", f"applications.scheme.{_key(app.get('scheme_id'))}"):
+            changes[key] = changes.get(key, 0) + 1
+    await increment(storage, changes)
+
+async def record_status_change(storage, old_status: Optional[str], new_status: str, count: int = 1):
+    if old_status == new_status:
+        return
+    changes = {f"applications.status.{_key(new_status)}": count}
+    if old_status:
+        changes[f"applications.status.{_key(old_status)}"] = -count
+    await increment(storage, changes)
+
+async def reset_applications(storage):
+    await storage.counters.unset(STATS_ID, "applications")
+
+async def _group_count(repository, field: str) -> dict:
+    return {_key(value): count for value, count in (await repository.count_by(field)).items()}
+
+async def rebuild(storage) -> dict:
+    """Recount everything from the source collections and replace the counters document."""
+    stats = {
+        "_id": STATS_ID,
+        "built": True,
+        "users": await _group_count(storage.users, "role"),
+        "schemes": {"total": await storage.schemes.count()},
+        "applications": {
+            "status": await _group_count(storage.applications, "status"),
+            "scheme": await _group_count(storage.applications, "scheme_id")
+        }
+    }
+    await storage.counters.replace(STATS_ID, stats)
+    print("Counters rebuilt from source collections")
+    return stats
+
+async def read(storage) -> dict:
+    """O(1) read of the counters document; built from source on first use."""
+    stats = await storage.counters.get(STATS_ID)
+    # Increments upserted before the first rebuild only hold partial totals
+    if stats is None or not stats.get("built"):
+        stats = await rebuild(storage)
+    return stats
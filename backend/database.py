@@ -1,4 +1,6 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from indexes import ensure_indexes
+from metrics import mongo_listener
+from storage import MotorStorage, MemoryStorage, STORAGE_BACKEND
 
 import os
 from dotenv import load_dotenv
@@ -9,19 +11,52 @@ MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "kanthalloor_db")
 
 class Database:
-    client: AsyncIOMotorClient = None
+    client = None # AsyncIOMotorClient
     db = None
+    storage = None
+
+    def connect(self):
+        """
+        Create the client and repositories. No I/O: Motor opens connections on
+        the first command, so this never holds up startup or a request.
+        """
+        if self.storage is not None:
+            return
+        if STORAGE_BACKEND == "memory":
+            self.storage = MemoryStorage()
+            print("Using in-memory storage (data is lost on exit)")
+            return
+
+        # Imported here, not with the app: only the Mongo backend needs Motor
+        from motor.motor_asyncio import AsyncIOMotorClient
+        # Every command's duration is recorded for /metrics
+        self.client = AsyncIOMotorClient(MONGODB_URL, event_listeners=[mongo_listener])
+        self.db = self.client[DB_NAME]
+        self.storage = MotorStorage(self.db)
+        print(f"Using MongoDB database {DB_NAME} (connections open on first use)")
+
+    async def warm_up(self):
+        """Open the connection pool and ensure indexes (the app runs this in the background after startup)."""
+        self.connect()
+        if self.db is not None:
+            await ensure_indexes(self.db)
 
     async def connect_to_database(self):
-        self.client = AsyncIOMotorClient(MONGODB_URL)
-        self.db = self.client[DB_NAME]
-        print("Connected to MongoDB")
+        await self.warm_up()
 
     async def close_database_connection(self):
-        self.client.close()
-        print("Closed MongoDB connection")
+        if self.client is not None:
+            self.client.close()
+            print("Closed MongoDB connection")
+        self.client = self.db = self.storage = None
 
 db = Database()
 
 async def get_database():
+    db.connect()
     return db.db
+
+async def get_storage():
+    """Repositories for the configured backend (STORAGE_BACKEND); connects on first use."""
+    db.connect()
+    return db.storage
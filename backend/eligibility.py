@@ -0,0 +1,174 @@
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from generations import generations
+
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", 600))
+# Users whose recommendations are kept; least recently stored ones are dropped past it
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", 10000))
+
+# Beneficiary categories that name an occupation, mapped to the normalized term
+OCCUPATION_TERMS = {
+    "farmer": "farmer",
+    "fisherman": "fisherman",
+    "fisher": "fisherman",
+    "labourer": "labourer",
+    "laborer": "labourer",
+    "worker": "worker",
+    "artisan": "artisan",
+    "weaver": "weaver",
+    "student": "student",
+}
+
+_NUM = r"(\d[\d,]*(?:\.\d+)?)"
+INCOME_CEILING = re.compile(r"income\s*(?:of\s*)?(?:is\s*)?(?:below|less than|under|up ?to|not exceeding|within|<)\s*(?:rs\.?|₹|inr)?\s*" + _NUM + r"\s*(lakhs?|lacs?|crores?)?", re.I)
+AGE_BETWEEN = re.compile(r"(?:age[d]?\s*)?between\s*(\d{1,3})\s*(?:years?\s*)?(?:and|to|-)\s*(\d{1,3})\s*years?", re.I)
+AGE_MIN = re.compile(r"(\d{1,3})\s*(?:years?\s*)?(?:(?:and|or)\s*(?:above|older|more)|\+)|(?:above|over)\s*(?:the\s*age\s*of\s*)?(\d{1,3})\s*years", re.I)
+AGE_MAX = re.compile(r"(?:below|under|less than)\s*(?:the\s*age\s*of\s*)?(\d{1,3})\s*years", re.I)
+
+def _number(raw: str, unit: Optional[str]) -> float:
+    value = float(raw.replace(",", ""))
+    unit = (unit or "").lower()
+    if unit.startswith("la"):
+        value *= 100000
+    elif unit.startswith("cr"):
+        value *= 10000000
+    return value
+
+def _occupation_term(text: str) -> Optional[str]:
+    """Normalize an occupation or category ('Farmers', 'Fishermen') to a known term."""
+    word = text.casefold().strip()
+    for suffix, repl in (("men", "man"), ("ers", "er"), ("ans", "an"), ("s", "")):
+        if word.endswith(suffix) and word[:-len(suffix)] + repl in OCCUPATION_TERMS:
+            word = word[:-len(suffix)] + repl
+            break
+    return OCCUPATION_TERMS.get(word)
+
+def _occupation_terms(texts: Iterable[str]) -> frozenset:
+    terms = set()
+    for text in texts:
+        for word in re.split(r"[^\w]+", text or ""):
+            term = _occupation_term(word)
+            if term:
+                terms.add(term)
+    return frozenset(terms)
+
+def compile_rules(scheme: dict) -> Tuple[float, float, float, frozenset]:
+    """
+    Compile a scheme document into (min_age, max_age, max_income, occupations).
+    Structured `eligibility` fields win; otherwise bounds are parsed from the
+    free-text criteria and beneficiary categories ('Age 60 years or above',
+    'Annual income below Rs 2 Lakhs', 'Senior Citizens (60+)', 'Farmers').
+    """
+    rules = scheme.get("eligibility") or {}
+    categories = scheme.get("beneficiary_category") or []
+    text = " ".join([scheme.get("eligibility_criteria") or ""] + list(categories))
+
+    min_age, max_age, max_income = rules.get("min_age"), rules.get("max_age"), rules.get("max_income")
+
+    between = AGE_BETWEEN.search(text)
+    if between:
+        min_age = min_age if min_age is not None else int(between.group(1))
+        max_age = max_age if max_age is not None else int(between.group(2))
+    if min_age is None:
+        match = AGE_MIN.search(text)
+        if match:
+            min_age = int(match.group(1) or match.group(2))
+    if max_age is None:
+        match = AGE_MAX.search(text)
+        if match:
+            max_age = int(match.group(1))
+    if max_income is None:
+        match = INCOME_CEILING.search(text)
+        if match:
+            max_income = _number(match.group(1), match.group(2))
+
+    occupations = rules.get("occupations")
+    occupations = _occupation_terms(occupations) if occupations else _occupation_terms(categories)
+
+    return (
+        -math.inf if min_age is None else float(min_age),
+        math.inf if max_age is None else float(max_age),
+        math.inf if max_income is None else float(max_income),
+        occupations,
+    )
+
+class EligibilityIndex:
+    """
+    Compiled eligibility predicates for the whole catalog.
+
+    Schemes are bucketed by occupation restriction, so a lookup only visits
+    unrestricted schemes plus those for the citizen's occupation, and checks
+    the numeric bounds in one pass. Unknown citizen values (no info record,
+    no occupation) never exclude a scheme.
+    """
+    def __init__(self, schemes: List[dict]):
+        self.size = len(schemes)
+        # Each entry: (position in catalog order, scheme id, min_age, max_age, max_income)
+        self._unrestricted: List[tuple] = []
+        self._by_occupation: Dict[str, List[tuple]] = {}
+        for position, scheme in enumerate(schemes):
+            min_age, max_age, max_income, occupations = compile_rules(scheme)
+            entry = (position, str(scheme["_id"]), min_age, max_age, max_income)
+            if not occupations:
+                self._unrestricted.append(entry)
+            for term in occupations:
+                self._by_occupation.setdefault(term, []).append(entry)
+
+    def match(self, age: Optional[float] = None, annual_income: Optional[float] = None, occupation: Optional[str] = None) -> List[str]:
+        """Ids of the schemes the citizen qualifies for, in catalog order."""
+        if occupation:
+            terms = _occupation_terms([occupation])
+            candidates = list(self._unrestricted)
+            for term in terms:
+                candidates.extend(self._by_occupation.get(term, []))
+        else:
+            candidates = list(self._unrestricted)
+            for entries in self._by_occupation.values():
+                candidates.extend(entries)
+
+        matched = {}
+        for position, scheme_id, min_age, max_age, max_income in candidates:
+            if age is not None and not (min_age <= age <= max_age):
+                continue
+            if annual_income is not None and annual_income > max_income:
+                continue
+            matched[position] = scheme_id
+        return [matched[p] for p in sorted(matched)]
+
+class RecommendationCache:
+    """
+    Per-user recommendation results, valid until the user's info/profile or
+    the catalog changes. `invalidate` reaches every serve.py worker through
+    the shared generations.
+    """
+    def __init__(self, ttl: float = RECOMMENDATION_CACHE_TTL, max_entries: int = RECOMMENDATION_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # user_id -> (expires_at, catalog_version, generation, body)
+
+    @staticmethod
+    def generation(user_id: str) -> int:
+        """Read before loading the user's info, then pass it to put()."""
+        return generations.of(f"recommendations:{user_id}")
+
+    def get(self, user_id: str, catalog_version: int) -> Optional[bytes]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] < time.monotonic() or entry[1] != catalog_version or entry[2] != self.generation(user_id):
+            return None
+        return entry[3]
+
+    def put(self, user_id: str, catalog_version: int, body: bytes, generation: int):
+        self._entries.pop(user_id, None)
+        self._entries[user_id] = (time.monotonic() + self.ttl, catalog_version, generation, body)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+        generations.bump(f"recommendations:{user_id}")
+
+recommendation_cache = RecommendationCache()
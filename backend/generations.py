@@ -0,0 +1,46 @@
+import zlib
+
+# Invalidation counters for the per-process caches (principals.user_cache,
+# eligibility.recommendation_cache). A cached entry remembers the generation
+# of its key when it was read from storage and is only served while that
+# generation is unchanged; a write bumps the key's generation. Under serve.py
+# the counters live in shared memory (share(), before the fork), so a write
+# handled by one worker invalidates the entry in every worker, as
+# catalog.share does for the scheme catalog.
+
+GENERATION_SLOTS = 1 << 14
+
+class Generations:
+    """
+    Keys hash into a fixed table of counters: two keys sharing a slot only
+    cost each other an extra cache miss, and memory stays constant however
+    many users there are.
+    """
+    def __init__(self, slots: int = GENERATION_SLOTS):
+        self.slots = slots
+        self._counters = [0] * slots
+        self._shared = None # multiprocessing.Array("q", slots)
+
+    def share(self, array):
+        """Use `array` (a multiprocessing.Array("q", slots) created before forking) as the counters."""
+        self._shared = array
+        self._counters = array.get_obj()
+
+    def _slot(self, key: str) -> int:
+        # Not hash(): the slot must be the same in every process
+        return zlib.crc32(key.encode()) % self.slots
+
+    def of(self, key: str) -> int:
+        """Read before fetching the data to cache, so a write landing in between invalidates it."""
+        return self._counters[self._slot(key)]
+
+    def bump(self, key: str):
+        """Call after writing the data behind `key`."""
+        slot = self._slot(key)
+        if self._shared is None:
+            self._counters[slot] += 1
+            return
+        with self._shared.get_lock():
+            self._counters[slot] += 1
+
+generations = Generations()
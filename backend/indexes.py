@@ -0,0 +1,41 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+# Index registry: every index a router query relies on, per collection.
+# Applied idempotently at startup; verify_indexes.py checks the query plans.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING), ("_id", ASCENDING)], name="role_id"),
+    ],
+    # "info" holds one current document per user, read by _id (no secondary index needed)
+    "info_history": [
+        # Audit trail: a user's submissions, newest first
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_history"),
+    ],
+    "applications": [
+        # Admin queue: {"status": ...} sorted by (submission_date, _id) desc
+        IndexModel([("status", ASCENDING), ("submission_date", DESCENDING), ("_id", DESCENDING)], name="status_submitted"),
+        # Citizen history: {"user_id": ...} sorted by (submission_date, _id) desc
+        IndexModel([("user_id", ASCENDING), ("submission_date", DESCENDING), ("_id", DESCENDING)], name="user_submitted_id"),
+        # Export by scheme: {"scheme_id": ...}, optionally with a submission date range (and status)
+        IndexModel([("scheme_id", ASCENDING), ("submission_date", DESCENDING)], name="scheme_submitted"),
+        # Export by submission date range alone (with a status, status_submitted is used)
+        IndexModel([("submission_date", DESCENDING)], name="submitted"),
+    ],
+}
+
+async def ensure_indexes(db):
+    """Create any missing index from the registry. Existing indexes are left untouched."""
+    for collection, models in INDEXES.items():
+        for model in models:
+            name = model.document["name"]
+            try:
+                await db[collection].create_indexes([model])
+            except ConnectionFailure as e:
+                print(f"Could not ensure indexes, MongoDB unreachable: {e}")
+                return
+            except PyMongoError as e:
+                # e.g. duplicate emails already stored: the unique index cannot be built until they are cleaned up
+                print(f"Could not create index {collection}.{name}: {e}")
+        print(f"Indexes ensured on {collection}")
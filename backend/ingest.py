@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError, PyMongoError
+
+load_dotenv()
+
+# "inline" writes each submission before answering; "batched" acknowledges it and writes behind
+INGEST_MODE = os.getenv("INGEST_MODE", "inline")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 5000))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 200))
+# Longest a submission waits in the queue for its batch to fill up
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", 0.05))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", 5))
+
+_STOP = object()
+
+class IngestBusy(Exception):
+    """The write-behind queue is full; the caller should answer 503."""
+    pass
+
+class WriteBehindQueue:
+    """
+    Bounded in-process queue of documents waiting to be inserted.
+
+    `submit` assigns the ObjectId up front so the caller can acknowledge
+    immediately; a single writer task drains the queue with one
+    insert_many per collection, per INGEST_BATCH_SIZE documents or
+    INGEST_FLUSH_INTERVAL seconds, whichever comes first. After a batch is
+    stored, the collection's hooks run once with all of its documents
+    (counters, cache invalidation). `close` drains everything still queued.
+    """
+    def __init__(self, maxsize: int = INGEST_QUEUE_SIZE, batch_size: int = INGEST_BATCH_SIZE, flush_interval: float = INGEST_FLUSH_INTERVAL):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.hooks: Dict[str, List[Callable]] = defaultdict(list)
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._storage = None
+        self._closing = False
+
+    def on_written(self, collection: str, hook: Callable):
+        """Register `async hook(storage, docs)` to run after each batch stored in `collection`."""
+        self.hooks[collection].append(hook)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _start(self, storage):
+        self._storage = storage
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._writer = asyncio.create_task(self._run())
+
+    def submit(self, storage, collection: str, doc: dict) -> ObjectId:
+        """Queue `doc` for insertion and return its _id. Raises IngestBusy when the queue is full."""
+        if self._closing:
+            raise IngestBusy("Server is shutting down")
+        if self._writer is None or self._writer.done():
+            self._start(storage)
+        doc.setdefault("_id", ObjectId())
+        try:
+            self._queue.put_nowait((collection, doc))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise IngestBusy("Submission queue is full")
+        return doc["_id"]
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            # Keep the batch open until it is full or the flush interval is over
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    # Sleep until the next submission or the deadline (a timed-out get leaves the queue untouched)
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    await self._flush(batch)
+                    return
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        by_collection = defaultdict(list)
+        for collection, doc in batch:
+            by_collection[collection].append(doc)
+
+        for collection, docs in by_collection.items():
+            stored = await self._insert(collection, docs)
+            if not stored:
+                continue
+            self.written += len(stored)
+            for hook in self.hooks.get(collection, []):
+                try:
+                    await hook(self._storage, stored)
+                except Exception as e:
+                    print(f"Ingest hook for {collection} failed: {e}")
+        self.batches += 1
+
+    async def _insert(self, collection: str, docs: list) -> list:
+        """insert_many with retries; returns the documents that ended up stored."""
+        for attempt in range(INGEST_MAX_RETRIES + 1):
+            try:
+                await self._storage.repository(collection).insert_many(docs)
+                return docs
+            except BulkWriteError as e:
+                # Duplicate _ids mean the document is already stored by an earlier attempt
+                errors = e.details.get("writeErrors", [])
+                failed = {err["index"] for err in errors if err.get("code") != 11000}
+                self.failed += len(failed)
+                for err in errors:
+                    if err["index"] in failed:
+                        print(f"Ingest dropped a {collection} document: {err.get('errmsg')}")
+                return [d for i, d in enumerate(docs) if i not in failed]
+            except PyMongoError as e:
+                if attempt == INGEST_MAX_RETRIES:
+                    self.failed += len(docs)
+                    print(f"Ingest dropped {len(docs)} {collection} documents: {e}")
+                    return []
+                print(f"Ingest write to {collection} failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 2))
+        return []
+
+    async def close(self):
+        """Stop accepting submissions and wait for the writer to flush everything queued before."""
+        if self._writer is None:
+            return
+        self._closing = True
+        # FIFO: the writer reaches the marker only after every earlier submission
+        await self._queue.put(_STOP)
+        await self._writer
+        self._writer = None
+        print(f"Ingest queue drained: {self.written} documents written in {self.batches} batches")
+
+ingest_queue = WriteBehindQueue()
@@ -0,0 +1,279 @@
+"""
+Load test for the whole API, against an in-process app and a stub chat upstream.
+
+Runs the app with uvicorn on LOADTEST_PORT, in a scratch database
+(LOADTEST_DB_NAME, dropped afterwards) on MONGODB_URL, or in memory with
+STORAGE_BACKEND=memory (no MongoDB needed), and drives it with a
+mix of citizen sessions (register, login, browse and open schemes, submit
+info, recommendations, apply, my applications, chat) and official sessions
+(dashboard stats, pending queue, bulk review, user list). Every request is
+timed per endpoint; the report gives throughput and p50/p95/p99.
+
+  python loadtest.py                                   # run and print the report
+  python loadtest.py --save-baseline loadtest_baseline.json
+  python loadtest.py --baseline loadtest_baseline.json  # exit code 1 on regression
+
+A run is reproducible for a given --seed: the same sessions issue the same
+requests in the same order. An endpoint regresses when its p95 exceeds the
+baseline by more than --threshold (relative) and --min-delta-ms (absolute),
+when its throughput falls by more than --threshold, or when it returns errors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+import aiohttp
+from aiohttp import web
+
+STUB_PORT = int(os.getenv("LOADTEST_STUB_PORT", 18941))
+APP_PORT = int(os.getenv("LOADTEST_PORT", 18942))
+CHAT_DELAY = float(os.getenv("LOADTEST_CHAT_DELAY", 0.2))
+
+# Must be set before the app modules are imported
+os.environ["OPENROUTER_URL"] = f"http://127.0.0.1:{STUB_PORT}/chat/completions"
+os.environ["DEEPSEEK_API_KEY"] = "stub-key"
+os.environ["TRANSLATOR_BACKEND"] = "stub"
+os.environ["DB_NAME"] = os.getenv("LOADTEST_DB_NAME", "kanthalloor_loadtest")
+# Every simulated session comes from 127.0.0.1: per-client limits would only measure themselves
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+import uvicorn
+import main as api
+from main import app
+from database import db
+
+SCHEMES = [
+    ("Old Age Pension", "Age 60 years or above. Annual income below Rs 1 Lakh.", ["Senior Citizens (60+)", "BPL"]),
+    ("Farmer Support", "Must be a landholding farmer family.", ["Farmers"]),
+    ("Student Scholarship", "Applicants aged between 17 and 25 years. Income less than Rs 250000.", ["Students"]),
+    ("Fishermen Relief", "Registered fishermen. Annual income below Rs 2 Lakhs.", ["Fishermen"]),
+    ("Housing Assistance", "Open to all residents of the Panchayat.", ["Homeless families"]),
+]
+QUESTIONS = ["How do I apply for the old age pension?", "Which documents are needed for housing assistance?",
+             "Am I eligible for the farmer support scheme?", "When is the scholarship deadline?"]
+OCCUPATIONS = ["Farmer", "Fisherman", "Student", "Teacher", "Daily wage worker"]
+
+async def stub_completions(request):
+    payload = await request.json()
+    await asyncio.sleep(CHAT_DELAY)
+    if payload.get("stream"):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b'data: {"choices": [{"delta": {"content": "Visit the Panchayat office."}}]}\n\n')
+        await response.write(b"data: [DONE]\n\n")
+        return response
+    return web.json_response({"choices": [{"message": {"content": "Visit the Panchayat office."}}]})
+
+async def start_stub():
+    stub = web.Application()
+    stub.router.add_post("/chat/completions", stub_completions)
+    runner = web.AppRunner(stub)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", STUB_PORT).start()
+    return runner
+
+async def start_app():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    # Measure a warmed-up server, and do not reset the database under the background index build
+    await api.warm_up_task
+    return server, task
+
+class Recorder:
+    """Latencies and error counts per endpoint name."""
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, session, endpoint, method, url, expect=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as resp:
+                body = await resp.read()
+                status = resp.status
+        except aiohttp.ClientError:
+            body, status = b"", 0
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        if status not in expect:
+            self.errors[endpoint] += 1
+            return None
+        return json.loads(body) if body else None
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+async def citizen(rec, session, base, n, rng, iterations):
+    email = f"citizen{n}@loadtest.example"
+    password = "password123"
+    await rec.call(session, "POST /auth/register", "POST", f"{base}/auth/register",
+                   json={"email": email, "full_name": f"Citizen {n}", "password": password, "role": "citizen"})
+    token = await rec.call(session, "POST /auth/token", "POST", f"{base}/auth/token", data={"username": email, "password": password})
+    if not token:
+        return
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    await rec.call(session, "PATCH /auth/profile", "PATCH", f"{base}/auth/profile", headers=headers,
+                   json={"occupation": rng.choice(OCCUPATIONS)})
+
+    for _ in range(iterations):
+        schemes = await rec.call(session, "GET /schemes/", "GET", f"{base}/schemes/", params={"language": rng.choice(["en", "ta", "ml"])}) or []
+        if not schemes:
+            continue
+        scheme = rng.choice(schemes)
+        await rec.call(session, "GET /schemes/{id}", "GET", f"{base}/schemes/{scheme['_id']}")
+        await rec.call(session, "GET /auth/me", "GET", f"{base}/auth/me", headers=headers)
+        await rec.call(session, "POST /info/submit", "POST", f"{base}/info/submit", headers=headers, json={
+            "full_name": f"Citizen {n}", "age": rng.randint(18, 85), "bank_account_no": str(rng.randint(10**9, 10**10)),
+            "aadhaar_no": str(rng.randint(10**11, 10**12)), "phone_number": str(rng.randint(10**9, 10**10)),
+            "annual_income": rng.randint(20, 400) * 1000})
+        await rec.call(session, "GET /info/me", "GET", f"{base}/info/me", headers=headers)
+        await rec.call(session, "GET /schemes/recommended", "GET", f"{base}/schemes/recommended", headers=headers)
+        await rec.call(session, "POST /applications/apply", "POST", f"{base}/applications/apply", headers=headers, json={
+            "scheme_id": scheme["_id"], "scheme_name": scheme["name"], "applicant_name": f"Citizen {n}", "user_id": "self"})
+        await rec.call(session, "GET /applications/my-applications", "GET", f"{base}/applications/my-applications", headers=headers)
+        await rec.call(session, "POST /api/chat", "POST", f"{base}/api/chat", json={"message": rng.choice(QUESTIONS)})
+
+async def official(rec, session, base, n, rng, iterations):
+    email = f"official{n}@loadtest.example"
+    password = "password123"
+    await rec.call(session, "POST /auth/register", "POST", f"{base}/auth/register",
+                   json={"email": email, "full_name": f"Official {n}", "password": password, "role": "admin"})
+    token = await rec.call(session, "POST /auth/token", "POST", f"{base}/auth/token", data={"username": email, "password": password})
+    if not token:
+        return
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    for _ in range(iterations):
+        await rec.call(session, "GET /admin/stats", "GET", f"{base}/admin/stats", headers=headers)
+        pending = await rec.call(session, "GET /admin/applications/pending", "GET", f"{base}/admin/applications/pending",
+                                 headers=headers, params={"limit": 50}) or []
+        if pending:
+            ids = [a["_id"] for a in rng.sample(pending, min(10, len(pending)))]
+            await rec.call(session, "POST /admin/applications/review", "POST", f"{base}/admin/applications/review",
+                           headers=headers, json={"ids": ids, "status": rng.choice(["Verified", "Rejected"])})
+        await rec.call(session, "GET /admin/users", "GET", f"{base}/admin/users", headers=headers, params={"limit": 50})
+        await asyncio.sleep(rng.uniform(0.05, 0.2))
+
+async def seed_schemes(rec, session, base):
+    email, password = "seed-admin@loadtest.example", "password123"
+    await rec.call(session, "setup", "POST", f"{base}/auth/register",
+                   json={"email": email, "full_name": "Seed Admin", "password": password, "role": "admin"})
+    token = await rec.call(session, "setup", "POST", f"{base}/auth/token", data={"username": email, "password": password})
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    for name, criteria, categories in SCHEMES:
+        await rec.call(session, "setup", "POST", f"{base}/schemes/", headers=headers, json={
+            "name": name, "description": f"{name} for residents of Kanthalloor.", "eligibility_criteria": criteria,
+            "benefits": "Monthly assistance", "documents_required": ["Aadhaar", "Ration card"],
+            "application_process": "Apply online or at the Panchayat office.", "department": "Social Justice",
+            "beneficiary_category": categories})
+
+async def run(args):
+    stub_runner = await start_stub()
+    server, server_task = await start_app()
+    base = f"http://127.0.0.1:{APP_PORT}"
+    rec = Recorder()
+    try:
+        # Start from an empty scratch database (indexes included, as at startup)
+        await db.storage.reset()
+        connector = aiohttp.TCPConnector(limit=args.citizens + args.officials + 10)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await seed_schemes(rec, session, base)
+            setup_errors = rec.errors.pop("setup", 0)
+            rec.latencies.pop("setup", None)
+            if setup_errors:
+                raise RuntimeError("Could not seed the scratch database")
+
+            start = time.perf_counter()
+            sessions = [citizen(rec, session, base, i, random.Random(args.seed * 100003 + i), args.iterations)
+                        for i in range(args.citizens)]
+            sessions += [official(rec, session, base, i, random.Random(args.seed * 200003 + i), args.iterations)
+                         for i in range(args.officials)]
+            await asyncio.gather(*sessions)
+            elapsed = time.perf_counter() - start
+    finally:
+        await db.storage.reset()
+        server.should_exit = True
+        await server_task
+        await stub_runner.cleanup()
+
+    results = {}
+    for endpoint, values in sorted(rec.latencies.items()):
+        values.sort()
+        results[endpoint] = {
+            "requests": len(values),
+            "errors": rec.errors.get(endpoint, 0),
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    return {"config": vars(args).copy(), "elapsed_s": elapsed, "endpoints": results}
+
+def print_report(report):
+    config = report["config"]
+    print(f"\n{config['citizens']} citizens + {config['officials']} officials, {config['iterations']} iterations each, "
+          f"seed {config['seed']}, {report['elapsed_s']:.1f}s\n")
+    print(f"{'endpoint':<38} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, r in report["endpoints"].items():
+        print(f"{endpoint:<38} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+def compare(report, baseline, threshold, min_delta_ms):
+    """Returns the list of regressions against the baseline report."""
+    regressions = []
+    for endpoint, r in report["endpoints"].items():
+        if r["errors"]:
+            regressions.append(f"{endpoint}: {r['errors']} errors")
+        base = baseline["endpoints"].get(endpoint)
+        if base is None:
+            continue
+        p95_limit = max(base["p95_ms"] * (1 + threshold), base["p95_ms"] + min_delta_ms)
+        if r["p95_ms"] > p95_limit:
+            regressions.append(f"{endpoint}: p95 {r['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+        if r["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{endpoint}: {r['rps']:.1f} req/s vs baseline {base['rps']:.1f} req/s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against an in-process app.")
+    parser.add_argument("--citizens", type=int, default=50)
+    parser.add_argument("--officials", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=5, help="scenario loops per session")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="p95 increases below this are treated as noise")
+    args = parser.parse_args()
+
+    config = {k: v for k, v in vars(args).items() if k in ("citizens", "officials", "iterations", "seed")}
+    report = asyncio.run(run(argparse.Namespace(**config)))
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != report["config"]:
+            print(f"\n[WARN] baseline was recorded with {baseline['config']}")
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("\n[FAIL] regressions against baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n[OK] no regression against baseline")
+
+if __name__ == "__main__":
+    main()
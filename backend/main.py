@@ -1,10 +1,25 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import db
-from routers import auth, schemes, admin, chat, info, applications
+from catalog import scheme_catalog
+from chat_client import chat_client
+from security import password_hasher
+from translation import translation_pipeline
+from tts import voice_cache
+from ingest import ingest_queue
+from storage import STORAGE_BACKEND
+from metrics import MetricsMiddleware, registry
+from responses import ORJSONResponse
+from compression import CompressionMiddleware
+from ratelimit import AdmissionMiddleware, RateLimitMiddleware
+from assets import StaticAssets, FRONTEND_DIR
+from routers import auth, schemes, admin, chat, info, applications, export, metrics
+import asyncio
+import importlib
 import os
 
-app = FastAPI(title="Kanthalloor Digital Governance Platform")
+# Endpoints returning plain data are rendered with orjson; hot ones return responses.json_response/model_response directly
+app = FastAPI(title="Kanthalloor Digital Governance Platform", default_response_class=ORJSONResponse)
 
 # CORS Setup
 origins = [
@@ -21,21 +36,32 @@ origins = [
     "*"
 ]
 
+# Large JSON responses are compressed per Accept-Encoding (static assets come precompressed)
+app.add_middleware(CompressionMiddleware)
+# Sheds requests past ADMISSION_MAX_IN_FLIGHT with 503; inside CORS so browsers can read the error
+app.add_middleware(AdmissionMiddleware)
+# Per-IP/per-user limits on login and chat (ratelimit.ROUTE_POLICIES); rejected requests never take an admission slot
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Outermost, so recorded latency covers CORS and error handling too
+app.add_middleware(MetricsMiddleware)
 
 # Includes
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(schemes.router, prefix="/schemes", tags=["Schemes"])
 app.include_router(admin.router, prefix="/admin", tags=["Admin"])
+app.include_router(export.router, prefix="/admin/export", tags=["Admin"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
 app.include_router(info.router, prefix="/info", tags=["Info"])
 app.include_router(applications.router, prefix="/applications", tags=["Applications"])
+app.include_router(metrics.router, tags=["Metrics"])
 
 # Mount Static & Frontend (Only if directories exist)
 from fastapi.staticfiles import StaticFiles
@@ -43,13 +69,75 @@ from fastapi.staticfiles import StaticFiles
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Client libraries the routes import on first use instead of at startup (profile_startup.py shows
+# what each costs). warm_up loads them in the background; serve.py loads them before forking.
+DEFERRED_IMPORTS = ("aiohttp", "jose.jwt", "passlib.context", "bcrypt")
+
+def load_deferred():
+    """The CPU-bound part of warming up: deferred imports and the frontend bundle."""
+    for name in DEFERRED_IMPORTS:
+        importlib.import_module(name)
+    if STORAGE_BACKEND == "mongo":
+        importlib.import_module("motor.motor_asyncio")
+    if frontend is not None:
+        frontend.bundle
+
+async def warm_up():
+    """
+    What the first requests would otherwise wait for, done after the server is
+    already accepting them: imports and the frontend bundle (on a thread, so
+    the event loop keeps serving), the MongoDB pool and indexes, the scheme
+    catalog and the chat client. A request that arrives first simply does
+    its part itself.
+    """
+    await asyncio.to_thread(load_deferred)
+    try:
+        await db.warm_up()
+        # Under serve.py this adopts the snapshot the master published
+        await scheme_catalog.ensure_fresh(db.storage)
+        # Translate anything added while the server was down (e.g. by seed_db.py); once, not in every worker
+        if os.getenv("SERVE_WORKER", "0") == "0":
+            await translation_pipeline.backfill(db.storage)
+    except Exception as e:
+        # Not fatal: the catalog is loaded lazily on the first /schemes request
+        print(f"Could not warm up storage and scheme catalog: {e}")
+    await chat_client.start()
+
+warm_up_task = None
+metrics_dump_task = None
+
 @app.on_event("startup")
 async def startup_db_client():
-    await db.connect_to_database()
+    global warm_up_task, metrics_dump_task
+    # Nothing here waits on I/O, so the server starts accepting requests at once;
+    # the storage client is created by warm_up, or by the first request needing it
+    warm_up_task = asyncio.create_task(warm_up())
+    if registry.directory is not None:
+        # Under serve.py: publish this worker's metrics for scrapes answered by the others
+        metrics_dump_task = asyncio.create_task(registry.dump_periodically())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+        try:
+            await warm_up_task
+        except (asyncio.CancelledError, Exception):
+            pass
+    if metrics_dump_task is not None:
+        metrics_dump_task.cancel()
+    # Write out queued submissions while the database is still connected
+    await ingest_queue.close()
+    await translation_pipeline.close()
+    await chat_client.close()
+    password_hasher.shutdown()
+    voice_cache.shutdown()
     await db.close_database_connection()
+    # Final values, so counts since the last periodic write are not lost
+    registry.dump()
 
-if os.path.exists("../frontend"):
-    app.mount("/", StaticFiles(directory="../frontend", html=True), name="frontend")
+frontend = None
+if os.path.exists(FRONTEND_DIR):
+    # Fingerprinted, precompressed copies of the frontend, built in memory by load_deferred
+    frontend = StaticAssets(FRONTEND_DIR)
+    app.mount("/", frontend, name="frontend")
@@ -0,0 +1,308 @@
+import asyncio
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import orjson
+from pymongo import monitoring
+
+# Under serve.py: seconds between two writes of a worker's metrics to the shared directory
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", 5))
+
+# Latency buckets in seconds, shared by every histogram
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self.values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, *labels, value: float):
+        """Mirror a total another component keeps itself (from a collector); for a Counter it must only grow."""
+        with self._lock:
+            self.values[labels] = value
+
+    def render(self, values: Optional[dict] = None, label_names: Optional[Tuple[str, ...]] = None) -> List[str]:
+        values = self.values if values is None else values
+        label_names = label_names or self.label_names
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(label_names, labels)} {value}")
+        return lines
+
+class Gauge(Counter):
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self, values: Optional[dict] = None, label_names: Optional[Tuple[str, ...]] = None) -> List[str]:
+        lines = super().render(values, label_names)
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help, labels, buckets
+        # labels -> [per-bucket counts (+Inf last), sum]
+        self.values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self, values: Optional[dict] = None) -> List[str]:
+        values = self.values if values is None else values
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    """
+    Holds every metric and renders them in the Prometheus text exposition format.
+
+    Under serve.py (share()), every worker writes its values to
+    <directory>/<pid>.json (at each scrape, every METRICS_DUMP_INTERVAL and at
+    shutdown), and a scrape answered by any worker renders all of them:
+    counters and histograms summed over every worker that ever ran (exited
+    ones included, so totals never go backwards when a worker is replaced),
+    gauges per live worker with a `worker` label. Other workers' values are
+    at most METRICS_DUMP_INTERVAL old.
+    """
+    def __init__(self):
+        self.metrics = []
+        # Callables run at scrape time to refresh metrics that mirror other components' state
+        self.collectors: List[Callable[[], None]] = []
+        self.directory: Optional[str] = None
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def share(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def clear(self):
+        """Forget recorded values, e.g. in a worker forked from a master that recorded its own."""
+        for metric in self.metrics:
+            with metric._lock:
+                metric.values.clear()
+
+    def _collect(self):
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+    def dump(self):
+        """Write this process's values to the shared directory (no-op unless shared)."""
+        if self.directory is None:
+            return
+        self._collect()
+        state = {}
+        for metric in self.metrics:
+            with metric._lock:
+                state[metric.name] = [[list(labels), value] for labels, value in metric.values.items()]
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(state))
+        os.replace(tmp_path, path)
+
+    async def dump_periodically(self, interval: float = METRICS_DUMP_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"Could not write metrics: {e}")
+
+    def _merged(self) -> Dict[str, dict]:
+        merged = {metric.name: {} for metric in self.metrics}
+        kinds = {metric.name: metric for metric in self.metrics}
+        for entry in os.listdir(self.directory):
+            if not entry.endswith(".json"):
+                continue
+            pid = entry[:-len(".json")]
+            try:
+                with open(os.path.join(self.directory, entry), "rb") as f:
+                    state = orjson.loads(f.read())
+            except (OSError, ValueError):
+                continue
+            alive = _alive(int(pid))
+            for name, series in state.items():
+                metric = kinds.get(name)
+                if metric is None:
+                    continue
+                values = merged[name]
+                for labels, value in series:
+                    labels = tuple(labels)
+                    if isinstance(metric, Gauge):
+                        if alive:
+                            values[labels + (pid,)] = value
+                    elif isinstance(metric, Histogram):
+                        total = values.setdefault(labels, [[0] * len(value[0]), 0.0])
+                        total[0] = [a + b for a, b in zip(total[0], value[0])]
+                        total[1] += value[1]
+                    else:
+                        values[labels] = values.get(labels, 0) + value
+        return merged
+
+    def render(self) -> str:
+        lines = []
+        if self.directory is None:
+            self._collect()
+            for metric in self.metrics:
+                lines.extend(metric.render())
+        else:
+            self.dump()
+            merged = self._merged()
+            for metric in self.metrics:
+                if isinstance(metric, Gauge):
+                    lines.extend(metric.render(merged[metric.name], metric.label_names + ("worker",)))
+                else:
+                    lines.extend(metric.render(merged[metric.name]))
+        return "\n".join(lines) + "\n"
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route and method.", ("route", "method")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served, by route.", ("route",)))
+mongo_latency = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command.", ("collection", "command")))
+mongo_failures = registry.register(Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection and command.", ("collection", "command")))
+chat_latency = registry.register(Histogram(
+    "chat_upstream_duration_seconds", "Outbound chat API call duration by call type and outcome.", ("call", "outcome")))
+app_gauges = registry.register(Gauge(
+    "app_component_value", "Internal queue depths and cache sizes, by component and field.", ("component", "field")))
+app_counters = registry.register(Counter(
+    "app_component_events_total", "Internal event totals (writes, rejections, cache hits...), by component and field.", ("component", "field")))
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Static mounts and 404s: keep the label set bounded
+    return "static" if scope.get("endpoint") is not None else "unmatched"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status counts and in-flight
+    requests. The route label is the path template ("/schemes/{scheme_id}"),
+    filled in by the router, so ids never explode the label set.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = [500]
+        in_flight_route = "pending"
+        http_in_flight.inc(in_flight_route)
+
+        async def send_wrapper(message):
+            nonlocal in_flight_route
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                # Routing is done by now: move the request to its real route
+                route = _route_label(scope)
+                http_in_flight.dec(in_flight_route)
+                http_in_flight.inc(route)
+                in_flight_route = route
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_label(scope)
+            http_in_flight.dec(in_flight_route)
+            http_requests.inc(route, scope["method"], str(status[0]))
+            http_latency.observe(time.perf_counter() - start, route, scope["method"])
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Records every MongoDB command's duration by collection and command name.
+    Called on Motor's worker threads, hence the locking in the metrics.
+    """
+    def __init__(self):
+        self._collections: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        # getMore names the cursor id, not the collection
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        with self._lock:
+            self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _pop(self, event) -> str:
+        with self._lock:
+            return self._collections.pop((event.connection_id, event.request_id), "-")
+
+    def succeeded(self, event):
+        mongo_latency.observe(event.duration_micros / 1e6, self._pop(event), event.command_name)
+
+    def failed(self, event):
+        collection = self._pop(event)
+        mongo_latency.observe(event.duration_micros / 1e6, collection, event.command_name)
+        mongo_failures.inc(collection, event.command_name)
+
+mongo_listener = MongoCommandListener()
+
+class timed:
+    """`with timed(chat_latency, "complete"):` records the block's duration with outcome ok/error."""
+    def __init__(self, histogram: Histogram, *labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels, "error" if exc_type else "ok")
+        return False
@@ -0,0 +1,117 @@
+"""
+One-time migration: split personal info into current snapshots plus history.
+
+Before, every submission was its own document in `info` (ObjectId _id) and
+readers picked the newest with find_one(sort=created_at desc). After:
+  - `info_history` holds every submission, unchanged (same _id);
+  - `info` holds one document per user, _id = user id, the newest submission
+    plus `history_id` pointing at it.
+
+Safe to re-run and to run while the API is up: history copies skip documents
+already there, snapshots never replace a newer one, and only legacy
+(ObjectId-keyed) documents are removed from `info`.
+
+Usage: python migrate_info_history.py [--dry-run]
+"""
+import asyncio
+import sys
+from pymongo.errors import BulkWriteError, OperationFailure
+from database import db
+from indexes import ensure_indexes
+from storage import MotorStorage, STORAGE_BACKEND
+
+BATCH_SIZE = 1000
+LEGACY = {"_id": {"$type": "objectId"}}
+OLD_INDEX = "user_latest"
+
+async def copy_history(info, history) -> int:
+    copied = 0
+    batch = []
+
+    async def flush():
+        nonlocal copied
+        try:
+            await history.insert_many(batch, ordered=False)
+            copied += len(batch)
+        except BulkWriteError as e:
+            # Already copied by an earlier run
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != 11000 for err in errors):
+                raise
+            copied += len(batch) - len(errors)
+        batch.clear()
+
+    async for doc in info.find(LEGACY).sort("_id", 1).batch_size(BATCH_SIZE):
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    return copied
+
+async def write_snapshots(info, repository) -> int:
+    # Newest legacy submission per user; set_current keeps any newer snapshot written meanwhile
+    pipeline = [
+        {"$match": {**LEGACY, "user_id": {"$ne": None}}},
+        {"$sort": {"user_id": 1, "created_at": -1}},
+        {"$group": {"_id": "$user_id", "doc": {"$first": "$$ROOT"}}},
+    ]
+    written = 0
+    batch = []
+    async for row in info.aggregate(pipeline, allowDiskUse=True):
+        batch.append(row["doc"])
+        if len(batch) >= BATCH_SIZE:
+            await repository.set_current(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        await repository.set_current(batch)
+        written += len(batch)
+    return written
+
+async def migrate(dry_run: bool) -> bool:
+    if STORAGE_BACKEND == "memory":
+        print("STORAGE_BACKEND=memory: nothing to migrate")
+        return True
+
+    await db.connect_to_database()
+    storage = MotorStorage(db.db)
+    info, history = db.db["info"], db.db["info_history"]
+
+    legacy = await info.count_documents(LEGACY)
+    users = len(await info.distinct("user_id", LEGACY))
+    print(f"{legacy} legacy info documents for {users} users")
+    if dry_run:
+        print(f"Dry run: would copy {legacy} documents to info_history and keep {users} current documents in info")
+        await db.close_database_connection()
+        return True
+
+    copied = await copy_history(info, history)
+    print(f"Copied {copied} documents to info_history")
+    written = await write_snapshots(info, storage.info)
+    print(f"Wrote current info for {written} users")
+
+    # Every legacy document now lives in info_history: drop it only if its copy is there
+    removed = 0
+    async for doc in info.find(LEGACY, {"_id": 1}).batch_size(BATCH_SIZE):
+        if await history.count_documents({"_id": doc["_id"]}, limit=1):
+            removed += (await info.delete_one({"_id": doc["_id"]})).deleted_count
+    print(f"Removed {removed} legacy documents from info")
+
+    try:
+        await info.drop_index(OLD_INDEX)
+        print(f"Dropped index info.{OLD_INDEX}")
+    except OperationFailure:
+        pass # already gone
+    await ensure_indexes(db.db)
+
+    remaining = await info.count_documents(LEGACY)
+    await db.close_database_connection()
+    if remaining:
+        print(f"[FAIL] {remaining} legacy documents left in info")
+        return False
+    print("[OK] info migrated")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(migrate("--dry-run" in sys.argv)) else 1)
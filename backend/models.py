@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, BeforeValidator
-from typing import Optional, List, Any, Annotated
+from typing import Optional, List, Any, Annotated, Literal
 from datetime import datetime
 from bson import ObjectId
 
@@ -37,16 +37,26 @@ class UserInDB(UserBase):
     is_active: bool = True
 
 class User(UserBase):
+    # Read model only: stored emails were validated at registration, re-checking them dominated serialization
+    email: str
     id: Optional[PyObjectId] = Field(None, alias="_id")
     class Config:
         populate_by_name = True
         json_encoders = {ObjectId: str}
 
+class EligibilityRules(BaseModel):
+    # Structured rules; any field left out is parsed from eligibility_criteria when possible
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    max_income: Optional[float] = None # Annual income ceiling in Rs
+    occupations: List[str] = [] # e.g. ["Farmer"]; empty = any occupation
+
 class SchemeBase(BaseModel):
     name: str
     description: str # Purpose
     beneficiary_category: List[str] # e.g. ["Farmers", "Women"]
     eligibility_criteria: str # Simple text explanation
+    eligibility: Optional[EligibilityRules] = None # Machine-readable version of eligibility_criteria
     documents_required: List[str] # List of docs
     benefits: str # What do they get?
     application_process: str # Offline guidance
@@ -89,3 +99,7 @@ class Application(BaseModel):
     class Config:
         populate_by_name = True
         json_encoders = {ObjectId: str}
+
+class ApplicationReview(BaseModel):
+    ids: List[str] # Application ids to review in one batch
+    status: Literal["Verified", "Rejected"]
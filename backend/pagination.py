@@ -0,0 +1,80 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+from bson import ObjectId
+from fastapi import HTTPException, Response
+
+# Keyset pagination on (sort key, _id). The cursor is opaque to clients: the
+# sort value and _id of the last row of the page, base64-encoded. The next page
+# filters strictly past that row, so page N costs the same index seek as page 1.
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value):
+    if isinstance(value, ObjectId):
+        return {"oid": str(value)}
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return {"v": value}
+
+def _decode_value(raw: dict):
+    if "oid" in raw:
+        return ObjectId(raw["oid"])
+    if "dt" in raw:
+        return datetime.fromisoformat(raw["dt"])
+    return raw["v"]
+
+def encode_cursor(doc: dict, sort_field: str = "_id") -> str:
+    payload = {"id": _encode_value(doc["_id"])}
+    if sort_field != "_id":
+        payload["k"] = _encode_value(doc.get(sort_field))
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_cursor(cursor: str, sort_field: str = "_id") -> Tuple[object, object]:
+    """Return (sort value, _id) of the row the cursor points at."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = _decode_value(payload["id"])
+        last_value = _decode_value(payload["k"]) if sort_field != "_id" else last_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_value, last_id
+
+def apply_cursor(query: dict, cursor: Optional[str], sort_field: str = "_id", direction: int = -1) -> dict:
+    """Add the keyset condition for `cursor` to `query` (sorted by sort_field then _id, both in `direction`)."""
+    if not cursor:
+        return query
+
+    last_value, last_id = decode_cursor(cursor, sort_field)
+    op = "$lt" if direction < 0 else "$gt"
+    if sort_field == "_id":
+        keyset = {"_id": {op: last_id}}
+    else:
+        keyset = {"$or": [
+            {sort_field: {op: last_value}},
+            {sort_field: last_value, "_id": {op: last_id}},
+        ]}
+
+    if not query:
+        return keyset
+    if "$or" in keyset and "$or" in query:
+        return {"$and": [query, keyset]}
+    return {**query, **keyset}
+
+def sort_spec(sort_field: str = "_id", direction: int = -1) -> list:
+    if sort_field == "_id":
+        return [("_id", direction)]
+    return [(sort_field, direction), ("_id", direction)]
+
+def finish_page(docs: list, limit: int, response: Response, sort_field: str = "_id") -> list:
+    """
+    Trim a result fetched with `limit + 1` to `limit` and, when more rows exist,
+    expose the cursor for the next page in the X-Next-Cursor header.
+    """
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(docs[-1], sort_field)
+    return docs
@@ -0,0 +1,50 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from generations import generations
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 30))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+
+class UserCache:
+    """
+    Short-TTL, in-process cache of user documents keyed by email (the JWT `sub`).
+
+    Lets the resolved-user dependency skip the users lookup on most
+    authenticated calls. Any write to a user document must call `invalidate`,
+    which reaches every serve.py worker through the shared generations.
+    """
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # email -> (expires_at, generation, user_doc)
+
+    @staticmethod
+    def generation(email: str) -> int:
+        """Read before loading the user document, then pass it to put()."""
+        return generations.of(f"user:{email}")
+
+    def get(self, email: str) -> Optional[dict]:
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic() or entry[1] != self.generation(email):
+            del self._entries[email]
+            return None
+        return entry[2]
+
+    def put(self, email: str, user_doc: dict, generation: int):
+        self._entries.pop(email, None)
+        self._entries[email] = (time.monotonic() + self.ttl, generation, user_doc)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        self._entries.pop(email, None)
+        generations.bump(f"user:{email}")
+
+    def clear(self):
+        self._entries.clear()
+
+user_cache = UserCache()
@@ -0,0 +1,171 @@
+"""
+Startup profile: where a cold start spends its time.
+
+  1. `import main` under `python -X importtime`, in fresh interpreters (median
+     of --runs): the total, the time per package (self time of all its
+     modules), the first-party modules (cumulative, i.e. with what they pull
+     in) and the slowest single modules.
+  2. What the libraries the app imports on first use (main.DEFERRED_IMPORTS)
+     would add to the import if they were loaded eagerly.
+  3. Cold start: from spawning uvicorn to the first 200 from GET /schemes/
+     (in-memory backend), and to the first GET /metrics.
+
+Usage: python profile_startup.py [--runs N] [--top N] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COLD_START_PORT = 18981
+
+def first_party() -> set:
+    names = set()
+    for entry in os.listdir(HERE):
+        if entry.endswith(".py"):
+            names.add(entry[:-3])
+        elif os.path.isfile(os.path.join(HERE, entry, "__init__.py")):
+            names.add(entry)
+    return names
+
+def importtime(code: str) -> list:
+    """[(level, module, self_us, cumulative_us)] in the order Python reports them (children before parents)."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "0"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=HERE, env=env,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        indented = name[1:]
+        level = (len(indented) - len(indented.lstrip(" "))) // 2
+        rows.append((level, indented.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def median_profile(code: str, runs: int) -> dict:
+    """module -> (median self us, median cumulative us, level in the first run)"""
+    samples = defaultdict(lambda: ([], []))
+    levels = {}
+    for _ in range(runs):
+        for level, module, self_us, cumulative_us in importtime(code):
+            samples[module][0].append(self_us)
+            samples[module][1].append(cumulative_us)
+            levels.setdefault(module, level)
+    return {m: (statistics.median(s), statistics.median(c), levels[m]) for m, (s, c) in samples.items()}
+
+def ms(us: float) -> str:
+    return f"{us / 1000:8.1f} ms"
+
+def import_report(runs: int, top: int) -> dict:
+    profile = median_profile("import main", runs)
+    ours = first_party()
+    total = profile["main"][1]
+
+    packages = defaultdict(float)
+    for module, (self_us, _, _) in profile.items():
+        packages[module.split(".")[0]] += self_us
+
+    print(f"1. import main: {total / 1000:.1f} ms (median of {runs} runs, {len(profile)} modules)\n")
+    print("   By package (self time of all its modules)")
+    for package, self_us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        tag = "  (first-party)" if package in ours else ""
+        print(f"     {package:<28}{ms(self_us)}  {self_us / total:6.1%}{tag}")
+
+    print("\n   First-party modules (cumulative: with the modules they import first)")
+    for module, (self_us, cumulative_us, _) in sorted(profile.items(), key=lambda kv: -kv[1][1]):
+        if module.split(".")[0] in ours and module != "main" and cumulative_us >= 1000:
+            print(f"     {module:<28}{ms(cumulative_us)}   self {ms(self_us)}")
+    print(f"     {'main (own body)':<28}{ms(profile['main'][0])}")
+
+    print("\n   Slowest modules (self time)")
+    for module, (self_us, _, _) in sorted(profile.items(), key=lambda kv: -kv[1][0])[:top]:
+        print(f"     {module:<40}{ms(self_us)}")
+
+    return {"import_main_ms": total / 1000, "packages_ms": {p: us / 1000 for p, us in packages.items()}}
+
+def deferred_report(runs: int) -> dict:
+    listed = subprocess.run([sys.executable, "-c", "import main; print(' '.join(main.DEFERRED_IMPORTS))"],
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    modules = listed.stdout.strip().splitlines()[-1].split() + ["motor.motor_asyncio"]
+    code = "import main\n" + "\n".join(f"import {m}" for m in modules)
+    samples = defaultdict(list)
+    for _ in range(runs):
+        # After main, the top-level rows up to and including a module's own row are what importing it adds
+        rows = importtime(code)
+        rows = rows[next(i for i, row in enumerate(rows) if row[1] == "main") + 1:]
+        pending = iter(modules)
+        current, added = next(pending), 0
+        for level, module, _, cumulative_us in rows:
+            if level == 0:
+                added += cumulative_us
+                if module == current:
+                    samples[current].append(added)
+                    current, added = next(pending, None), 0
+    eager = [m for m in modules if m in {row[1] for row in importtime("import main")}]
+
+    print("\n2. Imported on first use (main.DEFERRED_IMPORTS, and Motor with STORAGE_BACKEND=mongo)")
+    costs = {m: statistics.median(samples[m]) / 1000 if samples[m] else 0.0 for m in modules}
+    for module, cost in costs.items():
+        print(f"     {module:<28}{ms(cost * 1000)}")
+    print(f"     {'kept off the import':<28}{ms(sum(costs.values()) * 1000)}")
+    if eager:
+        print(f"   [!] still imported by main: {', '.join(eager)}")
+    return {"deferred_ms": costs, "still_eager": eager}
+
+def wait_for(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.002)
+    return False
+
+def cold_start_report(runs: int) -> dict:
+    env = {**os.environ, "STORAGE_BACKEND": "memory", "TRANSLATOR_BACKEND": "stub"}
+    base = f"http://127.0.0.1:{COLD_START_PORT}"
+    first_response, metrics = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(COLD_START_PORT), "--log-level", "warning"],
+            cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for(f"{base}/schemes/", start + 60):
+                raise RuntimeError("server did not answer within 60s")
+            first_response.append(time.perf_counter() - start)
+            with urllib.request.urlopen(f"{base}/metrics", timeout=5):
+                metrics.append(time.perf_counter() - start)
+        finally:
+            server.terminate()
+            server.wait(30)
+    first = statistics.median(first_response) * 1000
+    print(f"\n3. Cold start (uvicorn, in-memory backend, median of {runs} runs)")
+    print(f"     spawn -> first 200 from GET /schemes/  {first:8.1f} ms")
+    print(f"     spawn -> GET /metrics answered         {statistics.median(metrics) * 1000:8.1f} ms")
+    return {"cold_start_first_response_ms": first}
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the API's import and cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="also write the numbers to this file")
+    args = parser.parse_args()
+
+    report = import_report(args.runs, args.top)
+    report.update(deferred_report(args.runs))
+    report.update(cold_start_report(args.runs))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from responses import ORJSONResponse
+from security import decode_access_token
+
+# Rate limiting for the expensive routes (login is bcrypt-bound, chat is
+# upstream-bound) plus a global admission limit. All state is in process
+# memory: with several workers each one enforces the limits on its own share
+# of the traffic.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+# Policies as "<requests>/<second|minute|hour>": that many requests at once, refilled evenly over the period
+RATE_LIMITS = {
+    "login": os.getenv("LOGIN_RATE_LIMIT", "20/minute"),                 # per client IP
+    "login_account": os.getenv("LOGIN_ACCOUNT_RATE_LIMIT", "5/minute"),  # failed attempts per email
+    "chat": os.getenv("CHAT_RATE_LIMIT", "30/minute"),                   # per client IP
+    "chat_user": os.getenv("CHAT_USER_RATE_LIMIT", "10/minute"),         # per signed-in user
+}
+# Per-route policies, checked before the request reaches the router: (method, path) -> (per-IP, per-user or None)
+ROUTE_POLICIES = {
+    ("POST", "/auth/token"): ("login", None),
+    ("POST", "/api/chat"): ("chat", "chat_user"),
+    ("POST", "/api/chat/stream"): ("chat", "chat_user"),
+}
+# Password checks one client IP may have running at once; more get 429 before reaching the bcrypt pool,
+# so a guessing client holds at most this much of the hashing capacity however fast it sends
+LOGIN_MAX_IN_FLIGHT_PER_IP = int(os.getenv("LOGIN_MAX_IN_FLIGHT_PER_IP", 1))
+# Upper bound on tracked keys; least recently seen keys go first past it
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+# Behind a reverse proxy: take the client IP from the last X-Forwarded-For hop
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "0") == "1"
+
+# Requests served at once before new ones are turned away with 503 (0 disables)
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 256))
+# Never shed, so monitoring keeps working when the server is saturated
+ADMISSION_EXEMPT_PATHS = ("/metrics",)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+TOO_MANY_REQUESTS = "Too many requests, please try again later"
+
+def _retry_after(wait: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(wait)))}
+
+def parse_rate(spec: str) -> Tuple[int, float]:
+    """"10/minute" -> (10, 60.0)"""
+    count, _, period = spec.partition("/")
+    return int(count), float(PERIODS[period.strip().lower()])
+
+class RatePolicy:
+    __slots__ = ("name", "burst", "rate")
+
+    def __init__(self, name: str, spec: str):
+        count, seconds = parse_rate(spec)
+        self.name = name
+        self.burst = count
+        self.rate = count / seconds # tokens per second
+
+class RateLimiter:
+    """
+    Token buckets keyed by (policy, key), e.g. ("login", "203.0.113.7").
+
+    A bucket holds up to `burst` tokens, refilled at `rate` per second; each
+    request takes one. Buckets are kept in least-recently-used order and
+    dropped once idle long enough to have refilled completely, since a full
+    bucket is the same as no bucket, so memory only holds recently active keys.
+    """
+    def __init__(self, policies: Dict[str, str] = RATE_LIMITS, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.policies = {name: RatePolicy(name, spec) for name, spec in policies.items()}
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[tuple, list]" = OrderedDict() # (policy, key) -> [tokens, updated_at]
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def hit(self, policy_name: str, key: str, now: Optional[float] = None) -> float:
+        """Take a token: 0 when the request may proceed, else the seconds until it could."""
+        policy = self.policies[policy_name]
+        now = time.monotonic() if now is None else now
+        bucket_key = (policy_name, key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = self._buckets[bucket_key] = [policy.burst, now]
+        else:
+            self._buckets.move_to_end(bucket_key)
+            bucket[0] = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed += 1
+            wait = 0.0
+        else:
+            self.limited += 1
+            wait = (1 - bucket[0]) / policy.rate
+        # After taking the token: a new bucket is full until then
+        self._evict(now)
+        return wait
+
+    def _evict(self, now: float):
+        while self._buckets:
+            (name, _), (tokens, updated) = next(iter(self._buckets.items()))
+            policy = self.policies[name]
+            if len(self._buckets) <= self.max_keys and tokens + (now - updated) * policy.rate < policy.burst:
+                break
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+
+    def check(self, policy_name: str, key: Optional[str]):
+        """Raise 429 with Retry-After when `key` is over the policy's limit (for checks inside a route)."""
+        if not RATE_LIMIT_ENABLED or key is None:
+            return
+        wait = self.hit(policy_name, key)
+        if wait:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=TOO_MANY_REQUESTS, headers=_retry_after(wait))
+
+    def refund(self, policy_name: str, key: Optional[str]):
+        """Give back the token check() took, for requests that should not count against the limit after all."""
+        if not RATE_LIMIT_ENABLED or key is None:
+            return
+        bucket = self._buckets.get((policy_name, key))
+        if bucket is not None:
+            bucket[0] = min(self.policies[policy_name].burst, bucket[0] + 1)
+
+rate_limiter = RateLimiter()
+
+class ConcurrencyLimiter:
+    """In-flight requests per key (e.g. per client IP); only keys with a request running are tracked."""
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.limited = 0
+        self._in_flight: Dict[str, int] = {}
+
+    def acquire(self, key: Optional[str]):
+        """Raise 429 when `key` already has `limit` requests running; otherwise count this one until release()."""
+        if not RATE_LIMIT_ENABLED or key is None or self.limit <= 0:
+            return
+        running = self._in_flight.get(key, 0)
+        if running >= self.limit:
+            self.limited += 1
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=TOO_MANY_REQUESTS, headers=_retry_after(1))
+        self._in_flight[key] = running + 1
+
+    def release(self, key: Optional[str]):
+        running = self._in_flight.get(key, 0)
+        if running <= 1:
+            self._in_flight.pop(key, None)
+        else:
+            self._in_flight[key] = running - 1
+
+login_checks = ConcurrencyLimiter(LOGIN_MAX_IN_FLIGHT_PER_IP)
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # The last hop is the one our proxy saw; earlier ones are client-supplied
+            return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+def token_user(request: Request) -> Optional[str]:
+    """The signed-in user's id from a valid bearer token, or None (anonymous or forged)."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    claims = decode_access_token(token)
+    if claims is None:
+        return None
+    return claims.get("uid") or claims.get("sub")
+
+class RateLimitMiddleware:
+    """
+    Applies ROUTE_POLICIES (pure ASGI). A rejected request never reaches the
+    router, so it costs no body parsing or dependency resolution: a flood is
+    turned away for a few microseconds per request.
+    """
+    def __init__(self, app, routes: Dict[tuple, tuple] = ROUTE_POLICIES, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.routes = routes
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        policies = self.routes.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+        if policies is None or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        ip_policy, user_policy = policies
+        wait = self.limiter.hit(ip_policy, client_ip(request))
+        if not wait and user_policy:
+            user = token_user(request)
+            if user:
+                wait = self.limiter.hit(user_policy, user)
+        if wait:
+            response = ORJSONResponse({"detail": TOO_MANY_REQUESTS}, status_code=status.HTTP_429_TOO_MANY_REQUESTS, headers=_retry_after(wait))
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.shed = 0
+
+admission = AdmissionController()
+
+class AdmissionMiddleware:
+    """
+    Global concurrency limit (pure ASGI). Past `max_in_flight` concurrent
+    requests, new ones get an immediate 503 with Retry-After instead of
+    queueing on an already saturated event loop, so the ones admitted keep
+    their latency.
+    """
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controller
+        if scope["type"] != "http" or controller.max_in_flight <= 0 or scope["path"] in ADMISSION_EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if controller.in_flight >= controller.max_in_flight:
+            controller.shed += 1
+            response = ORJSONResponse(
+                {"detail": "Server is busy, please try again shortly"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+
+        controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.in_flight -= 1
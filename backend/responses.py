@@ -0,0 +1,48 @@
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from pydantic import TypeAdapter
+
+# Fast path for hot endpoints. Returning a Response from an endpoint skips
+# FastAPI's response_model re-validation and jsonable_encoder, so a payload is
+# validated at most once and encoded natively:
+#   - plain documents (straight from storage) go through orjson, which handles
+#     datetime itself and ObjectId via _default;
+#   - documents shaped by a model are validated once and dumped by pydantic-core.
+# Keep response_model on the route: it still documents the schema in OpenAPI.
+
+MEDIA_TYPE = "application/json"
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes for plain documents (ObjectId -> str, datetime -> ISO 8601)."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class ORJSONResponse(Response):
+    """Default response class: renders whatever FastAPI hands it with orjson."""
+    media_type = MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def json_response(content: Any, headers: Optional[Mapping[str, str]] = None) -> Response:
+    return Response(content=dumps(content), media_type=MEDIA_TYPE, headers=headers)
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def model_response(model, content: Any, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Validate `content` against `model` (e.g. User or List[User]) once and
+    serialize it by alias, exactly as response_model would, in one pass.
+    """
+    adapter = _adapter(model)
+    body = adapter.dump_json(adapter.validate_python(content), by_alias=True)
+    return Response(content=body, media_type=MEDIA_TYPE, headers=headers)
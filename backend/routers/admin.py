@@ -1,129 +1,230 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from database import get_database
-from models import User
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from typing import List, Optional
+from database import get_storage
+from models import User, ApplicationReview
 from routers.auth import get_current_user
+from answer_cache import answer_cache
+import counters
+from pagination import apply_cursor, finish_page, sort_spec, MAX_PAGE_SIZE
+from responses import json_response, model_response
+from bson import ObjectId
+import os
 
 router = APIRouter()
 
+PENDING_PAGE_SIZE = int(os.getenv("PENDING_PAGE_SIZE", 50))
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", 100))
+REVIEW_BATCH_LIMIT = int(os.getenv("REVIEW_BATCH_LIMIT", 500))
+
+# Field recording who moved an application into each review status
+REVIEWER_FIELDS = {"Verified": "verified_by", "Rejected": "rejected_by"}
+
 @router.get("/stats")
-async def get_admin_stats(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+async def get_admin_stats(current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
     if current_user["role"] not in ["admin", "official"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
-    total_citizens = await db["users"].count_documents({"role": "citizen"})
-    total_schemes = await db["schemes"].count_documents({})
-    # Assuming 'applications' collection exists or will exist.
-    total_pending = await db["applications"].count_documents({"status": "pending"}) if "applications" in await db.list_collection_names() else 0
-    
+    stats = await counters.read(storage)
+    users = stats.get("users", {})
+    applications = stats.get("applications", {})
+
     return {
-        "total_citizens": total_citizens,
-        "total_schemes": total_schemes,
-        "total_pending": total_pending
+        "total_citizens": users.get("citizen", 0),
+        "total_schemes": stats.get("schemes", {}).get("total", 0),
+        "total_pending": applications.get("status", {}).get("Pending", 0),
+        "users_by_role": users,
+        "applications_by_status": applications.get("status", {}),
+        "applications_by_scheme": applications.get("scheme", {})
     }
 
+@router.post("/stats/rebuild")
+async def rebuild_admin_stats(current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
+    if current_user["role"] not in ["admin", "official"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    stats = await counters.rebuild(storage)
+    stats.pop("_id", None)
+    return stats
+
+@router.get("/chat-cache")
+async def get_chat_cache_stats(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] not in ["admin", "official"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    return answer_cache.stats()
+
 @router.get("/users", response_model=List[User])
-async def get_all_users(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+async def get_all_users(
+    response: Response,
+    limit: int = Query(USERS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    storage = Depends(get_storage)
+):
     if current_user["role"] not in ["admin", "official"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
-    users = await db["users"].find({"role": "citizen"}).to_list(length=100)
-    return users
+    # Oldest first, keyset on _id (served by the role_id index)
+    query = apply_cursor({"role": "citizen"}, cursor, "_id", 1)
+    users = await storage.users.page(query, sort_spec("_id", 1), limit + 1)
+    users = finish_page(users, limit, response)
+    return model_response(List[User], users, headers=response.headers)
+
+def _applicant_details(app: dict) -> dict:
+    info = app.pop("_info", [])
+    user = app.pop("_user", [])
+
+    if info:
+        info = info[0]
+        return {
+            "full_name": info.get("full_name", "Unknown"),
+            "age": info.get("age", ""),
+            "phone_number": info.get("phone_number", ""),
+            "aadhaar_no": info.get("aadhaar_no", ""),
+            "bank_account_no": info.get("bank_account_no", ""),
+            "annual_income": info.get("annual_income", "")
+        }
+
+    applicant_details = {"full_name": "Unknown", "phone_number": "", "age": ""}
+    if user:
+        # Fallback to User collection
+        applicant_details["full_name"] = user[0].get("full_name", "Unknown")
+        applicant_details["phone_number"] = user[0].get("phone_number", "")
+    return applicant_details
 
 @router.get("/applications/pending")
-async def get_pending_applications(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+async def get_pending_applications(
+    response: Response,
+    limit: int = Query(PENDING_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+    storage = Depends(get_storage)
+):
     if current_user["role"] not in ["admin", "official"]:
         raise HTTPException(status_code=403, detail="Unauthorized")
-        
-    # Fetch Pending Apps
-    applications = await db["applications"].find({"status": "Pending"}).sort("submission_date", -1).to_list(length=50)
 
-    # Manual Join to prevent aggregation errors
+    match = apply_cursor({"status": "Pending"}, cursor, "submission_date", -1)
+
+    # Page of pending apps joined with each applicant's latest info (one aggregation on MongoDB)
+    applications = await storage.applications.pending_with_applicants(match, sort_spec("submission_date", -1), limit + 1)
+
+    applications = finish_page(applications, limit, response, "submission_date")
+
     for app in applications:
-        app["_id"] = str(app["_id"])
-        
-        user_id = app.get("user_id")
-        applicant_details = {"full_name": "Unknown", "phone_number": "", "age": ""}
-        
-        if user_id:
-            # Try to fetch from Info collection first
-            info = await db["info"].find_one({"user_id": user_id})
-            if info:
-                applicant_details = {
-                    "full_name": info.get("full_name", "Unknown"),
-                    "age": info.get("age", ""),
-                    "phone_number": info.get("phone_number", ""),
-                    "aadhaar_no": info.get("aadhaar_no", ""),
-                    "bank_account_no": info.get("bank_account_no", ""),
-                    "annual_income": info.get("annual_income", "")
-                }
-            else:
-                 # Fallback to User collection
-                 try: 
-                     from bson import ObjectId
-                     user = await db["users"].find_one({"_id": ObjectId(user_id)})
-                     if user:
-                         applicant_details["full_name"] = user.get("full_name", "Unknown")
-                         applicant_details["phone_number"] = user.get("phone_number", "")
-                 except: 
-                     pass
-
-        # Populate
-        app["applicant_details"] = applicant_details
-
-    return applications
+        app["applicant_details"] = _applicant_details(app)
+
+    return json_response(applications, headers=response.headers)
 
 @router.post("/verify-application/{app_id}", response_model=dict)
-async def verify_application(app_id: str, current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+async def verify_application(app_id: str, current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
     if current_user["role"] not in ["admin", "official"]:
          raise HTTPException(status_code=403, detail="Unauthorized")
 
-    from bson import ObjectId
-    
     # 1. Update Status
-    result = await db["applications"].find_one_and_update(
-        {"_id": ObjectId(app_id)},
-        {"$set": {"status": "Verified", "verified_by": current_user["sub"]}}
-    )
+    result = await storage.applications.set_status(app_id, "Verified", REVIEWER_FIELDS["Verified"], current_user["sub"])
     
     if not result:
         raise HTTPException(status_code=404, detail="Application not found")
 
+    # result is the pre-update document, so the old status is exact
+    await counters.record_status_change(storage, result.get("status"), "Verified")
+
     return {
         "message": "Application Verified Successfully",
         "status": "Verified"
     } 
 
 @router.post("/reject-application/{app_id}", response_model=dict)
-async def reject_application(app_id: str, current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+async def reject_application(app_id: str, current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
     if current_user["role"] not in ["admin", "official"]:
          raise HTTPException(status_code=403, detail="Unauthorized")
 
-    from bson import ObjectId
-    
     # Update Status to Rejected
-    result = await db["applications"].find_one_and_update(
-        {"_id": ObjectId(app_id)},
-        {"$set": {"status": "Rejected", "rejected_by": current_user["sub"]}}
-    )
+    result = await storage.applications.set_status(app_id, "Rejected", REVIEWER_FIELDS["Rejected"], current_user["sub"])
     
     if not result:
         raise HTTPException(status_code=404, detail="Application not found")
 
+    await counters.record_status_change(storage, result.get("status"), "Rejected")
+
     return {
         "message": "Application Rejected",
         "status": "Rejected"
     } 
 
+@router.post("/applications/review", response_model=dict)
+async def review_applications(review: ApplicationReview, current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
+    """
+    Verify or reject many applications in one request.
+    Returns a result per id: updated, unchanged (already in that status), not_found or invalid_id.
+    """
+    if current_user["role"] not in ["admin", "official"]:
+         raise HTTPException(status_code=403, detail="Unauthorized")
+
+    ids = list(dict.fromkeys(review.ids)) # de-duplicate, keep order
+    if len(ids) > REVIEW_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {REVIEW_BATCH_LIMIT} applications per review")
+
+    results = {}
+    object_ids = {}
+    for app_id in ids:
+        if ObjectId.is_valid(app_id):
+            object_ids[app_id] = ObjectId(app_id)
+        else:
+            results[app_id] = "invalid_id"
+
+    # One read for the current statuses: needed for per-id results and the counters
+    old_status = await storage.applications.statuses(list(object_ids.values()))
+
+    expected = []
+    for app_id, oid in object_ids.items():
+        if app_id not in old_status:
+            results[app_id] = "not_found"
+        elif old_status[app_id] == review.status:
+            results[app_id] = "unchanged"
+        else:
+            # Guard on the status we read, so a concurrent review cannot be double counted
+            expected.append((oid, old_status[app_id]))
+            results[app_id] = "updated"
+
+    if expected:
+        modified = await storage.applications.set_statuses(expected, review.status, REVIEWER_FIELDS[review.status], current_user["sub"])
+        if modified < len(expected):
+            # Some applications changed between the read and the write: report them individually
+            updated_ids = [object_ids[i] for i, r in results.items() if r == "updated"]
+            after = await storage.applications.reviewers(updated_ids, REVIEWER_FIELDS[review.status])
+            for doc in after:
+                if doc.get("status") != review.status or doc.get(REVIEWER_FIELDS[review.status]) != current_user["sub"]:
+                    results[str(doc["_id"])] = "conflict"
+
+    changed_from = {}
+    for app_id, result in results.items():
+        if result == "updated":
+            changed_from[old_status[app_id]] = changed_from.get(old_status[app_id], 0) + 1
+    for previous, count in changed_from.items():
+        await counters.record_status_change(storage, previous, review.status, count)
+
+    summary = {}
+    for result in results.values():
+        summary[result] = summary.get(result, 0) + 1
+
+    return {
+        "status": review.status,
+        "reviewed_by": current_user["sub"],
+        "summary": summary,
+        "results": [{"id": app_id, "result": results[app_id]} for app_id in ids]
+    }
+
 @router.delete("/applications/pending", response_model=dict)
-async def delete_all_applications(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+async def delete_all_applications(current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
     if current_user["role"] not in ["admin", "official"]:
          raise HTTPException(status_code=403, detail="Unauthorized")
 
     # Delete ALL applications (Pending, Verified, Rejected) to clean up state
-    result = await db["applications"].delete_many({})
+    deleted = await storage.applications.delete_all()
+    await counters.reset_applications(storage)
     
     return {
-        "message": f"Deleted {result.deleted_count} applications (All Statuses).",
-        "count": result.deleted_count
+        "message": f"Deleted {deleted} applications (All Statuses).",
+        "count": deleted
     } 
@@ -1,30 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from models import Application, User
-from database import get_database
-from .auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from typing import Optional
+from models import Application
+from database import get_storage
+from .auth import get_current_user_doc, get_current_user_id
 from datetime import datetime
+import counters
+import os
+from pagination import apply_cursor, finish_page, sort_spec, MAX_PAGE_SIZE
+from ingest import ingest_queue, IngestBusy, INGEST_MODE
+from responses import json_response
 
 router = APIRouter()
 
+# Applications written behind the request in batched ingest mode update the counters per batch
+ingest_queue.on_written("applications", counters.record_applications)
+
+INGEST_BUSY = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Too many submissions right now, please try again shortly",
+    headers={"Retry-After": "2"},
+)
+
+MY_APPLICATIONS_PAGE_SIZE = int(os.getenv("MY_APPLICATIONS_PAGE_SIZE", 100))
+
 @router.post("/apply", response_model=dict)
 async def apply_scheme(
     application: Application, 
-    current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    user_doc: dict = Depends(get_current_user_doc),
+    storage = Depends(get_storage)
 ):
     """
     Submit a new scheme application.
     """
     try:
-        email = current_user.get("sub")
-        if not email:
-            raise HTTPException(status_code=401, detail="Invalid token")
-
-        # Fetch actual user to get ID and assure existence
-        user_doc = await db["users"].find_one({"email": email})
-        if not user_doc:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         user_id = str(user_doc["_id"])
         
         # Link application to user
@@ -37,7 +45,7 @@ async def apply_scheme(
             application.status = "Pending"
 
         # AI Auto-fill: Fetch User Profile
-        info_doc = await db["info"].find_one({"user_id": user_id}, sort=[("created_at", -1)])
+        info_doc = await storage.info.latest_for_user(user_id)
         
         applicant_details = {
              "full_name": user_doc.get("full_name", "Unknown"),
@@ -65,16 +73,26 @@ async def apply_scheme(
         if app_dict.get("_id") is None:
             app_dict.pop("_id", None)
         
-        # Insert into MongoDB
-        new_app = await db["applications"].insert_one(app_dict)
+        if INGEST_MODE == "batched":
+            # Acknowledged now, inserted by the ingest writer within INGEST_FLUSH_INTERVAL
+            try:
+                app_id = ingest_queue.submit(storage, "applications", app_dict)
+            except IngestBusy:
+                raise INGEST_BUSY
+        else:
+            # Insert into MongoDB
+            app_id = await storage.applications.insert(app_dict)
+            await counters.record_application(storage, application.scheme_id, app_dict["status"])
         
         # Database saves application with status "Pending"
         
         return {
             "message": "Application Enquiry submitted to Panchayat Office.",
-            "id": str(new_app.inserted_id),
+            "id": str(app_id),
             "status": "Pending"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -83,28 +101,20 @@ async def apply_scheme(
 
 @router.get("/my-applications", response_model=list)
 async def get_my_applications(
-    current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    response: Response,
+    limit: int = Query(MY_APPLICATIONS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id),
+    storage = Depends(get_storage)
 ):
     """
     fetch all applications for the logged-in user.
     """
+    query = apply_cursor({"user_id": user_id}, cursor, "submission_date", -1)
     try:
-        email = current_user.get("sub")
-        user_doc = await db["users"].find_one({"email": email})
-        if not user_doc:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = str(user_doc["_id"])
-        
-        cursor = db["applications"].find({"user_id": user_id}).sort("submission_date", -1)
-        apps = await cursor.to_list(length=100)
-        
-        # Serialization fix
-        for app in apps:
-            app["_id"] = str(app["_id"])
-            
-        return apps
+        apps = await storage.applications.page(query, sort_spec("submission_date", -1), limit + 1)
+        apps = finish_page(apps, limit, response, "submission_date")
+        return json_response(apps, headers=response.headers)
     except Exception as e:
         print(f"Error fetching applications: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch applications")
@@ -112,8 +122,8 @@ async def get_my_applications(
 @router.post("/generate-message", response_model=dict)
 async def generate_application_message(
     body: dict,
-    current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    user_doc: dict = Depends(get_current_user_doc),
+    storage = Depends(get_storage)
 ):
     """
     Generates a personalized application message for WhatsApp based on user data and scheme details.
@@ -123,12 +133,11 @@ async def generate_application_message(
         if not scheme_id:
             raise HTTPException(status_code=400, detail="Scheme ID required")
 
-        email = current_user.get("sub")
+        email = user_doc.get("email")
         # 1. Fetch User Info
-        user_doc = await db["users"].find_one({"email": email})
         user_id = str(user_doc["_id"])
         
-        info_doc = await db["info"].find_one({"user_id": user_id}, sort=[("created_at", -1)])
+        info_doc = await storage.info.latest_for_user(user_id)
         
         if not info_doc:
             # Fallback if no specific info doc
@@ -141,8 +150,7 @@ async def generate_application_message(
             }
 
         # 2. Fetch Scheme Info
-        from bson import ObjectId
-        scheme = await db["schemes"].find_one({"_id": ObjectId(scheme_id)})
+        scheme = await storage.schemes.get(scheme_id)
         if not scheme:
             raise HTTPException(status_code=404, detail="Scheme not found")
 
@@ -1,58 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from datetime import timedelta
-from database import get_database
+from database import get_storage
 from models import UserCreate, User, UserInDB, Token
-from security import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
-from jose import jwt, JWTError
+from security import get_password_hash_async, verify_password_async, create_access_token, decode_access_token, PasswordHasherBusy, ACCESS_TOKEN_EXPIRE_MINUTES
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from principals import user_cache
+from responses import model_response
+from conditional import document_etag, cache_headers, is_not_modified, not_modified, PROFILE_CACHE_CONTROL
+import counters
+from eligibility import recommendation_cache
+from ratelimit import client_ip, login_checks, rate_limiter
 import os
 import shutil
 
 router = APIRouter()
 
+HASHER_BUSY = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, please try again shortly",
+    headers={"Retry-After": "1"},
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get_database)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    payload = decode_access_token(token)
+    if payload is None:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
+    return payload
 
-@router.get("/me", response_model=User)
-async def get_me(current_user: dict = Depends(get_current_user), db = Depends(get_database)):
-    """Fetch current user details"""
+async def get_current_user_doc(current_user: dict = Depends(get_current_user), storage = Depends(get_storage)) -> dict:
+    """
+    Resolve the token to the user's document (without hashed_password).
+    Served from the short-TTL user cache; falls back to a single users lookup.
+    """
     email = current_user.get("sub")
-    user = await db["users"].find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return User(**user)
+    if not email:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    user_doc = user_cache.get(email)
+    if user_doc is None:
+        generation = user_cache.generation(email)
+        uid = current_user.get("uid")
+        if uid and ObjectId.is_valid(uid):
+            user_doc = await storage.users.get(uid)
+        else:
+            # Tokens issued before the uid claim existed
+            user_doc = await storage.users.get_by_email(email)
+        if not user_doc:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_cache.put(email, user_doc, generation)
+    return user_doc
+
+async def get_current_user_id(current_user: dict = Depends(get_current_user), storage = Depends(get_storage)) -> str:
+    """The caller's user id, straight from the token claims when present (no database round trip)."""
+    uid = current_user.get("uid")
+    if uid:
+        return uid
+    user_doc = await get_current_user_doc(current_user, storage)
+    return str(user_doc["_id"])
+
+@router.get("/me", response_model=User)
+async def get_me(request: Request, user: dict = Depends(get_current_user_doc)):
+    """Fetch current user details (304 when the client's copy is current; the document usually comes from the user cache)"""
+    headers = cache_headers(document_etag(user), PROFILE_CACHE_CONTROL)
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified(headers)
+    return model_response(User, user, headers=headers)
 
 @router.post("/register", response_model=User)
-async def register(user: UserCreate, db = Depends(get_database)):
-    user_exists = await db["users"].find_one({"email": user.email})
+async def register(user: UserCreate, storage = Depends(get_storage)):
+    user_exists = await storage.users.get_by_email(user.email)
     if user_exists:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except PasswordHasherBusy:
+        raise HASHER_BUSY
     user_in_db = UserInDB(**user.dict(), hashed_password=hashed_password)
-    new_user = await db["users"].insert_one(user_in_db.dict(by_alias=True))
-    created_user = await db["users"].find_one({"_id": new_user.inserted_id})
-    return User(**created_user)
+    try:
+        created_user = await storage.users.create(user_in_db.dict(by_alias=True))
+    except DuplicateKeyError:
+        # Concurrent registration with the same email, caught by the unique index
+        raise HTTPException(status_code=400, detail="Email already registered")
+    await counters.record_user(storage, user_in_db.role)
+    return model_response(User, created_user)
+
+def normalize_email(value: str) -> str:
+    """The form registration stores (EmailStr): surrounding whitespace dropped, domain lowercased."""
+    local, at, domain = value.strip().rpartition("@")
+    return f"{local}{at}{domain.lower()}"
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_database)):
-    user = await db["users"].find_one({"email": form_data.username}) # OAuth2 form uses 'username' field for email
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), storage = Depends(get_storage)):
+    # Per IP in RateLimitMiddleware; per account here, so guessing one password from many addresses is throttled too.
+    # The token is taken up front (concurrent guesses can't all slip through) and refunded on success,
+    # so only failed attempts count and signing in never uses up the account's allowance.
+    # Normalized once: the limiter and the lookup must agree on which account this is
+    account = normalize_email(form_data.username) # OAuth2 form uses 'username' field for email
+    ip = client_ip(request)
+    # One password check at a time per client, so a flood from one address can't fill the bcrypt pool
+    login_checks.acquire(ip)
+    try:
+        rate_limiter.check("login_account", account)
+        user = await storage.users.get_by_email(account, with_password=True)
+        valid, new_hash = False, None
+        if user:
+            try:
+                valid, new_hash = await verify_password_async(form_data.password, user["hashed_password"])
+            except PasswordHasherBusy:
+                rate_limiter.refund("login_account", account) # not an attempt: the password was never checked
+                raise HASHER_BUSY
+    finally:
+        login_checks.release(ip)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    rate_limiter.refund("login_account", account)
+    if new_hash:
+        # Cost factor changed since this hash was made: upgrade it transparently
+        await storage.users.set_password_hash(user["_id"], new_hash)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"], "role": user.get("role", "citizen")},
+        data={"sub": user["email"], "role": user.get("role", "citizen"), "uid": str(user["_id"])},
         expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
@@ -61,7 +137,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 async def update_profile(
     user_update: dict, 
     current_user: dict = Depends(get_current_user), 
-    db = Depends(get_database)
+    storage = Depends(get_storage)
 ):
     """
     Updates the current user's profile with provided fields.
@@ -75,17 +151,13 @@ async def update_profile(
     if not update_data:
          raise HTTPException(status_code=400, detail="No valid fields to update")
 
-    result = await db["users"].update_one(
-        {"email": email},
-        {"$set": update_data}
-    )
-    
-    if result.modified_count == 0:
-         # Check if user exists just in case
-         found_user = await db["users"].find_one({"email": email})
-         if not found_user:
-             raise HTTPException(status_code=404, detail="User not found")
-         # If user exists but nothing changed, we still return the user
-    
-    updated_user = await db["users"].find_one({"email": email})
-    return User(**updated_user)
+    updated_user = await storage.users.update_profile(email, update_data)
+    user_cache.invalidate(email)
+
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Occupation feeds scheme recommendations
+    recommendation_cache.invalidate(str(updated_user["_id"]))
+
+    return model_response(User, updated_user)
@@ -1,56 +1,93 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import os
-import requests
+import json
+from chat_client import chat_client, ChatUpstreamError
+from answer_cache import answer_cache
 
 router = APIRouter()
 
+SYSTEM_PROMPT = "You are Governance Sahayi, a helpful AI assistant for the e-Kanthalloor digital governance portal. Your goal is to assist citizens with finding welfare schemes, understanding application processes, and navigating local government services. Be polite, concise, and helpful. If asked about specific scheme details you don't know, suggest they check the 'Welfare Schemes' section."
+
 class ChatRequest(BaseModel):
     message: str
 
-@router.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+def _get_api_key() -> str:
     api_key = os.getenv("DEEPSEEK_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="API Key configuration error")
+    return api_key
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost:3000", # Required by OpenRouter
-        "X-Title": "e-Kanthalloor Portal" # Optional
-    }
-
-    # OpenRouter Endpoint
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    
-    payload = {
-        "model": "deepseek/deepseek-chat", # Standard DeepSeek model
+def _build_payload(message: str) -> dict:
+    return {
+        "model": os.getenv("CHAT_MODEL", "deepseek/deepseek-chat"), # Standard DeepSeek model
         "max_tokens": 1000,
         "messages": [
             {
                 "role": "system",
-                "content": "You are Governance Sahayi, a helpful AI assistant for the e-Kanthalloor digital governance portal. Your goal is to assist citizens with finding welfare schemes, understanding application processes, and navigating local government services. Be polite, concise, and helpful. If asked about specific scheme details you don't know, suggest they check the 'Welfare Schemes' section."
+                "content": SYSTEM_PROMPT
             },
             {
                 "role": "user",
-                "content": request.message
+                "content": message
             }
         ]
     }
 
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        
+@router.post("/chat")
+async def chat_endpoint(request: ChatRequest):
+    api_key = _get_api_key()
+
+    async def ask_upstream():
+        data = await chat_client.complete(api_key, _build_payload(request.message))
         if "choices" in data and len(data["choices"]) > 0:
-            return {"reply": data["choices"][0]["message"]["content"]}
-        else:
-            return {"reply": "I'm sorry, I couldn't generate a response at this time."}
+            return data["choices"][0]["message"]["content"]
+        return None
 
-    except requests.exceptions.RequestException as e:
+    try:
+        reply = await answer_cache.get_or_compute(request.message, ask_upstream)
+    except ChatUpstreamError as e:
         print(f"Chat API Error: {e}")
-        if response is not None:
-             print(f"Response Body: {response.text}")
         raise HTTPException(status_code=503, detail="AI Service currently unavailable")
+
+    if reply is not None:
+        return {"reply": reply}
+    else:
+        return {"reply": "I'm sorry, I couldn't generate a response at this time."}
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events variant of /chat: forwards tokens as the upstream produces them.
+    Each event is `data: {"token": "..."}`; the stream ends with `data: [DONE]`.
+    """
+    api_key = _get_api_key()
+    payload = _build_payload(request.message)
+
+    async def event_stream():
+        cached = answer_cache.get(request.message)
+        if cached is not None:
+            answer_cache.hits += 1
+            yield f"data: {json.dumps({'token': cached})}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+
+        answer_cache.misses += 1
+        tokens = []
+        try:
+            async for token in chat_client.stream(api_key, payload):
+                tokens.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            if tokens:
+                answer_cache.put(request.message, "".join(tokens))
+        except ChatUpstreamError as e:
+            print(f"Chat API Error: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'AI Service currently unavailable'})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional, Literal
+from datetime import datetime, date, timedelta
+from bson import ObjectId
+from database import get_storage
+from routers.auth import get_current_user
+import csv
+import io
+import json
+import os
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+# Rows buffered before a chunk is written to the response
+EXPORT_CHUNK_ROWS = 500
+
+USER_COLUMNS = ["_id", "email", "full_name", "role", "panchayat", "ward", "occupation", "address",
+                "phone_number", "bank_account_no", "ifsc_code", "language_pref", "is_active", "created_at"]
+APPLICATION_COLUMNS = ["_id", "scheme_id", "scheme_name", "applicant_name", "user_id", "status",
+                       "submission_date", "verified_by", "rejected_by"]
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def _date_range(field: str, date_from: Optional[date], date_to: Optional[date]) -> dict:
+    """Inclusive day range [from, to] as a datetime filter."""
+    if not date_from and not date_to:
+        return {}
+    bounds = {}
+    if date_from:
+        bounds["$gte"] = datetime.combine(date_from, datetime.min.time())
+    if date_to:
+        bounds["$lt"] = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    return {field: bounds}
+
+async def _stream_rows(cursor, fmt: str, columns: list):
+    """Write documents from a Motor cursor as CSV or NDJSON chunks; memory stays bounded by the chunk size."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(columns)
+
+    rows = 0
+    async for doc in cursor:
+        if fmt == "csv":
+            writer.writerow([_csv_value(doc.get(c)) for c in columns])
+        else:
+            buffer.write(json.dumps(doc, default=_json_default))
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def _export_response(cursor, fmt: str, columns: list, name: str):
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{name}_{datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}"
+    return StreamingResponse(
+        _stream_rows(cursor, fmt, columns),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _require_official(current_user: dict):
+    if current_user["role"] not in ["admin", "official"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+@router.get("/users")
+async def export_users(
+    format: Literal["csv", "ndjson"] = "csv",
+    role: Optional[str] = "citizen",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    current_user: dict = Depends(get_current_user),
+    storage = Depends(get_storage)
+):
+    """Stream every matching user (registered between from and to, inclusive) as CSV or NDJSON."""
+    _require_official(current_user)
+
+    query = _date_range("created_at", date_from, date_to)
+    if role:
+        query["role"] = role
+
+    cursor = storage.users.iterate(query, batch_size=EXPORT_BATCH_SIZE)
+    return _export_response(cursor, format, USER_COLUMNS, "users")
+
+@router.get("/applications")
+async def export_applications(
+    format: Literal["csv", "ndjson"] = "csv",
+    status: Optional[str] = None,
+    scheme_id: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    current_user: dict = Depends(get_current_user),
+    storage = Depends(get_storage)
+):
+    """Stream every matching application (submitted between from and to, inclusive) as CSV or NDJSON."""
+    _require_official(current_user)
+
+    query = _date_range("submission_date", date_from, date_to)
+    if status:
+        query["status"] = status
+    if scheme_id:
+        query["scheme_id"] = scheme_id
+
+    cursor = storage.applications.iterate(query, batch_size=EXPORT_BATCH_SIZE)
+    return _export_response(cursor, format, APPLICATION_COLUMNS, "applications")
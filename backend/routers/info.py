@@ -1,33 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from models import PersonalInfo, User
-from database import get_database
-from .auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from models import PersonalInfo
+from database import get_storage
+from .auth import get_current_user_id
 from datetime import datetime
+from eligibility import recommendation_cache
+from ingest import ingest_queue, IngestBusy, INGEST_MODE
+from responses import json_response
+from conditional import document_etag, cache_headers, is_not_modified, not_modified, PROFILE_CACHE_CONTROL
 
 router = APIRouter()
 
+async def _invalidate_recommendations(storage, docs: list):
+    for doc in docs:
+        recommendation_cache.invalidate(doc["user_id"])
+
+# Recommendations cached between a batched submission and its write must not outlive the write
+ingest_queue.on_written("info", _invalidate_recommendations)
+
 @router.post("/submit", response_model=dict)
 async def submit_personal_info(
     info: PersonalInfo, 
-    current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    user_id: str = Depends(get_current_user_id),
+    storage = Depends(get_storage)
 ):
     """
     Submit personal information (Name, Age, Bank, Aadhaar, Phone, Income).
-    Stores in 'info' collection.
+    Appended to 'info_history'; becomes the user's current document in 'info'.
     """
     try:
-        email = current_user.get("sub")
-        if not email:
-            raise HTTPException(status_code=401, detail="Invalid token")
-
-        # Fetch actual user to get ID
-        user_doc = await db["users"].find_one({"email": email})
-        if not user_doc:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = str(user_doc["_id"])
-        
         print(f"Submitting info for user: {user_id}")
 
         # Link to current user
@@ -40,12 +40,24 @@ async def submit_personal_info(
         if info_dict.get("_id") is None:
             info_dict.pop("_id", None)
         
-        # Insert into MongoDB
-        new_info = await db["info"].insert_one(info_dict)
+        if INGEST_MODE == "batched":
+            # Acknowledged now, inserted by the ingest writer within INGEST_FLUSH_INTERVAL
+            try:
+                info_id = ingest_queue.submit(storage, "info", info_dict)
+            except IngestBusy:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many submissions right now, please try again shortly",
+                    headers={"Retry-After": "2"},
+                )
+        else:
+            # Insert into MongoDB
+            info_id = await storage.info.insert(info_dict)
+        recommendation_cache.invalidate(user_id)
         
         return {
             "message": "Personal information submitted successfully",
-            "id": str(new_info.inserted_id)
+            "id": str(info_id)
         }
     except HTTPException as he:
         raise he
@@ -57,28 +69,22 @@ async def submit_personal_info(
 
 @router.get("/me", response_model=dict)
 async def get_my_info(
-    current_user: dict = Depends(get_current_user),
-    db = Depends(get_database)
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    storage = Depends(get_storage)
 ):
     """
     Fetch the personal information for the logged-in user.
+    Revalidation with the ETag skips serializing the document (304).
     """
     try:
-        email = current_user.get("sub")
-        user_doc = await db["users"].find_one({"email": email})
-        if not user_doc:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_id = str(user_doc["_id"])
-        
-        # Find latest info
-        info_doc = await db["info"].find_one({"user_id": user_id}, sort=[("created_at", -1)])
-        
-        if not info_doc:
-            # Return empty if not found, distinct from 404 error
-            return {}
-            
-        return info_doc
+        # Find latest info (an empty object if none, distinct from 404 error)
+        info_doc = await storage.info.latest_for_user(user_id) or {}
+
+        headers = cache_headers(document_etag(info_doc), PROFILE_CACHE_CONTROL, info_doc.get("created_at"))
+        if is_not_modified(request, headers["ETag"], info_doc.get("created_at")):
+            return not_modified(headers)
+        return json_response(info_doc, headers=headers)
     except Exception as e:
         print(f"Error fetching info: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
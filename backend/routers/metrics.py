@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Header, HTTPException, Response
+from typing import Optional
+import os
+from metrics import registry, app_counters, app_gauges
+from answer_cache import answer_cache
+from catalog import scheme_catalog
+from ingest import ingest_queue
+from ratelimit import admission, login_checks, rate_limiter
+from security import password_hasher
+from translation import translation_pipeline
+from tts import voice_cache
+
+router = APIRouter()
+
+# When set, scrapers must send "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# answer_cache.stats() fields that are running totals rather than current sizes
+ANSWER_CACHE_TOTALS = ("hits", "misses", "coalesced", "evictions")
+
+def _collect_components():
+    # Current state: may go up or down
+    gauges = {
+        ("ingest", "pending"): ingest_queue.pending,
+        ("password_hasher", "pending"): password_hasher.pending,
+        ("rate_limiter", "keys"): len(rate_limiter),
+        ("admission", "in_flight"): admission.in_flight,
+        ("scheme_catalog", "version"): scheme_catalog.version,
+        ("translation", "pending"): len(translation_pipeline._tasks),
+    }
+    # Totals since the process started: only ever go up, so they are counters (summed over every worker under serve.py)
+    counters = {
+        ("ingest", "written"): ingest_queue.written,
+        ("ingest", "batches"): ingest_queue.batches,
+        ("ingest", "failed"): ingest_queue.failed,
+        ("ingest", "rejected"): ingest_queue.rejected,
+        ("password_hasher", "rejected"): password_hasher.rejected,
+        ("rate_limiter", "allowed"): rate_limiter.allowed,
+        ("rate_limiter", "limited"): rate_limiter.limited,
+        ("rate_limiter", "evicted"): rate_limiter.evicted,
+        ("rate_limiter", "login_checks_limited"): login_checks.limited,
+        ("admission", "shed"): admission.shed,
+        ("tts", "generated"): voice_cache.generated,
+        ("tts", "evicted"): voice_cache.evicted,
+    }
+    for field, value in answer_cache.stats().items():
+        if field in ANSWER_CACHE_TOTALS:
+            counters[("answer_cache", field)] = value
+        else:
+            gauges[("answer_cache", field)] = value
+    for (component, field), value in gauges.items():
+        app_gauges.set(component, field, value=value)
+    for (component, field), value in counters.items():
+        app_counters.set(component, field, value=value)
+
+registry.collectors.append(_collect_components)
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text exposition of request, MongoDB and chat metrics."""
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Not authorized")
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4")
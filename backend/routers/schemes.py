@@ -1,58 +1,164 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
 from typing import List, Optional
-from database import get_database
-from models import Scheme, SchemeCreate, User
-from routers.auth import get_current_user
-from ai_engine import ai_engine
+import json
+import os
+import time
+from database import get_storage
+from models import Scheme, SchemeCreate
+from routers.auth import get_current_user, get_current_user_doc
+from catalog import scheme_catalog
+from translation import translation_pipeline, SUPPORTED_LANGUAGES
+import counters
+from eligibility import recommendation_cache
+from pagination import encode_cursor, decode_cursor, NEXT_CURSOR_HEADER, MAX_PAGE_SIZE
+from responses import model_response
+from conditional import cache_headers, is_not_modified, not_modified, CATALOG_CACHE_CONTROL
+from tts import voice_cache, audio_key, spoken_text, parse_range, AudioFileResponse, AUDIO_MEDIA_TYPE, TTS_DEFAULT_VOICE, TTS_VOICES
+
+# The URL is stable while the audio changes with the scheme text, so clients revalidate
+# with the ETag after a week; an unchanged explanation then costs a 304
+AUDIO_CACHE_CONTROL = "public, max-age=604800"
+# Seconds between two catalog rebuilds triggered by a GET for a scheme found in storage but not in the catalog
+CATALOG_MISS_REBUILD_INTERVAL = float(os.getenv("CATALOG_MISS_REBUILD_INTERVAL", 60))
+_last_miss_rebuild = 0.0
 
 router = APIRouter()
 
 @router.post("/", response_model=Scheme)
-async def create_scheme(scheme: SchemeCreate, current_user: dict = Depends(get_current_user), db = Depends(get_database)):
+async def create_scheme(scheme: SchemeCreate, current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
     # Check if admin
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     scheme_dict = scheme.dict()
-    # Optional: Pre-generate translations or simplified text here using ai_engine
     
-    new_scheme = await db["schemes"].insert_one(scheme_dict)
-    created_scheme = await db["schemes"].find_one({"_id": new_scheme.inserted_id})
-    return Scheme(**created_scheme)
+    created_scheme = await storage.schemes.create(scheme_dict)
+    scheme_catalog.bump()
+    await counters.record_scheme(storage)
+    # Translations are produced in the background and picked up by the catalog when stored
+    translation_pipeline.schedule(storage, created_scheme)
+    return model_response(Scheme, created_scheme)
+
+@router.put("/{scheme_id}", response_model=Scheme)
+async def update_scheme(scheme_id: str, scheme: SchemeCreate, current_user: dict = Depends(get_current_user), storage = Depends(get_storage)):
+    # Check if admin
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    updated_scheme = await storage.schemes.update(scheme_id, scheme.dict())
+    if not updated_scheme:
+        raise HTTPException(status_code=404, detail="Scheme not found")
+
+    scheme_catalog.bump()
+    translation_pipeline.schedule(storage, updated_scheme)
+    return model_response(Scheme, updated_scheme)
 
 @router.get("/", response_model=List[Scheme])
-async def list_schemes(language: Optional[str] = "en", db = Depends(get_database)):
-    schemes = await db["schemes"].find().to_list(1000)
-    
-    # Apply translation if requested
-    if language != "en":
-        # in a real scenario, we'd use ai_engine.translate_content here or fetch pre-translated fields
-        # schemes = [await ai_engine.translate_content(s, language) for s in schemes]
-        pass
-        
-    return [Scheme(**s) for s in schemes]
+async def list_schemes(
+    request: Request,
+    language: Optional[str] = "en",
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    storage = Depends(get_storage)
+):
+    # Served from the pre-serialized catalog snapshot, translations included (precomputed by
+    # translation_pipeline; untranslated schemes fall back to English). Without a limit the whole catalog is returned.
+    # A client revalidating with the snapshot's ETag gets a 304 straight from memory
+    if limit is None and not cursor:
+        body = await scheme_catalog.list_json(storage, language)
+        headers = cache_headers(scheme_catalog.list_etag(language), CATALOG_CACHE_CONTROL, scheme_catalog.loaded_at)
+        if is_not_modified(request, headers["ETag"], scheme_catalog.loaded_at):
+            return not_modified(headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    after_id = str(decode_cursor(cursor)[1]) if cursor else None
+    body, last_id = await scheme_catalog.page_json(storage, limit or MAX_PAGE_SIZE, after_id, language)
+    headers = cache_headers(scheme_catalog.page_etag(limit or MAX_PAGE_SIZE, after_id, language), CATALOG_CACHE_CONTROL, scheme_catalog.loaded_at)
+    if last_id:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor({"_id": last_id})
+    if is_not_modified(request, headers["ETag"], scheme_catalog.loaded_at):
+        return not_modified(headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/recommended", response_model=List[Scheme])
+async def recommended_schemes(user_doc: dict = Depends(get_current_user_doc), storage = Depends(get_storage)):
+    """
+    Schemes the citizen is likely eligible for, from their latest personal info
+    (age, annual income) and profile occupation. Cached per user until their
+    info/profile or the catalog changes.
+    """
+    user_id = str(user_doc["_id"])
+    await scheme_catalog.ensure_fresh(storage)
+    version = scheme_catalog.version
+
+    body = recommendation_cache.get(user_id, version)
+    if body is None:
+        generation = recommendation_cache.generation(user_id)
+        info = await storage.info.latest_for_user(user_id, ["age", "annual_income"]) or {}
+        body = await scheme_catalog.recommend_json(
+            storage, info.get("age"), info.get("annual_income"), user_doc.get("occupation"), user_doc.get("language_pref", "en")
+        )
+        recommendation_cache.put(user_id, version, body, generation)
+
+    return Response(content=body, media_type="application/json")
 
 @router.get("/{scheme_id}", response_model=Scheme)
-async def get_scheme(scheme_id: str, db = Depends(get_database)):
-    print(f"DEBUG: Fetching scheme with ID: {scheme_id}")
-    
-    # 1. Try exact string match
-    scheme = await db["schemes"].find_one({"_id": scheme_id})
+async def get_scheme(scheme_id: str, request: Request, language: Optional[str] = "en", storage = Depends(get_storage)):
+    cached = await scheme_catalog.get_json(storage, scheme_id, language)
+    if cached is not None:
+        headers = cache_headers(scheme_catalog.get_etag(scheme_id, language), CATALOG_CACHE_CONTROL, scheme_catalog.loaded_at)
+        if is_not_modified(request, headers["ETag"], scheme_catalog.loaded_at):
+            return not_modified(headers)
+        return Response(content=cached, media_type="application/json", headers=headers)
+
+    # Cache miss: the scheme may have been written outside the API (e.g. seed_db.py)
+    # String ids (seeded) first, then ObjectId
+    scheme = await storage.schemes.get(scheme_id)
     if scheme:
-        print("DEBUG: Found by string ID")
-        return Scheme(**scheme)
+        # Pick it up in the catalog, but at most one rebuild per interval however many GETs miss
+        global _last_miss_rebuild
+        if time.monotonic() - _last_miss_rebuild > CATALOG_MISS_REBUILD_INTERVAL:
+            _last_miss_rebuild = time.monotonic()
+            scheme_catalog.bump()
+        return model_response(Scheme, scheme)
 
-    # 2. Try ObjectId match
-    from bson import ObjectId
-    if ObjectId.is_valid(scheme_id):
-        try:
-            obj_id = ObjectId(scheme_id)
-            scheme = await db["schemes"].find_one({"_id": obj_id})
-            if scheme:
-                print("DEBUG: Found by ObjectId")
-                return Scheme(**scheme)
-        except Exception as e:
-            print(f"DEBUG: ObjectId conversion error: {e}")
-
-    print("DEBUG: Scheme not found")
     raise HTTPException(status_code=404, detail="Scheme not found")
+
+@router.get("/{scheme_id}/audio")
+@router.head("/{scheme_id}/audio", include_in_schema=False) # same handler; one operation in the schema
+async def scheme_audio(scheme_id: str, request: Request, language: Optional[str] = "en", voice: Optional[str] = None, storage = Depends(get_storage)):
+    """
+    Voice explanation of a scheme (WAV). Files are content-addressed by
+    (text, language, voice): the key is the ETag, so a client holding the
+    current audio gets a 304 and nothing is regenerated or re-sent.
+    Supports Range requests for resuming over poor connections.
+    """
+    # Both go into the file's key: only known values, so a client cannot make us synthesise and store new files at will
+    if language != "en" and language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unsupported language: {language}")
+    voice = voice or TTS_DEFAULT_VOICE
+    if voice not in TTS_VOICES:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown voice: {voice}")
+
+    cached = await scheme_catalog.get_json(storage, scheme_id, language)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Scheme not found")
+
+    # A supported language without translations yet is served the English text, so share the English audio too
+    language = language if language in scheme_catalog.languages else "en"
+    text = spoken_text(json.loads(cached))
+    etag = f'"{audio_key(text, language, voice)}"'
+    headers = {"ETag": etag, "Cache-Control": AUDIO_CACHE_CONTROL}
+    if is_not_modified(request, etag):
+        return not_modified(headers)
+
+    _, path = await voice_cache.get_or_generate(text, language, voice)
+
+    byte_range = None
+    if request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), os.path.getsize(path))
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{os.path.getsize(path)}"})
+
+    return AudioFileResponse(path, byte_range=byte_range, media_type=AUDIO_MEDIA_TYPE, headers=headers)
@@ -1,16 +1,13 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from jose import jwt, JWTError
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import asyncio
 import os
 from dotenv import load_dotenv
-import bcrypt
 
-# Monkey patch bcrypt for passlib compatibility
-# passlib check for bcrypt.__about__.__version__ which was removed in bcrypt 4.0.0
-if not hasattr(bcrypt, "__about__"):
-    class About:
-        __version__ = bcrypt.__version__
-    bcrypt.__about__ = About()
+# passlib/bcrypt and jose are imported on first use rather than with the app
+# (see profile_startup.py): a cold start only pays for them when a request
+# needs a password or a token, and main.warm_up loads them right after startup.
 
 load_dotenv()
 
@@ -18,15 +15,96 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey12345")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor. Changing it makes existing hashes "need update"; they are rehashed on next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# "thread" runs bcrypt on a dedicated pool (bcrypt releases the GIL); "inline" runs it on the event loop
+PASSWORD_HASH_MODE = os.getenv("PASSWORD_HASH_MODE", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+# Jobs allowed to wait for a free worker before new ones are rejected
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 32))
+
+pwd_context = None # created by get_pwd_context()
+
+def get_pwd_context():
+    global pwd_context
+    if pwd_context is None:
+        import bcrypt
+        from passlib.context import CryptContext
+
+        # Monkey patch bcrypt for passlib compatibility
+        # passlib check for bcrypt.__about__.__version__ which was removed in bcrypt 4.0.0
+        if not hasattr(bcrypt, "__about__"):
+            class About:
+                __version__ = bcrypt.__version__
+            bcrypt.__about__ = About()
+
+        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return pwd_context
+
+class PasswordHasherBusy(Exception):
+    """The password hashing queue is full; the caller should answer 503."""
+    pass
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop on a bounded thread pool.
+
+    `pending` counts queued + running jobs; once it reaches
+    workers + max_queue, new jobs fail fast with PasswordHasherBusy
+    instead of piling up behind a login burst.
+    """
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, fn, *args):
+        if PASSWORD_HASH_MODE == "inline":
+            return fn(*args)
+
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+password_hasher = PasswordHasher()
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+async def verify_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verify on the hashing pool. Returns (valid, new_hash); new_hash is set when
+    the stored hash was made with an outdated cost factor and should be replaced.
+    """
+    return await password_hasher.run(get_pwd_context().verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password) -> str:
+    return await password_hasher.run(get_pwd_context().hash, password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -35,3 +113,11 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+def decode_access_token(token: str) -> Optional[dict]:
+    """The token's claims, or None when it is malformed, forged or expired."""
+    from jose import jwt, JWTError
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
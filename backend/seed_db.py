@@ -2,6 +2,7 @@ import asyncio
 from database import db
 from models import Scheme, User, UserInDB
 from security import get_password_hash
+import counters
 import os
 
 schemes_data = [
@@ -42,15 +43,15 @@ async def seed():
     
     # Schemes - Resetting to ensure schema compliance
     print("Resetting Schemes collection...")
-    await db.db["schemes"].drop()
+    await db.storage.schemes.delete_all()
     
     print("Seeding Schemes...")
     for s in schemes_data:
-        await db.db["schemes"].insert_one(s)
+        await db.storage.schemes.create(s)
     print("Schemes seeded successfully.")
 
     # Admin User
-    admin = await db.db["users"].find_one({"email": "admin@kanthalloor.gov.in"})
+    admin = await db.storage.users.get_by_email("admin@kanthalloor.gov.in")
     if not admin:
         print("Seeding Admin User...")
         hashed = get_password_hash("admin123")
@@ -61,10 +62,10 @@ async def seed():
             phone_number="7012402897",
             hashed_password=hashed
         )
-        await db.db["users"].insert_one(user.dict())
+        await db.storage.users.create(user.dict())
 
     # Citizen User
-    citizen = await db.db["users"].find_one({"email": "mahesh@gmail.com"})
+    citizen = await db.storage.users.get_by_email("mahesh@gmail.com")
     if not citizen:
         print("Seeding Citizen User...")
         hashed = get_password_hash("password123")
@@ -75,14 +76,14 @@ async def seed():
             phone_number="9876543210",
             hashed_password=hashed
         )
-        await db.db["users"].insert_one(user.dict())
+        await db.storage.users.create(user.dict())
     else:
         print("Resetting Citizen Password...")
         hashed = get_password_hash("password123")
-        await db.db["users"].update_one(
-            {"email": "mahesh@gmail.com"},
-            {"$set": {"hashed_password": hashed}}
-        )
+        await db.storage.users.set_password_hash(citizen["_id"], hashed)
+
+    # Seeding bypasses the API, so recount the dashboard counters from source
+    await counters.rebuild(db.storage)
     
     await db.close_database_connection()
 
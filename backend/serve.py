@@ -0,0 +1,298 @@
+"""
+Production server for Linux: a pre-forking master running N uvicorn workers.
+
+  python serve.py [--workers N] [--host HOST] [--port PORT]
+
+- The app is imported once, in the master, before forking: routes, models,
+  the precompressed frontend bundle and the client libraries the app otherwise
+  imports on first use (main.load_deferred) are inherited by every worker
+  instead of being rebuilt in each.
+- The master builds the scheme catalog and publishes it to a snapshot file on
+  /dev/shm that every worker maps (catalog.share); the catalog version counter
+  is shared too, so a scheme edit in one worker reaches all of them.
+- Workers run uvloop + httptools when installed and all accept on one listening
+  socket opened by the master.
+- SIGHUP: rolling restart. Workers are replaced one at a time and an old
+  worker is only stopped once its replacement is serving, so the port never
+  goes dark. Replacements are forked from the master, i.e. run the code it
+  loaded: deploy new code by restarting the master.
+- SIGTERM/SIGINT: graceful stop (in-flight requests finish, queued writes are
+  flushed by the app's shutdown hook). A worker that dies is replaced.
+
+/metrics: each worker writes its metrics to a shared directory next to the
+catalog snapshot, and whichever worker answers a scrape renders all workers'
+values (metrics.Registry): counters and histograms summed, exited workers
+included, so totals never drop on a restart; gauges with a `worker` (pid)
+label. Scrape the one port as usual; no per-worker scraping is needed.
+
+Per-process state stays per worker: rate limits and the answer cache. The
+user and recommendation caches are per worker too, but their invalidation
+counters are shared (generations.share), so a profile or info write handled
+by one worker is seen by every worker's next read.
+
+STORAGE_BACKEND=memory keeps the data in process memory. Each worker starts
+with a copy of what the master had before the fork (e.g. seeded by
+before_fork), and after that its writes are its own, so other workers never
+see them. serve.py therefore refuses more than one worker on that backend
+unless SERVE_MEMORY_WORKERS=1 is set, which is meant for read-only benchmarks
+(bench_workers.py, verify_serve.py).
+run_backend.bat (uvicorn --reload, one process) remains the development server.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+import traceback
+from typing import Awaitable, Callable, Dict, Optional
+import uvicorn
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8045))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+# Seconds a stopping worker gets to finish in-flight requests before it is killed
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+# Seconds a new worker gets to run the app's startup and start serving
+WORKER_BOOT_TIMEOUT = int(os.getenv("WORKER_BOOT_TIMEOUT", 60))
+SERVER_ACCESS_LOG = os.getenv("SERVER_ACCESS_LOG", "0") == "1"
+# Allow several workers on STORAGE_BACKEND=memory, each with its own copy of the data (read-only benchmarks only)
+SERVE_MEMORY_WORKERS = os.getenv("SERVE_MEMORY_WORKERS", "0") == "1"
+LISTEN_BACKLOG = 2048
+
+def _event_loop() -> str:
+    try:
+        import uvloop # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+def _http_protocol() -> str:
+    try:
+        import httptools # noqa: F401
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+def _shared_dir() -> str:
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+def snapshot_path() -> str:
+    return os.path.join(_shared_dir(), f"kanthalloor-catalog-{os.getpid()}.bin")
+
+def metrics_dir() -> str:
+    return os.path.join(_shared_dir(), f"kanthalloor-metrics-{os.getpid()}")
+
+def listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+async def preload(before_fork: Optional[Callable[[object], Awaitable[None]]] = None):
+    """
+    Build and publish the catalog snapshot once, then drop the connection (clients must not cross a fork).
+    The in-memory backend has no connection and is kept: it is the data, and each worker inherits a copy.
+    """
+    from catalog import scheme_catalog
+    from database import db
+    from storage import STORAGE_BACKEND
+    try:
+        await db.connect_to_database()
+        if before_fork is not None:
+            await before_fork(db.storage)
+        await scheme_catalog.ensure_fresh(db.storage)
+    except Exception as e:
+        # Not fatal: the first worker to need the catalog builds and publishes it
+        print(f"Could not preload scheme catalog: {e}")
+    finally:
+        if STORAGE_BACKEND != "memory":
+            await db.close_database_connection()
+
+def run_worker(app, sock: socket.socket, slot: int, ready_fd: int):
+    for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL) # uvicorn installs its own INT/TERM handlers
+    # Read by the app's startup hook: one-off jobs (e.g. the translation backfill) only run in worker 0
+    os.environ["SERVE_WORKER"] = str(slot)
+    # The master's own requests (preload) must not be counted once per worker
+    from metrics import registry
+    registry.clear()
+    config = uvicorn.Config(
+        app,
+        loop=_event_loop(),
+        http=_http_protocol(),
+        lifespan="on",
+        access_log=SERVER_ACCESS_LOG,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+    server = uvicorn.Server(config)
+    config.setup_event_loop()
+
+    async def serve():
+        task = asyncio.create_task(server.serve(sockets=[sock]))
+        while not server.started and not task.done():
+            await asyncio.sleep(0.05)
+        os.write(ready_fd, b"1" if server.started else b"0")
+        os.close(ready_fd)
+        await task
+
+    asyncio.run(serve())
+
+class Master:
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.size = workers
+        self.workers: Dict[int, int] = {} # pid -> slot
+        self.retiring = set()
+        self.signals = []
+        self.stopping = False
+
+    def spawn(self, slot: int) -> Optional[int]:
+        """Fork a worker into `slot`; returns its pid once it serves, None if it failed to start."""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 0
+            try:
+                run_worker(self.app, self.sock, slot, write_fd)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+
+        os.close(write_fd)
+        self.workers[pid] = slot
+        ready, _, _ = select.select([read_fd], [], [], WORKER_BOOT_TIMEOUT)
+        started = ready and os.read(read_fd, 1) == b"1"
+        os.close(read_fd)
+        if not started:
+            print(f"Worker {slot} (pid {pid}) failed to start")
+            self.terminate(pid)
+            self.wait_worker(pid)
+            return None
+        print(f"Worker {slot} serving (pid {pid})")
+        return pid
+
+    def terminate(self, pid: int):
+        # Once only: a second SIGTERM makes uvicorn abandon in-flight requests
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def wait_worker(self, pid: int):
+        """Wait for a terminated worker to finish its in-flight requests, SIGKILL after the grace period."""
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT + 5
+        try:
+            while time.monotonic() < deadline:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    break
+                time.sleep(0.05)
+            else:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass # already reaped
+        self.workers.pop(pid, None)
+        self.retiring.discard(pid)
+
+    def rolling_restart(self):
+        print(f"Rolling restart of {len(self.workers)} workers")
+        for pid, slot in list(self.workers.items()):
+            if any(signum != signal.SIGHUP for signum in self.signals):
+                return # stopping
+            if self.spawn(slot) is None:
+                print("Rolling restart aborted: the old workers keep serving")
+                return
+            self.terminate(pid)
+            self.wait_worker(pid)
+        print("Rolling restart complete")
+
+    def reap(self):
+        """Replace workers that exited on their own."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is not None and pid not in self.retiring and not self.stopping:
+                print(f"Worker {slot} (pid {pid}) exited with status {status}, replacing it")
+                self.spawn(slot)
+
+    def run(self):
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: self.signals.append(signum))
+        for slot in range(self.size):
+            self.spawn(slot)
+
+        while not self.stopping:
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.rolling_restart()
+                else:
+                    self.stopping = True
+            if not self.stopping:
+                self.reap()
+                time.sleep(0.2)
+
+        print("Stopping workers")
+        for pid in list(self.workers):
+            self.terminate(pid)
+        for pid in list(self.workers):
+            self.wait_worker(pid)
+
+def run(workers: int = WEB_CONCURRENCY, host: str = SERVER_HOST, port: int = SERVER_PORT,
+        before_fork: Optional[Callable[[object], Awaitable[None]]] = None):
+    """Start the master. `before_fork(storage)` runs before the catalog is built (benchmarks use it to seed data)."""
+    from catalog import scheme_catalog
+    from generations import generations
+    from metrics import registry
+    from storage import STORAGE_BACKEND
+    from main import app, load_deferred
+
+    if STORAGE_BACKEND == "memory" and workers > 1 and not SERVE_MEMORY_WORKERS:
+        sys.exit("STORAGE_BACKEND=memory keeps the data in each worker's own memory, so workers would serve "
+                 "diverging data. Use --workers 1, or SERVE_MEMORY_WORKERS=1 for read-only benchmarks.")
+    # Loaded once here and shared with every worker, instead of on first use in each
+    load_deferred()
+    path = snapshot_path()
+    scheme_catalog.share(path, multiprocessing.Value("q", 0))
+    generations.share(multiprocessing.Array("q", generations.slots))
+    registry.share(metrics_dir())
+    asyncio.run(preload(before_fork))
+
+    sock = listen(host, port)
+    print(f"Serving on {host}:{port} with {workers} workers ({_event_loop()}, {_http_protocol()}), master pid {os.getpid()}")
+    try:
+        Master(app, sock, workers).run()
+    finally:
+        sock.close()
+        if os.path.exists(path):
+            os.remove(path)
+        shutil.rmtree(registry.directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs fork (Linux); use run_backend.bat on Windows")
+    parser = argparse.ArgumentParser(description="Run the API with pre-forked uvicorn workers.")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    run(args.workers, args.host, args.port)
@@ -0,0 +1,644 @@
+import copy
+import os
+from collections import Counter as _Counter
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from dotenv import load_dotenv
+from models import User
+
+load_dotenv()
+
+# "mongo" (Motor, the default) or "memory" (hermetic, for tests and benchmarks)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+# Repositories never hand out credentials unless asked to
+NO_PASSWORD = {"hashed_password": 0}
+
+# Only what the API exposes about a user (the User model) is fetched for profile reads
+USER_PROFILE = {(field.alias or name): 1 for name, field in User.model_fields.items()}
+
+# ---------------------------------------------------------------------------
+# Backends: one collection each, same async API. Queries, sorts and updates
+# use MongoDB syntax; the in-memory backend implements the subset the
+# repositories below rely on.
+# ---------------------------------------------------------------------------
+
+class MotorCollection:
+    """Thin async wrapper over a Motor collection."""
+    def __init__(self, collection):
+        self.raw = collection
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None, sort: Optional[list] = None) -> Optional[dict]:
+        return await self.raw.find_one(query, projection, sort=sort)
+
+    async def find(self, query: dict, projection: Optional[dict] = None, sort: Optional[list] = None, limit: int = 0) -> List[dict]:
+        cursor = self.raw.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(None)
+
+    async def iterate(self, query: dict, projection: Optional[dict] = None, batch_size: int = 1000) -> AsyncIterator[dict]:
+        async for doc in self.raw.find(query, projection).batch_size(batch_size):
+            yield doc
+
+    async def insert_one(self, doc: dict):
+        result = await self.raw.insert_one(doc)
+        return result.inserted_id
+
+    async def insert_many(self, docs: List[dict]):
+        await self.raw.insert_many(docs, ordered=False)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> int:
+        result = await self.raw.update_one(query, update, upsert=upsert)
+        return result.modified_count
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None, return_after: bool = False) -> Optional[dict]:
+        return await self.raw.find_one_and_update(
+            query, update, projection=projection,
+            return_document=ReturnDocument.AFTER if return_after else ReturnDocument.BEFORE
+        )
+
+    async def bulk_update(self, updates: List[Tuple[dict, dict]], upsert: bool = False) -> int:
+        result = await self.raw.bulk_write([UpdateOne(q, u, upsert=upsert) for q, u in updates], ordered=False)
+        return result.modified_count
+
+    async def replace_one(self, query: dict, doc: dict, upsert: bool = False):
+        await self.raw.replace_one(query, doc, upsert=upsert)
+
+    async def delete_many(self, query: dict) -> int:
+        result = await self.raw.delete_many(query)
+        return result.deleted_count
+
+    async def count(self, query: Optional[dict] = None) -> int:
+        return await self.raw.count_documents(query or {})
+
+    async def count_by(self, field: str) -> Dict[object, int]:
+        rows = await self.raw.aggregate([{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]).to_list(None)
+        return {r["_id"]: r["count"] for r in rows if r["_id"] is not None}
+
+_MISSING = object()
+
+def _get_path(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+def _unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+def _equals(value, target) -> bool:
+    if value is _MISSING:
+        return target is None
+    if isinstance(value, list) and not isinstance(target, list):
+        return target in value
+    return value == target
+
+def _compare(op):
+    def check(value, target):
+        if value is _MISSING or value is None:
+            return False
+        try:
+            return op(value, target)
+        except TypeError:
+            return False
+    return check
+
+_OPERATORS = {
+    "$eq": _equals,
+    "$ne": lambda v, t: not _equals(v, t),
+    "$gt": _compare(lambda v, t: v > t),
+    "$gte": _compare(lambda v, t: v >= t),
+    "$lt": _compare(lambda v, t: v < t),
+    "$lte": _compare(lambda v, t: v <= t),
+    "$in": lambda v, t: any(_equals(v, x) for x in t),
+    "$nin": lambda v, t: not any(_equals(v, x) for x in t),
+    "$exists": lambda v, t: (v is not _MISSING) == bool(t),
+}
+
+def matches(doc: dict, query: dict) -> bool:
+    """Evaluate a MongoDB filter (equality, comparison, $in/$nin, $exists, $or/$and) against a document."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, q) for q in condition):
+                return False
+        else:
+            value = _get_path(doc, key)
+            if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+                if not all(_OPERATORS[op](value, arg) for op, arg in condition.items()):
+                    return False
+            elif not _equals(value, condition):
+                return False
+    return True
+
+# BSON comparison order across types, so mixed-type sorts behave like MongoDB
+def _sort_key(value):
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (8, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, dict):
+        return (3, str(value))
+    if isinstance(value, list):
+        return (4, str(value))
+    if isinstance(value, ObjectId):
+        return (7, value.binary)
+    if isinstance(value, datetime):
+        return (9, value)
+    return (10, str(value))
+
+def _sorted(docs: List[dict], sort: Optional[list]) -> List[dict]:
+    # Stable sorts from the last key to the first give the compound order
+    for field, direction in reversed(sort or []):
+        docs = sorted(docs, key=lambda d: _sort_key(_get_path(d, field)), reverse=direction < 0)
+    return docs
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [k for k, v in projection.items() if v and k != "_id"]
+    if included:
+        result = {k: doc[k] for k in included if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    for key, keep in projection.items():
+        if not keep:
+            doc.pop(key, None)
+    return doc
+
+def _apply_update(doc: dict, update: dict):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$inc":
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op == "$unset":
+                _unset_path(doc, path)
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by the memory backend")
+
+class MemoryCollection:
+    """
+    In-process collection with the MotorCollection API. Documents are copied
+    in and out, every operation runs without awaiting (so it is atomic on the
+    event loop), and `unique` fields raise DuplicateKeyError like a unique index.
+    """
+    def __init__(self, unique: Tuple[str, ...] = ()):
+        self.unique = unique
+        self.docs: Dict[object, dict] = {}
+        # field -> value -> _id, the equivalent of a unique index
+        self._unique_values: Dict[str, Dict[object, object]] = {f: {} for f in unique}
+
+    def _check_unique(self, doc: dict, ignore_id=None):
+        if doc["_id"] in self.docs and doc["_id"] != ignore_id:
+            raise DuplicateKeyError(f"E11000 duplicate key error: _id {doc['_id']}")
+        for field, owners in self._unique_values.items():
+            owner = owners.get(doc.get(field), doc["_id"])
+            if owner != doc["_id"]:
+                raise DuplicateKeyError(f"E11000 duplicate key error: {field} {doc.get(field)!r}")
+
+    def _store(self, doc: dict):
+        previous = self.docs.get(doc["_id"])
+        for field, owners in self._unique_values.items():
+            if previous is not None:
+                owners.pop(previous.get(field), None)
+            owners[doc.get(field)] = doc["_id"]
+        self.docs[doc["_id"]] = doc
+
+    def _remove(self, _id):
+        doc = self.docs.pop(_id)
+        for field, owners in self._unique_values.items():
+            owners.pop(doc.get(field), None)
+
+    def _select(self, query: dict, sort: Optional[list] = None, limit: int = 0) -> List[dict]:
+        docs = [d for d in self.docs.values() if matches(d, query)]
+        docs = _sorted(docs, sort)
+        return docs[:limit] if limit else docs
+
+    async def find_one(self, query: dict, projection: Optional[dict] = None, sort: Optional[list] = None) -> Optional[dict]:
+        docs = self._select(query, sort, 1)
+        return _project(docs[0], projection) if docs else None
+
+    async def find(self, query: dict, projection: Optional[dict] = None, sort: Optional[list] = None, limit: int = 0) -> List[dict]:
+        return [_project(d, projection) for d in self._select(query, sort, limit)]
+
+    async def iterate(self, query: dict, projection: Optional[dict] = None, batch_size: int = 1000) -> AsyncIterator[dict]:
+        for doc in self._select(query):
+            yield _project(doc, projection)
+
+    async def insert_one(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self._store(copy.deepcopy(doc))
+        return doc["_id"]
+
+    async def insert_many(self, docs: List[dict]):
+        # Unordered semantics: insert what can be inserted, then report the rest
+        errors = []
+        for index, doc in enumerate(docs):
+            try:
+                await self.insert_one(doc)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+    def _upsert_doc(self, query: dict) -> dict:
+        doc = {k: copy.deepcopy(v) for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        doc.setdefault("_id", ObjectId())
+        return doc
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False) -> int:
+        docs = self._select(query, limit=1)
+        if not docs:
+            if upsert:
+                doc = self._upsert_doc(query)
+                _apply_update(doc, update)
+                await self.insert_one(doc)
+            return 0
+        return self._update(docs[0], update)
+
+    def _update(self, doc: dict, update: dict) -> int:
+        updated = copy.deepcopy(doc)
+        _apply_update(updated, update)
+        if updated == doc:
+            return 0
+        self._check_unique(updated, ignore_id=doc["_id"])
+        self._store(updated)
+        return 1
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None, return_after: bool = False) -> Optional[dict]:
+        docs = self._select(query, limit=1)
+        if not docs:
+            return None
+        before = docs[0]
+        self._update(before, update)
+        return _project(self.docs[before["_id"]] if return_after else before, projection)
+
+    async def bulk_update(self, updates: List[Tuple[dict, dict]], upsert: bool = False) -> int:
+        # Unordered like bulk_write: apply what can be applied, then report the rest
+        modified = 0
+        errors = []
+        for index, (query, update) in enumerate(updates):
+            try:
+                modified += await self.update_one(query, update, upsert)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nModified": modified})
+        return modified
+
+    async def replace_one(self, query: dict, doc: dict, upsert: bool = False):
+        docs = self._select(query, limit=1)
+        if docs:
+            replacement = {**copy.deepcopy(doc), "_id": docs[0]["_id"]}
+            self._check_unique(replacement, ignore_id=docs[0]["_id"])
+            self._store(replacement)
+        elif upsert:
+            await self.insert_one({**self._upsert_doc(query), **copy.deepcopy(doc)})
+
+    async def delete_many(self, query: dict) -> int:
+        ids = [d["_id"] for d in self._select(query)]
+        for _id in ids:
+            self._remove(_id)
+        return len(ids)
+
+    async def count(self, query: Optional[dict] = None) -> int:
+        return len(self._select(query or {}))
+
+    async def count_by(self, field: str) -> Dict[object, int]:
+        values = (_get_path(d, field) for d in self.docs.values())
+        return dict(_Counter(v for v in values if v is not _MISSING and v is not None))
+
+# ---------------------------------------------------------------------------
+# Repositories: what the routers use. Backend-agnostic unless noted.
+# ---------------------------------------------------------------------------
+
+def _object_id(value):
+    """ObjectId for a valid hex string, the value itself otherwise (seeded data may use string ids)."""
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+class Repository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def insert_many(self, docs: List[dict]):
+        await self.collection.insert_many(docs)
+
+    async def count(self, query: Optional[dict] = None) -> int:
+        return await self.collection.count(query)
+
+    async def count_by(self, field: str) -> Dict[object, int]:
+        return await self.collection.count_by(field)
+
+    async def page(self, query: dict, sort: list, limit: int, projection: Optional[dict] = None) -> List[dict]:
+        return await self.collection.find(query, projection, sort=sort, limit=limit)
+
+    def iterate(self, query: dict, projection: Optional[dict] = None, batch_size: int = 1000) -> AsyncIterator[dict]:
+        return self.collection.iterate(query, projection, batch_size)
+
+    async def delete_all(self) -> int:
+        return await self.collection.delete_many({})
+
+class UserRepository(Repository):
+    async def get(self, user_id) -> Optional[dict]:
+        return await self.collection.find_one({"_id": _object_id(user_id)}, USER_PROFILE)
+
+    async def get_by_email(self, email: str, with_password: bool = False) -> Optional[dict]:
+        return await self.collection.find_one({"email": email}, None if with_password else USER_PROFILE)
+
+    async def create(self, doc: dict) -> dict:
+        """Insert a new user; raises DuplicateKeyError when the email is taken."""
+        user_id = await self.collection.insert_one(doc)
+        return await self.get(user_id)
+
+    async def set_password_hash(self, user_id, hashed_password: str):
+        await self.collection.update_one({"_id": user_id}, {"$set": {"hashed_password": hashed_password}})
+
+    async def update_profile(self, email: str, fields: dict) -> Optional[dict]:
+        return await self.collection.find_one_and_update({"email": email}, {"$set": fields}, USER_PROFILE, return_after=True)
+
+    async def page(self, query: dict, sort: list, limit: int, projection: Optional[dict] = None) -> List[dict]:
+        return await self.collection.find(query, projection or USER_PROFILE, sort=sort, limit=limit)
+
+    def iterate(self, query: dict, projection: Optional[dict] = None, batch_size: int = 1000) -> AsyncIterator[dict]:
+        return self.collection.iterate(query, projection or NO_PASSWORD, batch_size)
+
+def _only_duplicates(error: BulkWriteError) -> bool:
+    return all(err.get("code") == 11000 for err in error.details.get("writeErrors", []))
+
+class InfoRepository(Repository):
+    """
+    Personal info is kept twice: every submission, append-only, in `info_history`
+    (the audit trail), and the user's current one in `info` under _id = user id,
+    so the latest info is a point read and `info` holds one document per user.
+    """
+    def __init__(self, collection, history):
+        super().__init__(collection)
+        self.history = history
+
+    async def latest_for_user(self, user_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+        projection = {f: 1 for f in fields} if fields else None
+        return await self.collection.find_one({"_id": user_id}, projection)
+
+    async def latest_for_users(self, user_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, dict]:
+        projection = {f: 1 for f in fields} if fields else None
+        return {doc.pop("_id"): doc for doc in await self.collection.find({"_id": {"$in": user_ids}}, projection)}
+
+    async def insert(self, doc: dict):
+        """Record a submission; returns its history _id."""
+        doc.setdefault("_id", ObjectId())
+        await self.history.insert_one(doc)
+        await self.set_current([doc])
+        return doc["_id"]
+
+    async def insert_many(self, docs: List[dict]):
+        try:
+            await self.history.insert_many(docs)
+        except BulkWriteError as e:
+            # Duplicates are submissions stored by an earlier attempt: their snapshot may still be missing
+            if not _only_duplicates(e):
+                failed = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != 11000}
+                await self.set_current([d for i, d in enumerate(docs) if i not in failed])
+                raise
+        await self.set_current(docs)
+
+    async def set_current(self, docs: List[dict]):
+        """
+        Make each user's newest submission among `docs` their current info, unless
+        a newer one is already current (resubmissions can be written out of order).
+        """
+        newest = {}
+        for doc in docs:
+            if doc.get("user_id") is None:
+                continue
+            seen = newest.get(doc["user_id"])
+            if seen is None or doc["created_at"] >= seen["created_at"]:
+                newest[doc["user_id"]] = doc
+        if not newest:
+            return
+        updates = []
+        for user_id, doc in newest.items():
+            snapshot = {k: v for k, v in doc.items() if k != "_id"}
+            snapshot["history_id"] = doc["_id"]
+            updates.append(({"_id": user_id, "created_at": {"$lte": doc["created_at"]}}, {"$set": snapshot}))
+        try:
+            await self.collection.bulk_update(updates, upsert=True)
+        except BulkWriteError as e:
+            # A duplicate _id on upsert means the filter missed because the current info is newer
+            if not _only_duplicates(e):
+                raise
+
+class SchemeRepository(Repository):
+    async def list_all(self) -> List[dict]:
+        return await self.collection.find({})
+
+    async def get(self, scheme_id: str) -> Optional[dict]:
+        # Seeded schemes may carry string ids; API-created ones have ObjectIds
+        scheme = await self.collection.find_one({"_id": scheme_id})
+        if scheme is None and ObjectId.is_valid(scheme_id):
+            scheme = await self.collection.find_one({"_id": ObjectId(scheme_id)})
+        return scheme
+
+    async def create(self, doc: dict) -> dict:
+        scheme_id = await self.collection.insert_one(doc)
+        return await self.collection.find_one({"_id": scheme_id})
+
+    async def update(self, scheme_id: str, fields: dict) -> Optional[dict]:
+        return await self.collection.find_one_and_update({"_id": _object_id(scheme_id)}, {"$set": fields}, return_after=True)
+
+class TranslationRepository(Repository):
+    async def list_all(self) -> List[dict]:
+        return await self.collection.find({})
+
+    async def source_hash(self, key: str) -> Optional[str]:
+        doc = await self.collection.find_one({"_id": key}, {"source_hash": 1})
+        return doc.get("source_hash") if doc else None
+
+    async def store(self, key: str, doc: dict):
+        await self.collection.replace_one({"_id": key}, doc, upsert=True)
+
+class CounterRepository(Repository):
+    async def get(self, counter_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": counter_id})
+
+    async def increment(self, counter_id: str, changes: dict):
+        await self.collection.update_one({"_id": counter_id}, {"$inc": changes}, upsert=True)
+
+    async def unset(self, counter_id: str, field: str):
+        await self.collection.update_one({"_id": counter_id}, {"$unset": {field: ""}})
+
+    async def replace(self, counter_id: str, doc: dict):
+        await self.collection.replace_one({"_id": counter_id}, doc, upsert=True)
+
+# Applicant fields copied from the latest info document into the admin queue
+APPLICANT_INFO_FIELDS = ["full_name", "age", "phone_number", "aadhaar_no", "bank_account_no", "annual_income"]
+
+class ApplicationRepository(Repository):
+    def __init__(self, collection, info: InfoRepository, users: UserRepository):
+        super().__init__(collection)
+        self.info = info
+        self.users = users
+
+    async def insert(self, doc: dict):
+        return await self.collection.insert_one(doc)
+
+    async def pending_with_applicants(self, query: dict, sort: list, limit: int) -> List[dict]:
+        """
+        A page of applications, each with `_info` (latest info doc, as a 0/1 list)
+        and `_user` (the user's name and phone, only when there is no info).
+        """
+        apps = await self.collection.find(query, sort=sort, limit=limit)
+        user_ids = list({a.get("user_id") for a in apps if a.get("user_id")})
+
+        latest = await self.info.latest_for_users(user_ids, APPLICANT_INFO_FIELDS)
+        missing = [_object_id(u) for u in user_ids if u not in latest]
+        users = {}
+        if missing:
+            for user in await self.users.collection.find({"_id": {"$in": missing}}, {"full_name": 1, "phone_number": 1}):
+                users[str(user.pop("_id"))] = user
+
+        for app in apps:
+            info = latest.get(app.get("user_id"))
+            user = users.get(app.get("user_id")) if info is None else None
+            app["_info"] = [info] if info else []
+            app["_user"] = [user] if user else []
+        return apps
+
+    async def set_status(self, app_id, status: str, reviewer_field: str, reviewer: str) -> Optional[dict]:
+        """Set one application's status; returns the document as it was before (None if missing)."""
+        return await self.collection.find_one_and_update(
+            {"_id": _object_id(app_id)}, {"$set": {"status": status, reviewer_field: reviewer}}
+        )
+
+    async def statuses(self, ids: list) -> Dict[str, Optional[str]]:
+        docs = await self.collection.find({"_id": {"$in": ids}}, {"status": 1})
+        return {str(d["_id"]): d.get("status") for d in docs}
+
+    async def set_statuses(self, expected: List[Tuple[object, str]], status: str, reviewer_field: str, reviewer: str) -> int:
+        """
+        Move many applications to `status`, each guarded on the status it is
+        expected to have, so a concurrent review is never double counted.
+        Returns how many were modified.
+        """
+        update = {"$set": {"status": status, reviewer_field: reviewer}}
+        return await self.collection.bulk_update([({"_id": _id, "status": old}, update) for _id, old in expected])
+
+    async def reviewers(self, ids: list, reviewer_field: str) -> List[dict]:
+        return await self.collection.find({"_id": {"$in": ids}}, {"status": 1, reviewer_field: 1})
+
+class MotorApplicationRepository(ApplicationRepository):
+    async def pending_with_applicants(self, query: dict, sort: list, limit: int) -> List[dict]:
+        # Single round trip: the page joined with the current info (keyed by user id), falling back to users
+        pipeline = [
+            {"$match": query},
+            {"$sort": dict(sort)},
+            {"$limit": limit},
+            {"$lookup": {
+                "from": "info",
+                "let": {"uid": "$user_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$uid"]}}},
+                    {"$project": {"_id": 0, **{f: 1 for f in APPLICANT_INFO_FIELDS}}}
+                ],
+                "as": "_info"
+            }},
+            {"$addFields": {"_user_oid": {"$convert": {"input": "$user_id", "to": "objectId", "onError": None, "onNull": None}}}},
+            {"$lookup": {
+                "from": "users",
+                "let": {"uoid": "$_user_oid", "has_info": {"$gt": [{"$size": "$_info"}, 0]}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$and": [{"$not": ["$$has_info"]}, {"$eq": ["$_id", "$$uoid"]}]}}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 0, "full_name": 1, "phone_number": 1}}
+                ],
+                "as": "_user"
+            }},
+            {"$project": {"_user_oid": 0}},
+        ]
+        return await self.collection.raw.aggregate(pipeline).to_list(None)
+
+# ---------------------------------------------------------------------------
+# Storage: the set of repositories the app runs on
+# ---------------------------------------------------------------------------
+
+class Storage:
+    backend = None
+
+    def __init__(self, collection):
+        """`collection(name, unique)` returns the backend collection for `name`."""
+        self.users = UserRepository(collection("users", ("email",)))
+        self.info = InfoRepository(collection("info", ()), collection("info_history", ()))
+        self.schemes = SchemeRepository(collection("schemes", ()))
+        self.translations = TranslationRepository(collection("scheme_translations", ()))
+        self.counters = CounterRepository(collection("counters", ()))
+        self.applications = self._applications(collection("applications", ()))
+
+    def _applications(self, collection) -> ApplicationRepository:
+        return ApplicationRepository(collection, self.info, self.users)
+
+    def repository(self, name: str) -> Repository:
+        """Repository by collection name (used by the write-behind ingest queue)."""
+        return {"users": self.users, "info": self.info, "schemes": self.schemes, "applications": self.applications,
+                "scheme_translations": self.translations, "counters": self.counters}[name]
+
+class MotorStorage(Storage):
+    backend = "mongo"
+
+    def __init__(self, db):
+        self.db = db
+        super().__init__(lambda name, unique: MotorCollection(db[name]))
+
+    def _applications(self, collection) -> ApplicationRepository:
+        return MotorApplicationRepository(collection, self.info, self.users)
+
+    async def reset(self):
+        """Drop every collection and recreate the indexes (scratch databases only)."""
+        from indexes import ensure_indexes
+        await self.db.client.drop_database(self.db.name)
+        await ensure_indexes(self.db)
+
+class MemoryStorage(Storage):
+    backend = "memory"
+
+    def __init__(self):
+        self._collections: Dict[str, MemoryCollection] = {}
+        super().__init__(self._collection)
+
+    def _collection(self, name: str, unique: tuple) -> MemoryCollection:
+        return self._collections.setdefault(name, MemoryCollection(unique))
+
+    async def reset(self):
+        for name, collection in self._collections.items():
+            self._collections[name].__init__(collection.unique)
@@ -0,0 +1,106 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, Set
+from ai_engine import ai_engine, source_hash, TRANSLATABLE_FIELDS, TranslationError
+from catalog import scheme_catalog
+
+SUPPORTED_LANGUAGES = [l.strip() for l in os.getenv("TRANSLATION_LANGUAGES", "ta,ml").split(",") if l.strip()]
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", 2))
+
+class TranslationPipeline:
+    """
+    Background translation of schemes into every supported language.
+
+    Scheduled when a scheme is created or edited (and once at startup for
+    anything missing); results are stored per (scheme, language) in the
+    scheme_translations collection and served through the catalog snapshot,
+    so no request ever waits on a translation.
+    """
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+        self._by_scheme: Dict[str, asyncio.Task] = {} # latest task per scheme
+        self._slots = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+
+    @property
+    def enabled(self) -> bool:
+        return ai_engine.translator is not None
+
+    def _track(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _start(self, storage, scheme: dict) -> asyncio.Task:
+        """One task per scheme: a newer edit replaces the translation still running for an older one."""
+        scheme_id = str(scheme["_id"])
+        previous = self._by_scheme.get(scheme_id)
+        if previous is not None:
+            previous.cancel()
+        task = self._track(self.translate_scheme(storage, scheme))
+        self._by_scheme[scheme_id] = task
+        task.add_done_callback(lambda t: self._by_scheme.pop(scheme_id, None) if self._by_scheme.get(scheme_id) is t else None)
+        return task
+
+    def schedule(self, storage, scheme: dict):
+        if not self.enabled:
+            return
+        self._track(self._translate_and_bump(self._start(storage, scheme)))
+
+    async def _translate_and_bump(self, *tasks: asyncio.Task):
+        """Wait for a batch of translations, then rebuild the catalog once if any was stored."""
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        stored = sum(1 for r in results if r is True)
+        if stored:
+            print(f"Stored translations for {stored} scheme(s)")
+            scheme_catalog.bump()
+
+    async def translate_scheme(self, storage, scheme: dict) -> bool:
+        """Translate into every language whose stored copy is missing or stale; True when anything was stored."""
+        scheme_id = str(scheme["_id"])
+        digest = source_hash(scheme)
+        stored = False
+
+        for language in SUPPORTED_LANGUAGES:
+            key = f"{scheme_id}:{language}"
+            if await storage.translations.source_hash(key) == digest:
+                continue
+
+            async with self._slots:
+                try:
+                    translated = await ai_engine.translate_content(scheme, language)
+                except TranslationError as e:
+                    print(f"Translation of scheme {scheme_id} to {language} failed: {e}")
+                    continue
+
+            # The scheme may have been edited (or deleted) while the translator ran
+            current = await storage.schemes.get(scheme_id)
+            if current is None or source_hash(current) != digest:
+                return stored
+
+            await storage.translations.store(key, {
+                "scheme_id": scheme_id,
+                "language": language,
+                "fields": {f: translated.get(f) for f in TRANSLATABLE_FIELDS if f in translated},
+                "source_hash": digest,
+                "updated_at": datetime.utcnow()
+            })
+            stored = True
+        return stored
+
+    async def backfill(self, storage):
+        """Queue every scheme; those already translated from the same source are skipped cheaply."""
+        if not self.enabled:
+            print("No translator configured (TRANSLATOR_BACKEND / DEEPSEEK_API_KEY): schemes are served in English")
+            return
+        tasks = [self._start(storage, scheme) for scheme in await storage.schemes.list_all()]
+        if tasks:
+            self._track(self._translate_and_bump(*tasks))
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+translation_pipeline = TranslationPipeline()
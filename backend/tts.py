@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+import anyio
+from dotenv import load_dotenv
+from starlette.responses import FileResponse
+from ai_engine import ai_engine
+
+load_dotenv()
+
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "audio_cache")
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", 2))
+TTS_DEFAULT_VOICE = os.getenv("TTS_VOICE", "default")
+# Voices a client may ask for; anything else is rejected, so clients cannot mint new cache files at will
+TTS_VOICES = {v.strip() for v in os.getenv("TTS_VOICES", TTS_DEFAULT_VOICE).split(",") if v.strip()} | {TTS_DEFAULT_VOICE}
+AUDIO_MEDIA_TYPE = "audio/wav"
+# Cache bounds: files unused for AUDIO_CACHE_MAX_AGE_DAYS go first (e.g. audio of since edited
+# schemes), then the least recently used ones until the cache fits in AUDIO_CACHE_MAX_MB
+AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", 512))
+AUDIO_CACHE_MAX_AGE_DAYS = float(os.getenv("AUDIO_CACHE_MAX_AGE_DAYS", 30))
+# Seconds between two prunes; they run on the tts pool after a file is generated
+AUDIO_CACHE_PRUNE_INTERVAL = int(os.getenv("AUDIO_CACHE_PRUNE_INTERVAL", 60))
+# A hit refreshes the file's mtime (its "last used" time) at most this often
+TOUCH_INTERVAL = 3600
+# Files this recent are never evicted: they may be about to be served
+EVICTION_GRACE = 60
+
+# Scheme fields read out in a voice explanation, in order
+SPOKEN_FIELDS = ["name", "description", "benefits", "eligibility_criteria", "application_process"]
+
+def audio_key(text: str, language: str, voice: str) -> str:
+    """Content address of an explanation: identical (text, language, voice) always maps to the same file."""
+    return hashlib.sha256(f"{language}\0{voice}\0{text}".encode()).hexdigest()
+
+def spoken_text(scheme: dict) -> str:
+    return ". ".join(str(scheme[f]).strip().rstrip(".") for f in SPOKEN_FIELDS if scheme.get(f)) + "."
+
+class VoiceCache:
+    """
+    On-disk, content-addressed cache of generated voice explanations.
+
+    Files live at <AUDIO_CACHE_DIR>/<key[:2]>/<key>.wav and are written
+    atomically, so a file that exists is always complete. Generation runs
+    on a small thread pool; concurrent requests for the same key share one
+    in-flight job, so the same explanation is never synthesised twice.
+
+    A file's mtime is its last use: prune() drops files unused for max_age,
+    then the least recently used until the cache fits in max_bytes.
+    """
+    def __init__(self, directory: str = AUDIO_CACHE_DIR, workers: int = TTS_WORKERS,
+                 max_bytes: int = AUDIO_CACHE_MAX_MB * 1024 * 1024, max_age: float = AUDIO_CACHE_MAX_AGE_DAYS * 86400):
+        self.directory = directory
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.generated = 0
+        self.evicted = 0
+        self._last_prune = 0.0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tts")
+        return self._executor
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.wav")
+
+    def _generate(self, key: str, text: str, language: str, voice: str) -> str:
+        path = self.path_for(key)
+        audio = ai_engine.generate_voice_explanation(text, language, voice)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        return path
+
+    async def get_or_generate(self, text: str, language: str, voice: str = TTS_DEFAULT_VOICE) -> Tuple[str, str]:
+        """Returns (key, path) of the audio file, generating it first if needed."""
+        key = audio_key(text, language, voice)
+        path = self.path_for(key)
+        try:
+            used = os.stat(path).st_mtime
+        except FileNotFoundError:
+            pass
+        else:
+            if time.time() - used > TOUCH_INTERVAL:
+                self._touch(path)
+            return key, path
+
+        pending = self._inflight.get(key)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(self._get_executor(), self._generate, key, text, language, voice)
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self.generated += 1
+        path = await asyncio.shield(pending)
+        if time.monotonic() - self._last_prune > AUDIO_CACHE_PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            asyncio.get_running_loop().run_in_executor(self._get_executor(), self.prune)
+        return key, path
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass # evicted meanwhile
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Apply the age and size bounds; returns the number of files deleted. Blocking (runs on the tts pool)."""
+        now = time.time() if now is None else now
+        files = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        files.sort() # least recently used first
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for used, size, path in files:
+            if now - used < EVICTION_GRACE:
+                break
+            # Leftover .tmp files come from an interrupted write
+            if now - used <= self.max_age and total <= self.max_bytes and not path.endswith(".tmp"):
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+voice_cache = VoiceCache()
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Single byte range from a Range header as (start, end) inclusive.
+    Returns None to serve the whole file (no header, or multiple ranges);
+    raises ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match:
+        if header.strip().startswith("bytes=") and "," in header:
+            return None
+        raise ValueError(header)
+
+    first, last = match.groups()
+    if first == "":
+        if last == "" or int(last) == 0:
+            raise ValueError(header)
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+class AudioFileResponse(FileResponse):
+    """
+    FileResponse that can send a single byte range (206 Partial Content).
+    Uses the ASGI zero-copy send extension (sendfile) when the server offers
+    it, otherwise reads the file in chunks like FileResponse.
+    """
+    def __init__(self, path: str, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.byte_range = byte_range
+
+    async def __call__(self, scope, receive, send):
+        stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        self.set_stat_headers(stat_result)
+        size = stat_result.st_size
+        start, end = self.byte_range or (0, size - 1)
+        length = max(0, end - start + 1)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["content-length"] = str(length)
+        if self.byte_range is not None:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": start, "count": length, "more_body": False})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
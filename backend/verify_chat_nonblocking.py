@@ -0,0 +1,154 @@
+"""
+Checks that /api/chat no longer blocks the event loop.
+
+Starts a local stub of the OpenRouter API that takes CHAT_DELAY seconds per
+answer, runs the app in-process with uvicorn, fires a batch of chat calls and
+measures the latency of another route while they are in flight. Also checks
+that /api/chat/stream delivers the first token long before the last one, and
+that when the first of several callers asking the same question is cancelled
+(client gone), the others still get the answer from the one upstream call.
+
+Usage: python verify_chat_nonblocking.py   (exit code 1 on failure)
+"""
+import asyncio
+import os
+import sys
+import time
+import aiohttp
+from aiohttp import web
+
+STUB_PORT = 18931
+APP_PORT = 18932
+CHAT_DELAY = 1.5
+CONCURRENT_CHATS = 8
+MAX_OTHER_ROUTE_LATENCY = 0.25
+
+# Must be set before the app modules are imported
+os.environ["OPENROUTER_URL"] = f"http://127.0.0.1:{STUB_PORT}/chat/completions"
+os.environ["DEEPSEEK_API_KEY"] = "stub-key"
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017/?serverSelectionTimeoutMS=1000")
+
+import uvicorn
+from answer_cache import AnswerCache
+from main import app
+
+async def stub_completions(request):
+    payload = await request.json()
+    if payload.get("stream"):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for word in ["Visit ", "the ", "Panchayat ", "office."]:
+            await asyncio.sleep(CHAT_DELAY / 4)
+            await response.write(f'data: {{"choices": [{{"delta": {{"content": "{word}"}}}}]}}\n\n'.encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    await asyncio.sleep(CHAT_DELAY)
+    return web.json_response({"choices": [{"message": {"content": "Visit the Panchayat office."}}]})
+
+async def start_stub():
+    stub = web.Application()
+    stub.router.add_post("/chat/completions", stub_completions)
+    runner = web.AppRunner(stub)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", STUB_PORT).start()
+    return runner
+
+async def start_app():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+async def check_cancelled_first_caller() -> bool:
+    cache = AnswerCache()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.2)
+        return "Visit the Panchayat office."
+
+    first = asyncio.create_task(cache.get_or_compute("How do I apply?", compute))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(cache.get_or_compute("how do i apply", compute))
+    await asyncio.sleep(0.05)
+    first.cancel()
+    try:
+        reply = await second
+    except asyncio.CancelledError:
+        reply = None
+    passed = first.cancelled() and reply == "Visit the Panchayat office." and calls == 1 and cache.get("How do I apply?") == reply
+    print(f"   [{'OK' if passed else 'FAIL'}] first caller cancelled, the second still gets the answer "
+          f"({reply!r}, {calls} upstream call, cached: {cache.get('How do I apply?') is not None})")
+    return passed
+
+async def main():
+    stub_runner = await start_stub()
+    server, server_task = await start_app()
+    base = f"http://127.0.0.1:{APP_PORT}"
+    ok = True
+
+    async with aiohttp.ClientSession() as session:
+        async def chat(i):
+            # Distinct questions, so the answer cache cannot coalesce them into one upstream call
+            async with session.post(f"{base}/api/chat", json={"message": f"How to apply for scheme #{i}?"}) as resp:
+                return resp.status
+
+        async def other_route():
+            start = time.perf_counter()
+            async with session.get(f"{base}/openapi.json") as resp:
+                await resp.read()
+            return time.perf_counter() - start
+
+        await other_route() # warm up the cached OpenAPI schema
+
+        print(f"1. Firing {CONCURRENT_CHATS} chat calls ({CHAT_DELAY}s upstream each) and probing /openapi.json...")
+        chats = [asyncio.create_task(chat(i)) for i in range(CONCURRENT_CHATS)]
+        await asyncio.sleep(0.1)
+        latencies = []
+        while not all(c.done() for c in chats):
+            latencies.append(await other_route())
+            await asyncio.sleep(0.05)
+        statuses = await asyncio.gather(*chats)
+
+        worst = max(latencies) if latencies else 0
+        print(f"   chat statuses: {statuses}")
+        print(f"   /openapi.json probes: {len(latencies)}, worst latency {worst * 1000:.1f} ms")
+        if any(s != 200 for s in statuses) or worst > MAX_OTHER_ROUTE_LATENCY:
+            print("   [FAIL] other routes stalled while chat calls were in flight")
+            ok = False
+        else:
+            print("   [OK] other routes kept their latency")
+
+        print("\n2. Streaming /api/chat/stream...")
+        start = time.perf_counter()
+        first_token_at = None
+        events = []
+        async with session.post(f"{base}/api/chat/stream", json={"message": "Documents for old age pension?"}) as resp:
+            async for line in resp.content:
+                line = line.decode().strip()
+                if line.startswith("data:"):
+                    events.append(line)
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter() - start
+        total = time.perf_counter() - start
+        print(f"   events: {len(events)}, first token after {first_token_at:.2f}s, complete after {total:.2f}s")
+        if events and events[-1] == "data: [DONE]" and first_token_at < total / 2:
+            print("   [OK] tokens were forwarded as they arrived")
+        else:
+            print("   [FAIL] stream was buffered or incomplete")
+            ok = False
+
+    print("\n3. Coalesced chat calls when the first caller goes away...")
+    ok = await check_cancelled_first_caller() and ok
+
+    server.should_exit = True
+    await server_task
+    await stub_runner.cleanup()
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,102 @@
+"""
+Query-plan check for the index registry.
+
+Ensures the indexes from indexes.py, then runs explain() on every hot query
+the routers issue and fails if any winning plan contains a COLLSCAN.
+Run it against a database with the real schema (an empty one works too).
+
+Usage: python verify_indexes.py   (exit code 1 on failure)
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+from database import db
+
+SAMPLE_ID = ObjectId()
+SAMPLE_USER_ID = str(SAMPLE_ID)
+SAMPLE_DATE = datetime.utcnow()
+# Export ?from=...&to=... as routers/export.py turns it into a filter
+SAMPLE_RANGE = {"$gte": SAMPLE_DATE - timedelta(days=30), "$lt": SAMPLE_DATE}
+
+# (router, description, collection, kind, spec)
+HOT_QUERIES = [
+    ("auth", "login / me / profile by email", "users", "find", {"filter": {"email": "citizen@example.com"}}),
+    ("auth", "register lookup by _id", "users", "find", {"filter": {"_id": SAMPLE_ID}}),
+    ("info", "current info for user", "info", "find", {"filter": {"_id": SAMPLE_USER_ID}}),
+    ("info", "submission history for user", "info_history", "find", {"filter": {"user_id": SAMPLE_USER_ID}, "sort": [("created_at", -1)]}),
+    ("applications", "my applications", "applications", "find", {"filter": {"user_id": SAMPLE_USER_ID}, "sort": [("submission_date", -1), ("_id", -1)]}),
+    ("applications", "my applications, next page", "applications", "find", {"filter": {"user_id": SAMPLE_USER_ID, "$or": [
+        {"submission_date": {"$lt": SAMPLE_DATE}},
+        {"submission_date": SAMPLE_DATE, "_id": {"$lt": SAMPLE_ID}},
+    ]}, "sort": [("submission_date", -1), ("_id", -1)]}),
+    ("applications", "scheme by _id", "schemes", "find", {"filter": {"_id": SAMPLE_ID}}),
+    ("admin", "citizen list", "users", "find", {"filter": {"role": "citizen"}, "sort": [("_id", 1)]}),
+    ("admin", "citizen list, next page", "users", "find", {"filter": {"role": "citizen", "_id": {"$gt": SAMPLE_ID}}, "sort": [("_id", 1)]}),
+    ("admin", "count citizens", "users", "count", {"query": {"role": "citizen"}}),
+    ("admin", "count pending", "applications", "count", {"query": {"status": "Pending"}}),
+    ("admin", "pending queue, first page", "applications", "find", {"filter": {"status": "Pending"}, "sort": [("submission_date", -1), ("_id", -1)]}),
+    ("admin", "pending queue, next page", "applications", "find", {"filter": {"status": "Pending", "$or": [
+        {"submission_date": {"$lt": SAMPLE_DATE}},
+        {"submission_date": SAMPLE_DATE, "_id": {"$lt": SAMPLE_ID}},
+    ]}, "sort": [("submission_date", -1), ("_id", -1)]}),
+    ("admin", "verify / reject by _id", "applications", "find", {"filter": {"_id": SAMPLE_ID}}),
+    # $lookup substitutes its `let` variables for each application, so the sub-pipeline's $match runs as these finds
+    ("admin", "pending queue: $lookup on info._id", "info", "find", {"filter": {"$expr": {"$eq": ["$_id", SAMPLE_USER_ID]}}}),
+    ("admin", "pending queue: $lookup fallback on users._id", "users", "find", {"filter": {"$expr": {"$and": [
+        {"$not": [False]}, {"$eq": ["$_id", SAMPLE_ID]},
+    ]}}}),
+    # An export without filters reads the whole collection by design and is not listed
+    ("export", "users by role and registration date", "users", "find", {"filter": {"role": "citizen", "created_at": SAMPLE_RANGE}}),
+    ("export", "applications by status", "applications", "find", {"filter": {"status": "Approved"}}),
+    ("export", "applications by status and date", "applications", "find", {"filter": {"status": "Approved", "submission_date": SAMPLE_RANGE}}),
+    ("export", "applications by scheme", "applications", "find", {"filter": {"scheme_id": "scheme-1"}}),
+    ("export", "applications by scheme and date", "applications", "find", {"filter": {"scheme_id": "scheme-1", "submission_date": SAMPLE_RANGE}}),
+    ("export", "applications by scheme, status and date", "applications", "find", {"filter": {
+        "scheme_id": "scheme-1", "status": "Approved", "submission_date": SAMPLE_RANGE,
+    }}),
+    ("export", "applications by date", "applications", "find", {"filter": {"submission_date": SAMPLE_RANGE}}),
+]
+
+def find_collscans(plan, path="winningPlan"):
+    """Walk an explain() document and return the paths of COLLSCAN stages, ignoring rejected plans."""
+    found = []
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            found.append(path)
+        for key, value in plan.items():
+            if key != "rejectedPlans":
+                found.extend(find_collscans(value, f"{path}.{key}"))
+    elif isinstance(plan, list):
+        for i, value in enumerate(plan):
+            found.extend(find_collscans(value, f"{path}[{i}]"))
+    return found
+
+async def explain(database, collection, kind, spec):
+    if kind == "count":
+        return await database.command({"explain": {"count": collection, "query": spec["query"]}, "verbosity": "queryPlanner"})
+
+    cursor = database[collection].find(spec["filter"])
+    if spec.get("sort"):
+        cursor = cursor.sort(spec["sort"])
+    return await cursor.explain()
+
+async def main():
+    await db.connect_to_database()
+    failures = 0
+
+    for router, description, collection, kind, spec in HOT_QUERIES:
+        plan = await explain(db.db, collection, kind, spec)
+        collscans = find_collscans(plan.get("queryPlanner", plan))
+        if collscans:
+            failures += 1
+            print(f"   [FAIL] {router}: {description} ({collection}) -> COLLSCAN at {collscans[0]}")
+        else:
+            print(f"   [OK] {router}: {description} ({collection})")
+
+    await db.close_database_connection()
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} queries use an index")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
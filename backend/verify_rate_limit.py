@@ -0,0 +1,253 @@
+"""
+Checks rate limiting and admission control.
+
+Runs the app in-process with uvicorn on the in-memory storage backend, with a
+local stub of the chat upstream, and:
+  1. checks the token buckets (burst, refill, Retry-After, idle eviction);
+  2. floods /auth/token from one client while probing other routes, and
+     fails if their p95 latency grows more than MAX_SLOWDOWN times over its
+     unloaded baseline (the ratio is reported either way);
+  3. checks that other clients can still sign in, that successful sign-ins
+     never use up an account's allowance, that failed guesses at one
+     account are throttled whichever IP they come from, and that one IP
+     gets one password check at a time;
+  4. checks the per-user chat limit;
+  5. caps in-flight requests and checks the overflow gets 503 + Retry-After.
+Clients are told apart with X-Forwarded-For (TRUST_PROXY_HEADERS=1).
+
+Usage: python verify_rate_limit.py   (exit code 1 on failure)
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+import aiohttp
+from aiohttp import web
+
+STUB_PORT = 18951
+APP_PORT = 18952
+FLOOD_SECONDS = 3.0
+FLOOD_CONCURRENCY = 50
+# Under the flood, p95 of the other routes may grow by at most this factor: throttled attempts are answered
+# without hashing and one IP gets one password check at a time, so the flood should barely register
+MAX_SLOWDOWN = 1.5
+
+# Must be set before the app modules are imported
+os.environ["OPENROUTER_URL"] = f"http://127.0.0.1:{STUB_PORT}/chat/completions"
+os.environ["DEEPSEEK_API_KEY"] = "stub-key"
+os.environ["TRANSLATOR_BACKEND"] = "stub"
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["TRUST_PROXY_HEADERS"] = "1"
+os.environ["RATE_LIMIT_ENABLED"] = "1"
+
+import uvicorn
+from main import app
+from ratelimit import RateLimiter, admission, rate_limiter
+
+stub_delay = 0.05
+
+async def stub_completions(request):
+    await request.json()
+    await asyncio.sleep(stub_delay)
+    return web.json_response({"choices": [{"message": {"content": "Visit the Panchayat office."}}]})
+
+async def start_stub():
+    stub = web.Application()
+    stub.router.add_post("/chat/completions", stub_completions)
+    runner = web.AppRunner(stub)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", STUB_PORT).start()
+    return runner
+
+async def start_app():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=APP_PORT, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task
+
+async def flood(base: str, started):
+    statuses = []
+    missing_retry_after = 0
+    deadline = time.perf_counter() + FLOOD_SECONDS
+
+    async with aiohttp.ClientSession() as session:
+        started.set()
+
+        async def flooder(n):
+            nonlocal missing_retry_after
+            i = 0
+            while time.perf_counter() < deadline:
+                # Guesses at one real account mixed with made-up ones, all from one client
+                email = "victim@example.com" if (n + i) % 2 else f"nobody{n}-{i}@example.com"
+                data = {"username": email, "password": "wrong-password"}
+                async with session.post(f"{base}/auth/token", data=data, headers={"X-Forwarded-For": "203.0.113.7"}) as resp:
+                    await resp.read()
+                    statuses.append(resp.status)
+                    if resp.status == 429 and not resp.headers.get("Retry-After"):
+                        missing_retry_after += 1
+                i += 1
+
+        await asyncio.gather(*[flooder(n) for n in range(FLOOD_CONCURRENCY)])
+    return statuses, missing_retry_after
+
+def flood_process(base: str, started, results):
+    # Lowest priority: on a small machine the flooding client would otherwise take the CPU the server
+    # needs, and the probes would measure the client rather than what the flood costs the server
+    os.nice(19)
+    results.put(asyncio.run(flood(base, started)))
+
+def p95(samples):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+def check_buckets() -> bool:
+    ok = True
+    limiter = RateLimiter({"p": "5/minute"}, max_keys=3)
+    allowed = [limiter.hit("p", "a", now=0.0) == 0 for _ in range(5)]
+    wait = limiter.hit("p", "a", now=0.0)
+    refilled = limiter.hit("p", "a", now=12.0)
+    for description, passed in [
+        ("burst of 5 allowed", all(allowed)),
+        (f"6th limited, retry after {wait:.0f}s", abs(wait - 12.0) < 1e-6),
+        ("one token back after 12s", refilled == 0),
+        ("other keys unaffected", limiter.hit("p", "b", now=12.0) == 0),
+    ]:
+        print(f"   [{'OK' if passed else 'FAIL'}] {description}")
+        ok = ok and passed
+
+    limiter.refund("p", "a") # "a" is empty again after the refilled token was taken
+    refunded = limiter.hit("p", "a", now=12.0) == 0 and limiter.hit("p", "a", now=12.0) > 0
+    print(f"   [{'OK' if refunded else 'FAIL'}] a refunded token can be taken again, once")
+    ok = ok and refunded
+
+    limiter.hit("p", "c", now=100.0) # a and b have refilled completely by now
+    evicted = len(limiter) == 1
+    for key in "defgh":
+        limiter.hit("p", key, now=101.0)
+    bounded = len(limiter) == 3
+    print(f"   [{'OK' if evicted else 'FAIL'}] idle buckets evicted ({len(limiter)} tracked)")
+    print(f"   [{'OK' if bounded else 'FAIL'}] tracked keys bounded by max_keys")
+    return ok and evicted and bounded
+
+async def main():
+    ok = True
+    print("1. Token buckets")
+    ok = check_buckets() and ok
+
+    stub_runner = await start_stub()
+    server, server_task = await start_app()
+    base = f"http://127.0.0.1:{APP_PORT}"
+
+    async with aiohttp.ClientSession() as session:
+        async def post(path, ip, **kwargs):
+            async with session.post(f"{base}{path}", headers={"X-Forwarded-For": ip, **kwargs.pop("headers", {})}, **kwargs) as resp:
+                return resp.status, resp.headers.get("Retry-After"), await resp.json()
+
+        async def login(email, password, ip):
+            return await post("/auth/token", ip, data={"username": email, "password": password})
+
+        for email in ("citizen@example.com", "victim@example.com"):
+            await post("/auth/register", "198.51.100.1", json={"email": email, "full_name": "Test Citizen", "password": "password123", "role": "citizen"})
+        status, _, body = await login("citizen@example.com", "password123", "198.51.100.2")
+        auth = {"Authorization": f"Bearer {body.get('access_token')}"}
+
+        async def probe():
+            start = time.perf_counter()
+            async with session.get(f"{base}/schemes/") as resp:
+                await resp.read()
+            async with session.get(f"{base}/auth/me", headers=auth) as resp:
+                await resp.read()
+            return time.perf_counter() - start
+
+        for _ in range(5):
+            await probe() # warm up
+        # Probed for as long as under the flood, so both p95s rest on about as many samples
+        baseline = []
+        deadline = time.perf_counter() + FLOOD_SECONDS - 0.5
+        while time.perf_counter() < deadline:
+            baseline.append(await probe())
+
+        print(f"\n2. Flooding /auth/token from one client for {FLOOD_SECONDS:.0f}s while probing /schemes/ + /auth/me")
+        # The flood runs in its own process, so it competes with the probes for the server, not for this event loop
+        context = multiprocessing.get_context("spawn")
+        started, results = context.Event(), context.Queue()
+        flooder = context.Process(target=flood_process, args=(base, started, results))
+        flooder.start()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, started.wait)
+        await asyncio.sleep(0.2)
+        loaded = []
+        deadline = time.perf_counter() + FLOOD_SECONDS - 0.5
+        while time.perf_counter() < deadline:
+            loaded.append(await probe())
+        statuses, missing_retry_after = await loop.run_in_executor(None, results.get)
+        flooder.join()
+
+        limited = statuses.count(429)
+        slowdown = p95(loaded) / p95(baseline)
+        print(f"   flood: {len(statuses)} attempts, {limited} answered 429, {len(statuses) - limited} reached the password check")
+        print(f"   probes p95: {p95(baseline) * 1000:.1f} ms unloaded, {p95(loaded) * 1000:.1f} ms under flood, {slowdown:.1f}x ({len(loaded)} probes)")
+        if len(statuses) - limited > 20 or missing_retry_after:
+            print(f"   [FAIL] flood was not throttled to the per-IP burst ({missing_retry_after} 429s without Retry-After)")
+            ok = False
+        else:
+            print("   [OK] flood throttled to the per-IP burst, every 429 carries Retry-After")
+        if slowdown > MAX_SLOWDOWN:
+            print(f"   [FAIL] other routes slowed down {slowdown:.1f}x under the login flood (limit {MAX_SLOWDOWN:g}x)")
+            ok = False
+        else:
+            print(f"   [OK] other routes slowed down {slowdown:.1f}x under the login flood (limit {MAX_SLOWDOWN:g}x)")
+
+        print("\n3. Other clients and accounts")
+        status, _, _ = await login("citizen@example.com", "password123", "198.51.100.3")
+        print(f"   [{'OK' if status == 200 else 'FAIL'}] another client signs in during the flood's cool-down ({status})")
+        ok = ok and status == 200
+        account_burst = rate_limiter.policies["login_account"].burst
+        statuses = [(await login("citizen@example.com", "password123", f"198.51.100.{10 + i}"))[0] for i in range(account_burst + 2)]
+        passed = statuses == [200] * (account_burst + 2)
+        print(f"   [{'OK' if passed else 'FAIL'}] {account_burst + 2} sign-ins in a row are not charged to the account: {statuses}")
+        ok = ok and passed
+        guesses = [await login("victim@example.com", "wrong-password", f"198.51.100.{100 + i}") for i in range(account_burst + 1)]
+        statuses = [s for s, _, _ in guesses]
+        passed = all(s in (401, 429) for s in statuses[:-1]) and statuses[-1] == 429 and bool(guesses[-1][1])
+        print(f"   [{'OK' if passed else 'FAIL'}] guesses at one account from a new IP each time end in 429 + Retry-After: {statuses}")
+        ok = ok and passed
+        both = await asyncio.gather(*[login("citizen@example.com", "password123", "198.51.100.200") for _ in range(2)])
+        passed = sorted(s for s, _, _ in both) == [200, 429]
+        print(f"   [{'OK' if passed else 'FAIL'}] two sign-ins at once from one IP: one checked, one 429 ({[s for s, _, _ in both]})")
+        ok = ok and passed
+
+        print("\n4. Per-user chat limit")
+        burst = rate_limiter.policies["chat_user"].burst
+        chat_statuses = [(await post("/api/chat", f"192.0.2.{i}", json={"message": "How do I apply?"}, headers=auth))[0] for i in range(burst + 1)]
+        passed = chat_statuses[:-1] == [200] * burst and chat_statuses[-1] == 429
+        print(f"   [{'OK' if passed else 'FAIL'}] {burst} chats allowed across IPs, then 429: {chat_statuses}")
+        ok = ok and passed
+
+        print("\n5. Admission control")
+        global stub_delay
+        stub_delay = 0.5
+        admission.max_in_flight = 5
+        chats = [asyncio.create_task(post("/api/chat", f"192.0.2.{100 + i}", json={"message": f"Question {i}?"})) for i in range(12)]
+        await asyncio.sleep(0.2)
+        async with session.get(f"{base}/metrics") as resp:
+            metrics_status = resp.status
+        results = await asyncio.gather(*chats)
+        admission.max_in_flight = 0
+        served = sum(1 for s, _, _ in results if s == 200)
+        shed = [(s, r) for s, r, _ in results if s == 503]
+        passed = served == 5 and len(shed) == 7 and all(r for _, r in shed)
+        print(f"   [{'OK' if passed else 'FAIL'}] 12 concurrent chats with 5 slots: {served} served, {len(shed)} shed with 503 + Retry-After")
+        print(f"   [{'OK' if metrics_status == 200 else 'FAIL'}] /metrics exempt from shedding ({metrics_status})")
+        ok = ok and passed and metrics_status == 200
+
+    server.should_exit = True
+    await server_task
+    await stub_runner.cleanup()
+    print(f"\n{'All checks passed' if ok else 'Some checks failed'}")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
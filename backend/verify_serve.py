@@ -0,0 +1,262 @@
+"""
+Checks the multi-worker server (serve.py).
+
+  1. Catalog sharing, in process: a second catalog adopts the published
+     snapshot without touching storage, serves slices of the shared mapping,
+     and a bump in one is seen by the other.
+     The user/recommendation cache generations are shared: an invalidation
+     in another process drops this process's cached entry.
+  2. serve.py refuses 2 workers on the in-memory backend unless
+     SERVE_MEMORY_WORKERS=1; with it (seeded before the fork) every response
+     carries the same catalog and ETag.
+     /metrics answered by either worker reports both workers' requests.
+  3. A killed worker is replaced, and the request totals on /metrics do not drop.
+  4. SIGHUP under load: every worker is replaced and no request fails
+     (GETs on a keep-alive connection closed by a draining worker are
+     retried once, as browsers and proxies do).
+  5. SIGTERM: the master stops its workers and removes the snapshot file
+     and the metrics directory.
+
+Linux only. Usage: python verify_serve.py   (exit code 1 on failure)
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import aiohttp
+
+APP_PORT = 18961
+SCHEMES = 12
+
+# Must be set before the app modules are imported (here and in the spawned server process)
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["SERVE_MEMORY_WORKERS"] = "1" # read-only load: every worker's copy of the seeded data is enough
+os.environ["TRANSLATOR_BACKEND"] = "none" # no backfill rebuilding the catalog while requests are measured
+os.environ["METRICS_DUMP_INTERVAL"] = "0.2"
+
+from catalog import SchemeCatalog
+from eligibility import RecommendationCache
+from generations import generations
+from principals import UserCache
+from storage import MemoryStorage
+
+def scheme(i: int) -> dict:
+    return {
+        "name": f"Scheme {i}", "description": "Support for residents.", "beneficiary_category": ["Farmers"] if i % 2 else [],
+        "eligibility_criteria": f"Age {18 + i} years or above.", "documents_required": ["Aadhaar"],
+        "benefits": "Rs 1000 per month", "application_process": "Apply at the Panchayat office.",
+    }
+
+async def seed(storage):
+    for i in range(SCHEMES):
+        await storage.schemes.create(scheme(i))
+
+def serve_process(workers: int, port: int):
+    import serve
+    serve.run(workers, "127.0.0.1", port, before_fork=seed)
+
+class NoStorage:
+    """Fails the check if the catalog goes to storage instead of the shared snapshot."""
+    def __getattr__(self, name):
+        raise AssertionError(f"catalog read storage.{name}")
+
+def children(pid: int) -> set:
+    found = set()
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        found.add(int(entry))
+            except (OSError, IndexError):
+                pass
+    return found
+
+async def check_catalog_sharing(report):
+    path = os.path.join(tempfile.gettempdir(), f"verify-serve-{os.getpid()}.bin")
+    version = multiprocessing.Value("q", 0)
+    storage = MemoryStorage()
+    await seed(storage)
+
+    first, second = SchemeCatalog(), SchemeCatalog()
+    first.share(path, version)
+    second.share(path, version)
+    try:
+        await first.ensure_fresh(storage)
+        try:
+            await second.ensure_fresh(NoStorage())
+            adopted = True
+        except AssertionError:
+            adopted = False
+        report("second worker adopts the published snapshot without reading storage", adopted)
+        some_id = first._sorted_ids[3]
+        report("same list, document and ETags", adopted
+               and await second.list_json(NoStorage()) == await first.list_json(storage)
+               and await second.get_json(NoStorage(), some_id) == await first.get_json(storage, some_id)
+               and second.list_etag() == first.list_etag() and second.get_etag(some_id) == first.get_etag(some_id))
+        report("bodies are slices of the shared mapping", isinstance(second._list_json["en"], memoryview))
+        report("eligibility index rebuilt from the snapshot",
+               await second.recommend_json(NoStorage(), age=20, occupation="Farmer") == await first.recommend_json(storage, age=20, occupation="Farmer"))
+
+        await storage.schemes.create(scheme(SCHEMES))
+        first.bump()
+        report("a bump in one worker is seen by the other", second.version == 1)
+        await second.ensure_fresh(storage) # rebuilds and publishes version 1
+        try:
+            await first.ensure_fresh(NoStorage())
+            rebuilt_once = len(first._sorted_ids) == SCHEMES + 1
+        except AssertionError:
+            rebuilt_once = False
+        report("the rebuilt snapshot is adopted by the other worker", rebuilt_once)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def check_shared_invalidation(report):
+    generations.share(multiprocessing.Array("q", generations.slots))
+    users, recommendations = UserCache(), RecommendationCache()
+    users.put("citizen@example.com", {"occupation": "Farmer"}, users.generation("citizen@example.com"))
+    recommendations.put("u1", 0, b"[]", recommendations.generation("u1"))
+    report("entries are served before the write", users.get("citizen@example.com") is not None and recommendations.get("u1", 0) is not None)
+
+    def write_elsewhere():
+        # What PATCH /auth/profile and POST /info/submit do in the worker that handles them
+        UserCache().invalidate("citizen@example.com")
+        RecommendationCache().invalidate("u1")
+
+    other = multiprocessing.get_context("fork").Process(target=write_elsewhere)
+    other.start()
+    other.join(10)
+    report("a write in another worker invalidates the cached user and recommendations",
+           users.get("citizen@example.com") is None and recommendations.get("u1", 0) is None)
+
+async def main():
+    failures = 0
+
+    def report(description, ok):
+        nonlocal failures
+        print(f"   [{'OK' if ok else 'FAIL'}] {description}")
+        failures += 0 if ok else 1
+
+    print("1. Catalog sharing")
+    await check_catalog_sharing(report)
+    check_shared_invalidation(report)
+
+    print("\n2. serve.py with 2 workers")
+    env = {k: v for k, v in os.environ.items() if k != "SERVE_MEMORY_WORKERS"}
+    refused = subprocess.run([sys.executable, "serve.py", "--workers", "2", "--port", str(APP_PORT + 1)],
+                             cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60)
+    report("refused on the in-memory backend without SERVE_MEMORY_WORKERS=1",
+           refused.returncode != 0 and "SERVE_MEMORY_WORKERS" in refused.stderr)
+    server = multiprocessing.get_context("spawn").Process(target=serve_process, args=(2, APP_PORT))
+    server.start()
+    base = f"http://127.0.0.1:{APP_PORT}"
+    async with aiohttp.ClientSession() as session:
+        async def get_schemes():
+            async with session.get(f"{base}/schemes/") as resp:
+                return resp.status, resp.headers.get("ETag"), len(await resp.json())
+
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline and len(children(server.pid)) < 2:
+            await asyncio.sleep(0.2)
+        while time.monotonic() < deadline:
+            try:
+                await get_schemes()
+                break
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.2)
+        workers = children(server.pid)
+        report(f"2 workers started ({sorted(workers)})", len(workers) == 2)
+        results = set(await asyncio.gather(*[get_schemes() for _ in range(40)]))
+        report(f"every response has the preloaded catalog and one ETag ({len(results)} distinct)",
+               len(results) == 1 and next(iter(results))[0] == 200 and next(iter(results))[2] == SCHEMES)
+
+        async def scrape():
+            async with session.get(f"{base}/metrics") as resp:
+                text = await resp.text()
+            served = sum(float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+                         if line.startswith('http_requests_total{route="/schemes/",method="GET",status="200"}'))
+            workers = {line.split('worker="', 1)[1].split('"', 1)[0] for line in text.splitlines()
+                       if line.startswith("app_component_value{") and 'worker="' in line}
+            events = {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in text.splitlines()
+                      if line.startswith("app_component_events_total{")}
+            return served, workers, events
+
+        await asyncio.sleep(0.5) # past METRICS_DUMP_INTERVAL: every worker has written its counts
+        scrapes = [await scrape() for _ in range(8)]
+        totals = [served for served, _, _ in scrapes]
+        report(f"every /metrics scrape sums both workers' requests ({totals[0]:.0f}, at least 41 sent) with a label per worker",
+               all(total >= 41 for total in totals) and all(len(w) == 2 for _, w, _ in scrapes))
+        events = scrapes[-1][2]
+        report(f"component totals are counters summed over workers ({len(events)} series, no worker label)",
+               bool(events) and not any("worker=" in series for series in events))
+        report("request totals never go backwards between scrapes", totals == sorted(totals))
+
+        print("\n3. Worker crash")
+        victim = min(workers)
+        os.kill(victim, signal.SIGKILL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and (victim in children(server.pid) or len(children(server.pid)) < 2):
+            await asyncio.sleep(0.2)
+        await asyncio.sleep(0.5)
+        workers = children(server.pid)
+        report(f"killed worker {victim} replaced ({sorted(workers)})", victim not in workers and len(workers) == 2)
+        after, live, events_after = await scrape()
+        report(f"its requests still count on /metrics ({totals[-1]:.0f} -> {after:.0f}), gauges only for live workers",
+               after >= totals[-1] and str(victim) not in live)
+        dropped = [series for series, value in events.items() if events_after.get(series, 0) < value]
+        report(f"no component total went down ({len(dropped)} did)", not dropped)
+
+        print("\n4. Rolling restart (SIGHUP) under load")
+        errors, served, retried = [], 0, 0
+        stop = asyncio.Event()
+
+        async def load():
+            nonlocal served, retried
+            while not stop.is_set():
+                try:
+                    try:
+                        status, _, count = await get_schemes()
+                    except (aiohttp.ServerDisconnectedError, aiohttp.ClientOSError):
+                        # A draining worker closed the idle keep-alive connection as it was reused:
+                        # retried once, as browsers and proxies do for GETs (RFC 9112 9.3.1)
+                        retried += 1
+                        status, _, count = await get_schemes()
+                    if status != 200 or count != SCHEMES:
+                        errors.append(status)
+                    served += 1
+                except aiohttp.ClientError as e:
+                    errors.append(repr(e))
+
+        clients = [asyncio.create_task(load()) for _ in range(8)]
+        await asyncio.sleep(0.5)
+        os.kill(server.pid, signal.SIGHUP)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline and (children(server.pid) & workers or len(children(server.pid)) < 2):
+            await asyncio.sleep(0.2)
+        await asyncio.sleep(0.5)
+        stop.set()
+        await asyncio.gather(*clients)
+        replaced = children(server.pid)
+        report(f"all workers replaced ({sorted(workers)} -> {sorted(replaced)})", not (replaced & workers) and len(replaced) == 2)
+        report(f"{served} requests during the restart, {len(errors)} failed {errors[:3]} ({retried} retried on a closed keep-alive connection)", served > 0 and not errors)
+
+    print("\n5. Graceful stop (SIGTERM)")
+    os.kill(server.pid, signal.SIGTERM)
+    server.join(40)
+    snapshot = f"/dev/shm/kanthalloor-catalog-{server.pid}.bin"
+    metrics_dir = f"/dev/shm/kanthalloor-metrics-{server.pid}"
+    report(f"master exited ({server.exitcode}) and removed its snapshot and metrics directory",
+           server.exitcode == 0 and not os.path.exists(snapshot) and not os.path.exists(metrics_dir))
+    if server.is_alive():
+        server.kill()
+
+    print(f"\n{'All checks passed' if not failures else f'{failures} check(s) failed'}")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,124 @@
+"""
+Contract check for the storage backends.
+
+Runs the same repository calls the routers make against the in-memory
+backend and, with --mongo, against a scratch database on MONGODB_URL
+(dropped afterwards), and fails if any result differs from what the
+routers expect. Keeps the two backends answering identically.
+
+Usage: python verify_storage.py [--mongo]   (exit code 1 on failure)
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from storage import MemoryStorage, MotorStorage
+
+SCRATCH_DB = "kanthalloor_verify_storage"
+
+async def check_backend(storage) -> int:
+    failures = 0
+
+    def check(description, ok):
+        nonlocal failures
+        if ok:
+            print(f"   [OK] {description}")
+        else:
+            failures += 1
+            print(f"   [FAIL] {description}")
+
+    await storage.reset()
+
+    # Users
+    user = await storage.users.create({"email": "a@example.com", "full_name": "A", "role": "citizen", "hashed_password": "h"})
+    check("users.create hides the password hash", "hashed_password" not in user and user["email"] == "a@example.com")
+    try:
+        await storage.users.create({"email": "a@example.com", "role": "citizen"})
+        check("users.create rejects a duplicate email", False)
+    except DuplicateKeyError:
+        check("users.create rejects a duplicate email", True)
+    with_hash = await storage.users.get_by_email("a@example.com", with_password=True)
+    check("users.get_by_email(with_password=True) returns the hash", with_hash.get("hashed_password") == "h")
+    check("users.get by string id", (await storage.users.get(str(user["_id"])))["email"] == "a@example.com")
+    updated = await storage.users.update_profile("a@example.com", {"ward": "3"})
+    check("users.update_profile returns the new document", updated["ward"] == "3" and "hashed_password" not in updated)
+    other = await storage.users.create({"email": "b@example.com", "full_name": "B Two", "phone_number": "22", "role": "citizen"})
+    page = await storage.users.page({"role": "citizen", "_id": {"$gt": user["_id"]}}, [("_id", 1)], 10)
+    check("users.page keyset after _id", [u["email"] for u in page] == ["b@example.com"])
+
+    # Info: current snapshot per user plus history
+    uid = str(user["_id"])
+    await storage.info.insert({"user_id": uid, "full_name": "Old", "age": 30, "created_at": datetime(2020, 1, 1)})
+    await storage.info.insert({"user_id": uid, "full_name": "New", "age": 31, "created_at": datetime(2021, 1, 1)})
+    latest = await storage.info.latest_for_user(uid, ["age"])
+    check("info.latest_for_user picks the newest and projects", latest.get("age") == 31 and "full_name" not in latest)
+    await storage.info.insert({"user_id": uid, "full_name": "Late write", "age": 29, "created_at": datetime(2019, 1, 1)})
+    check("info.insert out of order keeps the newest current", (await storage.info.latest_for_user(uid))["full_name"] == "New")
+    late = [{"_id": ObjectId(), "user_id": uid, "full_name": "Batch", "age": 40, "created_at": datetime(2022, 1, 1)}]
+    await storage.info.insert_many(late)
+    await storage.info.insert_many(late) # a retried ingest batch
+    check("info.insert_many is idempotent and updates the snapshot", (await storage.info.latest_for_user(uid))["full_name"] == "Batch")
+    check("info keeps one document per user and the full history", await storage.info.count() == 1 and await storage.info.history.count() == 4)
+
+    # Schemes: string and ObjectId ids
+    scheme = await storage.schemes.create({"name": "Pension"})
+    await storage.schemes.collection.insert_one({"_id": "seeded", "name": "Seeded"})
+    check("schemes.get by ObjectId string", (await storage.schemes.get(str(scheme["_id"])))["name"] == "Pension")
+    check("schemes.get by string id", (await storage.schemes.get("seeded"))["name"] == "Seeded")
+    check("schemes.update returns the new document", (await storage.schemes.update(str(scheme["_id"]), {"name": "Pension 2"}))["name"] == "Pension 2")
+
+    # Counters
+    await storage.counters.increment("stats", {"applications.status.Pending": 2, "users.citizen": 1})
+    await storage.counters.increment("stats", {"applications.status.Pending": -1})
+    stats = await storage.counters.get("stats")
+    check("counters.increment upserts and adds", stats["applications"]["status"]["Pending"] == 1 and stats["users"]["citizen"] == 1)
+
+    # Applications: pending queue with applicant join, review
+    base = datetime(2024, 1, 1)
+    owners = [uid, str(other["_id"]), "unknown"]
+    ids = [await storage.applications.insert({"user_id": owners[i % 3], "status": "Pending", "scheme_id": "s",
+                                              "submission_date": base + timedelta(minutes=i)}) for i in range(3)]
+    pending = await storage.applications.pending_with_applicants({"status": "Pending"}, [("submission_date", -1), ("_id", -1)], 10)
+    check("applications.pending_with_applicants sorts newest first", [a["_id"] for a in pending] == ids[::-1])
+    by_owner = {a["user_id"]: a for a in pending}
+    check("pending join uses the latest info", [i.get("full_name") for i in by_owner[uid]["_info"]] == ["Batch"])
+    check("pending join falls back to the user", by_owner[owners[1]]["_info"] == [] and by_owner[owners[1]]["_user"][0]["full_name"] == "B Two")
+    check("pending join tolerates unknown users", by_owner["unknown"]["_info"] == [] and by_owner["unknown"]["_user"] == [])
+
+    before = await storage.applications.set_status(str(ids[0]), "Verified", "verified_by", "official@example.com")
+    check("applications.set_status returns the previous document", before["status"] == "Pending")
+    check("applications.set_status on an unknown id", await storage.applications.set_status(str(ObjectId()), "Verified", "verified_by", "x") is None)
+    statuses = await storage.applications.statuses(ids)
+    check("applications.statuses", statuses == {str(ids[0]): "Verified", str(ids[1]): "Pending", str(ids[2]): "Pending"})
+    modified = await storage.applications.set_statuses([(ids[1], "Pending"), (ids[2], "Verified")], "Rejected", "rejected_by", "official@example.com")
+    check("applications.set_statuses only moves documents still in the expected status", modified == 1)
+    check("applications.count_by", await storage.applications.count_by("status") == {"Verified": 1, "Rejected": 1, "Pending": 1})
+    exported = [doc async for doc in storage.applications.iterate({"status": {"$ne": "Pending"}}, batch_size=1)]
+    check("applications.iterate", len(exported) == 2)
+    check("applications.delete_all", await storage.applications.delete_all() == 3 and await storage.applications.count() == 0)
+
+    await storage.reset()
+    return failures
+
+async def main():
+    failures = 0
+    print("Memory backend")
+    failures += await check_backend(MemoryStorage())
+
+    if "--mongo" in sys.argv:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from database import MONGODB_URL
+        client = AsyncIOMotorClient(MONGODB_URL)
+        print(f"\nMongoDB backend ({MONGODB_URL})")
+        try:
+            failures += await check_backend(MotorStorage(client[SCRATCH_DB]))
+        finally:
+            await client.drop_database(SCRATCH_DB)
+            client.close()
+
+    print(f"\n{'All checks passed' if not failures else f'{failures} check(s) failed'}")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
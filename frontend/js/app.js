@@ -49,6 +49,7 @@ const API = {
     getMe: () => API.request("/auth/me", "GET", null, true),
     updateProfile: (data) => API.request("/auth/profile", "PATCH", data, true),
     getSchemes: (lang = "en") => API.request(`/schemes/?language=${lang}`),
+    getRecommendedSchemes: () => API.request("/schemes/recommended", "GET", null, true),
 
     // Admin specific
     createScheme: (data) => API.request("/schemes/", "POST", data),
@@ -58,6 +59,7 @@ const API = {
     getPendingApplications: () => API.request("/admin/applications/pending", "GET", null, true),
     verifyApplication: (id) => API.request(`/admin/verify-application/${id}`, "POST", null, true),
     rejectApplication: (id) => API.request(`/admin/reject-application/${id}`, "POST", null, true),
+    reviewApplications: (ids, status) => API.request("/admin/applications/review", "POST", { ids, status }, true),
     deleteAllPendingApplications: () => API.request("/admin/applications/pending", "DELETE", null, true),
 
     chat: (message) => API.request("/api/chat", "POST", { message }, true),
@@ -0,0 +1,3 @@
+#!/bin/sh
+# Production server (Linux): pre-forked uvicorn workers, see backend/serve.py
+cd "$(dirname "$0")/backend" && exec python serve.py "$@"